@@ -1,26 +1,54 @@
 # api_services.py
-import requests
-import pandas as pd
 import logging
 import time
 import concurrent.futures
+import asyncio
+
+from MP_Feeder.startup import sob_demanda, marcar
+
+from MP_Feeder.rate_limiter import LimitadorAIMD
+from MP_Feeder.dedup import VistosColeta
+from MP_Feeder.response_parser import (
+    decodificar_json, extrair_produtos, novo_buffer_notas, novo_buffer_lojas, normalizar_datahora
+)
+
+# Importados no primeiro uso (pandas/requests pesam na partida; ver startup.py)
+pd = sob_demanda("pandas")
+requests = sob_demanda("requests")
+http_client = sob_demanda("MP_Feeder.http_client")
 
 # --- SERVIÇO 1: NOTA PARANÁ (MENOR PREÇO) ---
 
-def buscar_notas(Consultas, Lojas, ultimo_indice, arquivo_indice, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID):
+URL_MENOR_PRECO = "https://menorpreco.notaparana.pr.gov.br/api/v1/produtos"
+LIMITE_ERROS_CONSECUTIVOS = 5
+
+def buscar_notas(Consultas, Lojas, ultimo_indice, arquivo_indice, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID, limitador=None, cache=None, cache_negativo=None, gravador=None, journal=None, vistos=None, resolvidas=None):
     """
     Busca as notas fiscais na API do Menor Preço.
     Agora recebe os tokens do Telegram para poder notificar em caso de erro.
+    O ritmo das requisições é controlado pelo 'limitador' (AIMD) e, se houver
+    'cache', respostas recentes são reaproveitadas sem chamar a API.
+    Pares em back-off no 'cache_negativo' (204 recorrente) são pulados.
+    Com 'gravador' (carga streaming), as linhas de cada consulta são entregues
+    a ele em vez de acumuladas em memória.
+    Com 'journal', o resultado de cada consulta é gravado em disco (fsync) antes de seguir.
+    Notas/lojas repetidas na coleta são descartadas na leitura ('vistos').
+    'Consultas' é um plano (query_plan): a retomada em 'ultimo_indice' é um seek direto.
+    Com 'resolvidas' (set), recebe o índice de cada consulta resolvida (200, 204,
+    4xx pulado ou pulada pelo cache negativo); erros não entram, nem os superados
+    por um sucesso depois (modo worker: só esses saem da fila).
     """
     print("##### COLETANDO NOTAS #####")
     logging.info("##### COLETANDO NOTAS #####")
 
-    url = "https://menorpreco.notaparana.pr.gov.br/api/v1/produtos"
-    notas = []
-    lojas_sem_cadastro = []
+    url = URL_MENOR_PRECO
+    notas = novo_buffer_notas()
+    lojas_sem_cadastro = novo_buffer_lojas()
+    limitador = limitador or LimitadorAIMD()
+    vistos = vistos or VistosColeta()
+    resolvidas = resolvidas if resolvidas is not None else set()
     
     erros_consecutivos = 0
-    LIMITE_ERROS_CONSECUTIVOS = 5
     
     run_completo = True 
     indice_salvar = ultimo_indice
@@ -30,78 +58,54 @@ def buscar_notas(Consultas, Lojas, ultimo_indice, arquivo_indice, TELEGRAM_TOKEN
         logging.warning("##### NENHUMA CONSULTA PARA REALIZAR. PULANDO A COLETA DE NOTAS. #####")
         return pd.DataFrame(), pd.DataFrame(), run_completo, indice_salvar
 
-    Consultas = Consultas[Consultas["index"] >= ultimo_indice]
     lojas_cadastradas = set(Lojas["id_loja"])
     
-    total_consultas = len(Consultas)
+    total_consultas = len(Consultas.indices(ultimo_indice))
     if total_consultas == 0:
         print("##### NENHUMA CONSULTA RESTANTE A PARTIR DO ÍNDICE RECUPERADO. #####")
         logging.warning("##### NENHUMA CONSULTA RESTANTE A PARTIR DO ÍNDICE RECUPERADO. #####")
         return pd.DataFrame(), pd.DataFrame(), run_completo, indice_salvar
 
-    for i, (_, row) in enumerate(Consultas.iterrows(), start=1):
-        hash_local = row["geohash"]
-        ean = row["gtin"]
-        indice_atual = row['index'] 
+    for i, (indice_atual, ean, hash_local) in enumerate(Consultas.consultas(ultimo_indice), start=1):
+        inicio_notas, inicio_lojas = len(notas), len(lojas_sem_cadastro)
 
         try:
-            time.sleep(0.3)
+            if cache_negativo and cache_negativo.deve_pular(ean, hash_local):
+                print(f"{i}/{total_consultas} (Índice: {indice_atual}) - {ean} - PULADA (204 recorrente)")
+                logging.info(f"{i}/{total_consultas} (Índice: {indice_atual}) - {ean} - Pulada (204 recorrente)")
+                indice_salvar = indice_atual + 1
+                resolvidas.add(indice_atual)
+                continue
+
             params = { "gtin": ean, "local": hash_local, "raio": "20" }
             
-            response = requests.get(url, params=params, timeout=20) 
-            status_code = response.status_code
+            em_cache = cache.obter(ean, hash_local, params["raio"]) if cache else None
+            if em_cache is not None:
+                status_code, produtos_encontrados = em_cache
+            else:
+                status_code, produtos_encontrados = _consultar_menor_preco(url, params, limitador, cache)
+            # Resposta do cache também conta (o cache negativo ignora a repetição na mesma rotação)
+            if cache_negativo:
+                cache_negativo.registrar(ean, hash_local, status_code)
 
             if status_code == 200:
                 erros_consecutivos = 0
-                data = response.json()
-
-                produtos_encontrados = data.get("produtos", [])
                 num_produtos = len(produtos_encontrados)
 
-                for produto in produtos_encontrados:
-                    notas.append(
-                        {
-                            "id_nota": produto.get("id"),
-                            "datahora": produto.get("datahora"),
-                            "id_loja": produto.get("estabelecimento", {}).get("codigo"),
-                            "geohash": hash_local,
-                            "gtin": produto.get("gtin"),
-                            "descricao": produto.get("desc"),
-                            "valor_desconto": produto.get("valor_desconto"),
-                            "valor_tabela": produto.get("valor_tabela"),
-                            "valor": produto.get("valor"),
-                            "cidade": produto.get("estabelecimento", {}).get("mun", ""),
-                        }
-                    )
-                    id_loja = produto.get("estabelecimento", {}).get("codigo")
-                    if id_loja not in lojas_cadastradas:
-                        logradouro = (
-                            f"{produto.get('estabelecimento', {}).get('tp_logr', '')} "
-                            f"{produto.get('estabelecimento', {}).get('nm_logr', '')}, "
-                            f"{produto.get('estabelecimento', {}).get('nr_logr', '')}"
-                        )
-                        lojas_sem_cadastro.append(
-                            {
-                                "id_loja": id_loja,
-                                "nome_fantasia": produto.get("estabelecimento", {}).get("nm_fan", ""),
-                                "razao_social": produto.get("estabelecimento", {}).get("nm_emp", ""),
-                                "logradouro": logradouro.strip(),
-                                "cidade": produto.get("estabelecimento", {}).get("mun", ""),
-                                "geohash": hash_local,
-                                "local": produto.get("local", ""),
-                            }
-                        )
+                extrair_produtos(produtos_encontrados, hash_local, lojas_cadastradas, notas, lojas_sem_cadastro, vistos)
                 
                 print(f"{i}/{total_consultas} (Índice: {indice_atual}) - {ean} - 200 (Encontrados: {num_produtos})")
                 logging.info(f"{i}/{total_consultas} (Índice: {indice_atual}) - {ean} - 200 - Encontrados: {num_produtos}")
                 
                 indice_salvar = indice_atual + 1
+                resolvidas.add(indice_atual)
 
             elif status_code == 204:
                 erros_consecutivos = 0
                 print(f"{i}/{total_consultas} (Índice: {indice_atual}) - {ean} - 204 (Sem dados)")
                 logging.info(f"{i}/{total_consultas} (Índice: {indice_atual}) - {ean} - 204 - Sem dados")
                 indice_salvar = indice_atual + 1
+                resolvidas.add(indice_atual)
 
             elif status_code in (404, 401, 403):
                 msg_erro = f"❌ ERRO GRAVE {status_code}: API Menor Preço pode estar offline ou URL errada. Script interrompido."
@@ -113,6 +117,7 @@ def buscar_notas(Consultas, Lojas, ultimo_indice, arquivo_indice, TELEGRAM_TOKEN
                 print(f"❌ Erro de CLIENTE ({status_code}) para GTIN {ean}. PULANDO...")
                 logging.warning(f"{i}/{total_consultas} (Índice: {indice_atual}) - {ean} - {status_code} - Erro de cliente. Pulando.")
                 indice_salvar = indice_atual + 1
+                resolvidas.add(indice_atual)
             
             elif 500 <= status_code < 600:
                 raise Exception(f"⚠️ Erro no servidor ({status_code})")
@@ -139,38 +144,321 @@ def buscar_notas(Consultas, Lojas, ultimo_indice, arquivo_indice, TELEGRAM_TOKEN
                 break 
             
             continue 
+
+        if journal:
+            # Write-ahead: o resultado da consulta fica em disco antes de seguir
+            journal.registrar(notas.fatia(inicio_notas), lojas_sem_cadastro.fatia(inicio_lojas), indice_salvar)
+
+        if gravador:
+            # Todas as consultas até 'indice_salvar' já foram resolvidas
+            _entregar_ao_gravador(gravador, notas, lojas_sem_cadastro, indice_salvar)
     
+    limitador.registrar_resumo()
+    vistos.registrar_resumo()
+
     print("##### PREPARANDO DADOS COLETADOS PARA SAÍDA... #####")
     Notas_df, Lojas_SC_df = _preparar_saida(notas, lojas_sem_cadastro)
     
     return Notas_df, Lojas_SC_df, run_completo, indice_salvar
 
 
+def buscar_notas_async(Consultas, Lojas, ultimo_indice, arquivo_indice, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID, max_concorrencia=8, limitador=None, cache=None, cache_negativo=None, gravador=None, journal=None, vistos=None, resolvidas=None):
+    """
+    Motor alternativo (asyncio) da coleta de notas. Mantém até 'max_concorrencia'
+    requisições em voo contra a API do Menor Preço e devolve a mesma tupla do
+    'buscar_notas' (Notas_df, Lojas_SC_df, run_completo, indice_salvar).
+    O índice salvo só avança até a MENOR consulta ainda não concluída.
+    O 'limitador' (AIMD) controla a taxa global, somando todos os workers.
+    'resolvidas' funciona como no 'buscar_notas'.
+    """
+    return asyncio.run(_buscar_notas_async(
+        Consultas, Lojas, ultimo_indice, arquivo_indice,
+        TELEGRAM_TOKEN, TELEGRAM_CHAT_ID, max_concorrencia, limitador or LimitadorAIMD(), cache, cache_negativo, gravador, journal,
+        vistos or VistosColeta(), resolvidas if resolvidas is not None else set()
+    ))
+
+
+async def _buscar_notas_async(Consultas, Lojas, ultimo_indice, arquivo_indice, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID, max_concorrencia, limitador, cache, cache_negativo, gravador, journal, vistos, resolvidas):
+    """
+    Função auxiliar privada. Implementação do motor asyncio.
+    As requisições bloqueantes rodam em threads; o estado (listas, contadores)
+    só é alterado no loop de eventos, então não precisa de lock.
+    """
+    print(f"##### COLETANDO NOTAS (ASYNC, {max_concorrencia} EM PARALELO) #####")
+    logging.info(f"##### COLETANDO NOTAS (ASYNC, {max_concorrencia} EM PARALELO) #####")
+
+    url = URL_MENOR_PRECO
+    notas = novo_buffer_notas()
+    lojas_sem_cadastro = novo_buffer_lojas()
+
+    run_completo = True
+    indice_salvar = ultimo_indice
+
+    if Consultas.empty:
+        print("##### NENHUMA CONSULTA PARA REALIZAR. PULANDO A COLETA DE NOTAS. #####")
+        logging.warning("##### NENHUMA CONSULTA PARA REALIZAR. PULANDO A COLETA DE NOTAS. #####")
+        return pd.DataFrame(), pd.DataFrame(), run_completo, indice_salvar
+
+    lojas_cadastradas = set(Lojas["id_loja"])
+
+    # 'ordem_indices' é um range no plano normal: nada é materializado
+    ordem_indices = Consultas.indices(ultimo_indice)
+    total_consultas = len(ordem_indices)
+    if total_consultas == 0:
+        print("##### NENHUMA CONSULTA RESTANTE A PARTIR DO ÍNDICE RECUPERADO. #####")
+        logging.warning("##### NENHUMA CONSULTA RESTANTE A PARTIR DO ÍNDICE RECUPERADO. #####")
+        return pd.DataFrame(), pd.DataFrame(), run_completo, indice_salvar
+
+    # Os workers puxam do gerador do plano sob demanda (sem fila pré-carregada)
+    proximas = Consultas.consultas(ultimo_indice)
+
+    # Estado compartilhado entre os workers
+    estado = {"processadas": 0, "erros_consecutivos": 0, "interrompido": False, "pos_seguro": 0,
+              "journal_notas": 0, "journal_lojas": 0}
+    concluidas = set()      # Índices resolvidos (200, 204, 4xx pulado ou erro já superado)
+    falhas_pendentes = []   # Erros desde o último sucesso: serão refeitos se o loop parar
+
+    async def worker():
+        while not estado["interrompido"]:
+            # Sem 'await' entre o teste e o next(): o loop de eventos não alterna workers aqui
+            proxima = next(proximas, None)
+            if proxima is None:
+                return
+            indice_atual, ean, hash_local = proxima
+
+            try:
+                if cache_negativo and cache_negativo.deve_pular(ean, hash_local):
+                    estado["processadas"] += 1
+                    concluidas.add(indice_atual)
+                    resolvidas.add(indice_atual)
+                    _entregar_resultados()
+                    print(f"{estado['processadas']}/{total_consultas} (Índice: {indice_atual}) - {ean} - PULADA (204 recorrente)")
+                    logging.info(f"{estado['processadas']}/{total_consultas} (Índice: {indice_atual}) - {ean} - Pulada (204 recorrente)")
+                    continue
+
+                params = { "gtin": ean, "local": hash_local, "raio": "20" }
+
+                em_cache = cache.obter(ean, hash_local, params["raio"]) if cache else None
+                if em_cache is not None:
+                    status_code, produtos_encontrados = em_cache
+                else:
+                    await limitador.aguardar_async()
+                    status_code, produtos_encontrados = await asyncio.to_thread(
+                        _consultar_menor_preco, url, params, limitador, cache, False
+                    )
+                # Resposta do cache também conta (o cache negativo ignora a repetição na mesma rotação)
+                if cache_negativo:
+                    cache_negativo.registrar(ean, hash_local, status_code)
+
+                if estado["interrompido"]:
+                    return
+
+                estado["processadas"] += 1
+                i = estado["processadas"]
+
+                if status_code == 200:
+                    num_produtos = len(produtos_encontrados)
+
+                    extrair_produtos(produtos_encontrados, hash_local, lojas_cadastradas, notas, lojas_sem_cadastro, vistos)
+                    _marcar_sucesso(indice_atual)
+
+                    print(f"{i}/{total_consultas} (Índice: {indice_atual}) - {ean} - 200 (Encontrados: {num_produtos})")
+                    logging.info(f"{i}/{total_consultas} (Índice: {indice_atual}) - {ean} - 200 - Encontrados: {num_produtos}")
+
+                elif status_code == 204:
+                    _marcar_sucesso(indice_atual)
+                    print(f"{i}/{total_consultas} (Índice: {indice_atual}) - {ean} - 204 (Sem dados)")
+                    logging.info(f"{i}/{total_consultas} (Índice: {indice_atual}) - {ean} - 204 - Sem dados")
+
+                elif status_code in (404, 401, 403):
+                    msg_erro = f"❌ ERRO GRAVE {status_code}: API Menor Preço pode estar offline ou URL errada. Script interrompido."
+                    logging.critical(msg_erro)
+                    mandarMSG(msg_erro, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID)
+                    raise Exception(f"ERRO FATAL {status_code}. Abortando.")
+
+                elif 400 <= status_code < 500:
+                    print(f"❌ Erro de CLIENTE ({status_code}) para GTIN {ean}. PULANDO...")
+                    logging.warning(f"{i}/{total_consultas} (Índice: {indice_atual}) - {ean} - {status_code} - Erro de cliente. Pulando.")
+                    _marcar_sucesso(indice_atual)
+
+                elif 500 <= status_code < 600:
+                    raise Exception(f"⚠️ Erro no servidor ({status_code})")
+                else:
+                    raise Exception(f"⚠️ Status code inesperado ({status_code}) para {ean}")
+
+            except Exception as e:
+                if "ERRO FATAL" in str(e):
+                    estado["interrompido"] = True
+                    raise e
+
+                if estado["interrompido"]:
+                    return
+
+                print(f"❌ Erro na requisição para GTIN {ean} e geohash {hash_local}: {e}. PULANDO...")
+                logging.error(f"Erro na requisição para GTIN {ean} e geohash {hash_local}: {e}. PULANDO...")
+
+                falhas_pendentes.append(indice_atual)
+                estado["erros_consecutivos"] += 1
+
+                if estado["erros_consecutivos"] >= LIMITE_ERROS_CONSECUTIVOS:
+                    print(f"❌ LIMITE DE {LIMITE_ERROS_CONSECUTIVOS} ERROS CONSECUTIVOS ATINGIDO.")
+                    logging.critical(f"LIMITE DE {LIMITE_ERROS_CONSECUTIVOS} ERROS CONSECUTIVOS ATINGIDO. INTERROMPENDO O LOOP.")
+
+                    msg_erro = f"❌ ERRO GRAVE: {LIMITE_ERROS_CONSECUTIVOS} erros consecutivos no Menor Preço. Loop interrompido. Salvando dados parciais..."
+                    mandarMSG(msg_erro, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID)
+
+                    estado["interrompido"] = True
+                    return
+
+    def _marcar_sucesso(indice_atual):
+        # Um sucesso "absolve" os erros anteriores (igual ao motor sequencial, que pula e segue)
+        estado["erros_consecutivos"] = 0
+        concluidas.add(indice_atual)
+        resolvidas.add(indice_atual)
+        concluidas.update(falhas_pendentes)
+        falhas_pendentes.clear()
+        _entregar_resultados()
+
+    def _indice_seguro():
+        # Avança o ponteiro sobre 'ordem_indices' enquanto as consultas estiverem concluídas
+        pos = estado["pos_seguro"]
+        while pos < len(ordem_indices) and ordem_indices[pos] in concluidas:
+            pos += 1
+        estado["pos_seguro"] = pos
+        return ordem_indices[pos] if pos < len(ordem_indices) else ordem_indices[-1] + 1
+
+    def _entregar_resultados():
+        if journal:
+            # Write-ahead: só as linhas novas desde o último registro
+            journal.registrar(
+                notas.fatia(estado["journal_notas"]), lojas_sem_cadastro.fatia(estado["journal_lojas"]), _indice_seguro()
+            )
+            estado["journal_notas"], estado["journal_lojas"] = len(notas), len(lojas_sem_cadastro)
+        if gravador:
+            _entregar_ao_gravador(gravador, notas, lojas_sem_cadastro, _indice_seguro())
+            estado["journal_notas"] = estado["journal_lojas"] = 0
+
+    loop = asyncio.get_running_loop()
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_concorrencia)
+    loop.set_default_executor(executor)
+
+    tarefas = [asyncio.create_task(worker()) for _ in range(max_concorrencia)]
+    try:
+        await asyncio.gather(*tarefas)
+    except Exception:
+        for tarefa in tarefas:
+            tarefa.cancel()
+        raise
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    if estado["interrompido"]:
+        run_completo = False
+
+    limitador.registrar_resumo()
+    vistos.registrar_resumo()
+
+    # Índice seguro: avança apenas até a menor consulta não concluída
+    indice_salvar = _indice_seguro()
+
+    print(f"##### ÍNDICE SEGURO PARA RETOMADA: {indice_salvar} #####")
+    logging.info(f"##### ÍNDICE SEGURO PARA RETOMADA: {indice_salvar} #####")
+
+    print("##### PREPARANDO DADOS COLETADOS PARA SAÍDA... #####")
+    Notas_df, Lojas_SC_df = _preparar_saida(notas, lojas_sem_cadastro)
+
+    return Notas_df, Lojas_SC_df, run_completo, indice_salvar
+
+
+def _consultar_menor_preco(url, params, limitador, cache=None, aguardar=True):
+    """
+    Função auxiliar privada. Faz a requisição e devolve (status_code, produtos).
+    'produtos' só vem preenchido no 200; respostas 200/204 são gravadas no cache.
+    """
+    response = _requisitar_menor_preco(url, params, limitador, aguardar)
+    status_code = response.status_code
+
+    produtos = None
+    if status_code == 200:
+        produtos = decodificar_json(response.content).get("produtos", [])
+
+    if cache is not None and status_code in (200, 204):
+        cache.salvar(params["gtin"], params["local"], params["raio"], status_code, produtos or [])
+
+    return status_code, produtos
+
+
+def _requisitar_menor_preco(url, params, limitador, aguardar=True):
+    """
+    Função auxiliar privada. Faz UMA requisição ao Menor Preço respeitando o
+    limitador de taxa e devolve o resultado (status/latência) para o ajuste AIMD.
+    """
+    if aguardar:
+        limitador.aguardar()
+
+    marcar("primeira_requisicao_api")
+    inicio = time.monotonic()
+    try:
+        response = http_client.get(url, params=params)
+    except requests.Timeout:
+        limitador.registrar_resultado(timeout=True)
+        raise
+    except requests.RequestException:
+        limitador.registrar_resultado(None, time.monotonic() - inicio)
+        raise
+
+    limitador.registrar_resultado(response.status_code, time.monotonic() - inicio)
+    return response
+
+
+def _entregar_ao_gravador(gravador, notas, lojas_sem_cadastro, indice_seguro):
+    """
+    Função auxiliar privada. Entrega ao gravador (que roda em outra thread) uma
+    cópia das linhas e esvazia os buffers da coleta, nos dois motores.
+    """
+    gravador.adicionar(notas.fatia(), lojas_sem_cadastro.fatia(), indice_seguro)
+    notas.limpar()
+    lojas_sem_cadastro.limpar()
+
 def _preparar_saida(notas, lojas_sem_cadastro):
     """
-    Função auxiliar privada. Converte as listas de resultados em DataFrames limpos.
+    Função auxiliar privada. Converte os buffers de resultados em DataFrames limpos.
+    """
+    return _preparar_notas(notas), _preparar_lojas(lojas_sem_cadastro)
+
+def _preparar_lojas(lojas_sem_cadastro):
+    """
+    Função auxiliar privada. Buffer de lojas sem cadastro -> DataFrame com 'endereco'.
     """
-    Lojas_SC = pd.DataFrame(lojas_sem_cadastro).drop_duplicates(subset="id_loja")
+    Lojas_SC = lojas_sem_cadastro.para_dataframe().drop_duplicates(subset="id_loja")
     if not Lojas_SC.empty:
         Lojas_SC["endereco"] = (
             Lojas_SC["logradouro"] + ", " + Lojas_SC["cidade"] + ", PR, Brasil"
         )
     else:
         print("#### ⚠️  AVISO: TODAS AS LOJAS BUSCADAS DETÉM CADASTRO. #### ")
+    return Lojas_SC
 
-    Notas = pd.DataFrame(notas).drop_duplicates(subset="id_nota")
+def _preparar_notas(notas):
+    """
+    Função auxiliar privada. Buffer de notas -> DataFrame com 'datahora' em datetime64.
+    """
+    Notas = notas.para_dataframe().drop_duplicates(subset="id_nota")
 
     if "datahora" in Notas.columns and not Notas.empty:
-        Notas["datahora"] = Notas["datahora"].astype(str).str.rstrip("Z")
-        Notas["datahora"] = pd.to_datetime(Notas["datahora"], errors="coerce")
-        Notas["datahora"] = Notas["datahora"].dt.strftime("%Y-%m-%d %H:%M:%S")
+        Notas["datahora"] = normalizar_datahora(Notas["datahora"])
     else:
         print("⚠️ Nenhuma nota com campo 'datahora' foi retornada.")
         
-    return Notas, Lojas_SC
+    return Notas
 
 # --- SERVIÇO 2: NOMINATIM GEOCODING ---
 
+# Endereços geocodificados por rodada (respeite o uso público). A rodada chama a
+# busca uma vez só: na carga do fim da rodada (main.py) ou, na carga streaming e
+# no modo worker, para as lojas gravadas sem coordenadas (flow.py).
+LIMITE_DIARIO_GEOCODING = 100
+
 def _obter_lat_lon_nominatim(endereco, index, total):
     """
     Função auxiliar privada. Busca a coordenada de UM endereço usando Nominatim (OpenStreetMap).
@@ -187,7 +475,7 @@ def _obter_lat_lon_nominatim(endereco, index, total):
     headers = {"User-Agent": "mp-feeder/1.0 (contato@seudominio.com)"}
 
     try:
-        resposta = requests.get(url, params=params, headers=headers, timeout=20)
+        resposta = http_client.get(url, params=params, headers=headers)
         status_code = resposta.status_code
 
         if status_code != 200:
@@ -214,20 +502,20 @@ def _obter_lat_lon_nominatim(endereco, index, total):
         return None, None
 
 
-def buscar_lat_lon_lojas_sc_nominatim(Lojas_SC):
+def buscar_lat_lon_lojas_sc_nominatim(Lojas_SC, limite=LIMITE_DIARIO_GEOCODING):
     """
     Versão sem Google. Usa Nominatim (gratuito e sem chave) para buscar coordenadas.
+    Acima de 'limite' lojas, geocodifica (e retorna) só uma amostra de 'limite' lojas.
     """
 
     print("##### BUSCANDO LATITUDE E LONGITUDE (NOMINATIM) #####")
     logging.info("##### BUSCANDO LATITUDE E LONGITUDE (NOMINATIM) #####")
 
-    LIMITE_DIARIO_GEOCODING = 100  # respeite o uso público
     total_encontradas = len(Lojas_SC)
 
-    if total_encontradas > LIMITE_DIARIO_GEOCODING:
-        print(f"⚠️ Limitando para {LIMITE_DIARIO_GEOCODING} lojas/dia (limite ético Nominatim).")
-        Lojas_SC = Lojas_SC.sample(n=LIMITE_DIARIO_GEOCODING).copy()
+    if total_encontradas > limite:
+        print(f"⚠️ Limitando para {limite} lojas/dia (limite ético Nominatim).")
+        Lojas_SC = Lojas_SC.sample(n=limite).copy()
 
     elif Lojas_SC.empty:
         print("##### NENHUMA LOJA NOVA PARA BUSCAR LAT/LON. #####")
@@ -307,7 +595,7 @@ def mandarMSG(message, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID):
     params = {"chat_id": chat_id, "text": message}
     
     try:
-        response = requests.get(url, params=params, timeout=10)
+        response = http_client.get(url, params=params)
         response.raise_for_status() 
         logging.info(f"Mensagem enviada para o Telegram: {message}")
     except requests.RequestException as e:
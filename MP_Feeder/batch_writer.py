@@ -0,0 +1,290 @@
+# batch_writer.py
+import hashlib
+import logging
+import random
+import time
+
+from MP_Feeder import db_pool
+from MP_Feeder.startup import sob_demanda
+
+# Importados no primeiro uso (ver startup.py)
+mdb = sob_demanda("mariadb")
+pd = sob_demanda("pandas")
+
+# tamanho_bloco: linhas por transação | tentativas: por bloco, em erros transitórios |
+# espera_inicial_segundos: back-off (dobra a cada tentativa) | dias_progresso: por quanto
+# tempo os blocos já gravados ficam registrados em mp_feeder_carga_blocos
+CONFIG_BLOCOS = {"tamanho_bloco": 5000, "tentativas": 4, "espera_inicial_segundos": 2.0, "dias_progresso": 7}
+
+# Erros do MariaDB que valem nova tentativa: lock wait timeout, deadlock,
+# servidor caiu/conexão perdida no meio da query, conexão derrubada por inatividade
+ERROS_TRANSITORIOS = {1205, 1213, 2006, 2013, 2055, 4031}
+
+# Sem a tabela mp_feeder_carga_blocos (migração v1_11 não aplicada), grava sem registrar progresso
+_progresso_indisponivel = False
+
+
+def configurar_blocos(tamanho_bloco=None, tentativas=None, espera_inicial_segundos=None):
+    """Ajusta a gravação em blocos (ver CONFIG_BLOCOS)."""
+    if tamanho_bloco is not None:
+        CONFIG_BLOCOS["tamanho_bloco"] = tamanho_bloco
+    if tentativas is not None:
+        CONFIG_BLOCOS["tentativas"] = tentativas
+    if espera_inicial_segundos is not None:
+        CONFIG_BLOCOS["espera_inicial_segundos"] = espera_inicial_segundos
+
+
+# ============================================
+# TEXTO NO FORMATO DO LOAD DATA
+# ============================================
+
+def campos_texto(df, colunas, ids=(), gtins=()):
+    """
+    Converte as colunas para texto no formato padrão do LOAD DATA (tab entre
+    campos, '\\N' para nulo, barra invertida/tab/quebra de linha escapados),
+    com operações vetorizadas do pandas. Ids inteiros que chegaram como float
+    voltam a ser inteiros e GTINs ganham os zeros à esquerda (14 dígitos).
+    Retorna {coluna: Series de texto}.
+    """
+    campos = {}
+    for coluna in colunas:
+        serie = df[coluna]
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            texto = serie.dt.strftime("%Y-%m-%d %H:%M:%S").astype("string")
+        elif coluna in ids and pd.api.types.is_float_dtype(serie):
+            # Ids inteiros com nulos chegam como float: 123.0 deve virar '123'
+            texto = serie.astype("Int64").astype("string")
+        else:
+            texto = serie.astype("string")
+        if coluna in gtins:
+            texto = texto.str.zfill(14)
+        texto = (
+            texto.str.replace("\\", "\\\\", regex=False)
+                 .str.replace("\t", "\\t", regex=False)
+                 .str.replace("\n", "\\n", regex=False)
+                 .str.replace("\r", "\\r", regex=False)
+        )
+        campos[coluna] = texto.fillna("\\N")
+    return campos
+
+
+def juntar_linhas(campos):
+    """Junta os campos de 'campos_texto' em linhas TSV (uma por registro)."""
+    series = list(campos.values())
+    return series[0].str.cat(series[1:], sep="\t")
+
+
+# ============================================
+# GRAVAÇÃO EM BLOCOS
+# ============================================
+
+def gravar_em_blocos(DB_CONFIG, df, tabela, chave, colunas, gravar, ids=(), gtins=(), local_infile=False,
+                     coluna_atualizacao="data_atualizacao"):
+    """
+    Grava 'df' em 'tabela' em blocos de ~CONFIG_BLOCOS['tamanho_bloco'] linhas,
+    com um commit por bloco (os locks na tabela duram só um bloco, e o que já
+    foi gravado sobrevive a uma falha no meio da carga).
+
+    'gravar(cursor, bloco, linhas)' executa o INSERT do bloco, sem commit;
+    'linhas' é o bloco já em texto TSV (pronto para um LOAD DATA).
+
+    Idempotência: as linhas são ordenadas pela 'chave' e os limites dos blocos
+    são definidos pelas próprias chaves (ver _limites_blocos), então uma linha
+    a mais ou a menos só muda o bloco dela. Cada bloco é identificado pelo hash
+    do seu conteúdo, que vai para mp_feeder_carga_blocos na MESMA transação do
+    bloco: uma carga retomada (recuperação dos parciais/journal) pula os blocos
+    já commitados, mesmo que o lote tenha mudado um pouco. As linhas dos blocos
+    pulados ainda têm a 'coluna_atualizacao' renovada, como teriam no upsert
+    (a rotação de fallback lê o data_atualizacao das notas).
+    Erros transitórios (conexão perdida, deadlock...) são retentados com back-off.
+
+    Retorna o total de linhas afetadas reportado pelo driver.
+    """
+    if df.empty:
+        return 0
+
+    df = df.reset_index(drop=True)
+    campos = campos_texto(df, colunas, ids, gtins)
+    ordem = campos[chave].sort_values(kind="stable").index
+    df = df.loc[ordem].reset_index(drop=True)
+    linhas = juntar_linhas(campos).loc[ordem].reset_index(drop=True)
+
+    tamanho = max(int(CONFIG_BLOCOS["tamanho_bloco"]), 1)
+    limites = _limites_blocos(campos[chave].loc[ordem].reset_index(drop=True), tamanho)
+    hashes = [_hash_bloco(tabela, linhas.iloc[inicio:fim]) for inicio, fim in limites]
+    ja_gravados = _blocos_gravados(DB_CONFIG, tabela, hashes)
+
+    inicio_carga = time.time()
+    afetadas = 0
+    pulados = 0
+    for numero, ((inicio, fim), hash_bloco) in enumerate(zip(limites, hashes), 1):
+        if hash_bloco in ja_gravados:
+            pulados += 1
+            logging.info(f"CARGA {tabela}: bloco {numero}/{len(limites)} já gravado numa carga anterior, pulando.")
+            if coluna_atualizacao:
+                _renovar_atualizacao(DB_CONFIG, tabela, chave, coluna_atualizacao, df[chave].iloc[inicio:fim].tolist())
+            continue
+
+        inicio_bloco = time.time()
+        afetadas += _gravar_bloco(
+            DB_CONFIG, tabela, numero, len(limites), df.iloc[inicio:fim], linhas.iloc[inicio:fim],
+            hash_bloco, gravar, local_infile
+        )
+        logging.info(
+            f"CARGA {tabela}: bloco {numero}/{len(limites)} ({fim - inicio} linhas) "
+            f"commitado em {time.time() - inicio_bloco:.2f}s"
+        )
+
+    msg = (
+        f"CARGA {tabela}: {len(df)} linhas em {len(limites)} blocos ({pulados} já gravados antes) "
+        f"em {time.time() - inicio_carga:.2f}s"
+    )
+    print(f"##### {msg} #####")
+    logging.info(msg)
+    return afetadas
+
+
+def _limites_blocos(chaves, tamanho):
+    """
+    Função auxiliar privada. Limites (inicio, fim) dos blocos sobre as chaves
+    já ordenadas (texto). Um bloco termina na chave cujo hash é múltiplo de
+    'tamanho' (média de 'tamanho' linhas), então os cortes não dependem do
+    resto do lote; blocos maiores que 2x 'tamanho' são divididos a partir do
+    corte anterior, o que também só depende das chaves vizinhas.
+    """
+    cortes = pd.util.hash_pandas_object(chaves, index=False) % tamanho == 0
+    fins = [posicao + 1 for posicao in chaves.index[cortes.to_numpy()]] + [len(chaves)]
+
+    maximo = 2 * tamanho
+    limites = []
+    inicio = 0
+    for fim in fins:
+        while fim - inicio > maximo:
+            limites.append((inicio, inicio + maximo))
+            inicio += maximo
+        if fim > inicio:
+            limites.append((inicio, fim))
+            inicio = fim
+    return limites
+
+
+def _renovar_atualizacao(DB_CONFIG, tabela, chave, coluna, valores):
+    """
+    Função auxiliar privada. Renova 'coluna' (NOW()) nas linhas de um bloco
+    pulado. Falha aqui só é logada: as linhas já estão gravadas.
+    """
+    conn = db_pool.conectar(DB_CONFIG, "dbDrogamais")
+    cursor = conn.cursor()
+    try:
+        placeholders = ', '.join(['%s'] * len(valores))
+        cursor.execute(f"UPDATE {tabela} SET {coluna} = NOW() WHERE {chave} IN ({placeholders})", valores)
+        conn.commit()
+    except mdb.Error as e:
+        logging.warning(f"CARGA {tabela}: não foi possível renovar o {coluna} de um bloco pulado: {e}")
+    finally:
+        _fechar(cursor, conn)
+
+
+def _hash_bloco(tabela, linhas):
+    """Função auxiliar privada. Identidade do bloco: sha1 da tabela + conteúdo em texto."""
+    conteudo = tabela + "\n" + "\n".join(linhas.tolist())
+    return hashlib.sha1(conteudo.encode("utf-8")).hexdigest()
+
+
+def _gravar_bloco(DB_CONFIG, tabela, numero, total, bloco, linhas, hash_bloco, gravar, local_infile):
+    """Função auxiliar privada. Grava e commita um bloco (e seu hash), com retentativas."""
+    tentativa = 1
+    while True:
+        conn = db_pool.conectar(DB_CONFIG, "dbDrogamais", local_infile=local_infile)
+        cursor = conn.cursor()
+        try:
+            gravar(cursor, bloco, linhas)
+            afetadas = cursor.rowcount
+            if not _progresso_indisponivel:
+                cursor.execute(
+                    "INSERT IGNORE INTO mp_feeder_carga_blocos (tabela, hash_bloco, linhas) VALUES (%s, %s, %s)",
+                    (tabela, hash_bloco, len(bloco))
+                )
+            conn.commit()
+            _fechar(cursor, conn)
+            return afetadas
+        except Exception as e:
+            transitorio = _erro_transitorio(e)
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            if transitorio:
+                # A conexão pode ter caído: volta ao pool marcada para ping/reconnect
+                try:
+                    cursor.close()
+                except Exception:
+                    pass
+                conn.descartar()
+            else:
+                _fechar(cursor, conn)
+
+            if not transitorio or tentativa >= CONFIG_BLOCOS["tentativas"]:
+                raise
+            espera = CONFIG_BLOCOS["espera_inicial_segundos"] * 2 ** (tentativa - 1) * random.uniform(0.8, 1.2)
+            tentativa += 1
+            print(f"##### ⚠️ CARGA {tabela}: BLOCO {numero}/{total} FALHOU ({e}). TENTATIVA {tentativa} EM {espera:.1f}s #####")
+            logging.warning(f"CARGA {tabela}: bloco {numero}/{total} falhou ({e}). Tentativa {tentativa} em {espera:.1f}s")
+            time.sleep(espera)
+
+
+def _fechar(cursor, conn):
+    """Função auxiliar privada."""
+    try:
+        cursor.close()
+    finally:
+        conn.close()
+
+
+def _erro_transitorio(erro):
+    """Função auxiliar privada. True para erros em que vale tentar o bloco de novo."""
+    if not isinstance(erro, mdb.Error):
+        return False
+    return getattr(erro, "errno", None) in ERROS_TRANSITORIOS or isinstance(erro, (mdb.OperationalError, mdb.InterfaceError))
+
+
+# ============================================
+# PROGRESSO (mp_feeder_carga_blocos)
+# ============================================
+
+def _blocos_gravados(DB_CONFIG, tabela, hashes):
+    """
+    Função auxiliar privada. Hashes (dentre 'hashes') já commitados em cargas
+    anteriores. Aproveita para apagar registros mais antigos que 'dias_progresso'.
+    """
+    global _progresso_indisponivel
+    if _progresso_indisponivel or not hashes:
+        return set()
+
+    conn = db_pool.conectar(DB_CONFIG, "dbDrogamais")
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "DELETE FROM mp_feeder_carga_blocos WHERE data_carga < NOW() - INTERVAL %s DAY",
+            (CONFIG_BLOCOS["dias_progresso"],)
+        )
+        conn.commit()
+
+        gravados = set()
+        for inicio in range(0, len(hashes), 1000):
+            parte = hashes[inicio:inicio + 1000]
+            placeholders = ', '.join(['%s'] * len(parte))
+            cursor.execute(
+                f"SELECT hash_bloco FROM mp_feeder_carga_blocos WHERE tabela = %s AND hash_bloco IN ({placeholders})",
+                (tabela, *parte)
+            )
+            gravados.update(linha[0] for linha in cursor.fetchall())
+        return gravados
+    except mdb.Error as e:
+        if getattr(e, "errno", None) != 1146:
+            raise
+        _progresso_indisponivel = True
+        logging.warning("CARGA: tabela mp_feeder_carga_blocos não existe (rode o init_db.py). Gravando sem registro de progresso.")
+        return set()
+    finally:
+        _fechar(cursor, conn)
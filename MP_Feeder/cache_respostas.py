@@ -0,0 +1,227 @@
+# cache_respostas.py
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+
+from MP_Feeder.response_parser import codificar_json, decodificar_json
+
+
+class CacheRespostas:
+    """
+    Cache em disco (SQLite) das respostas do Menor Preço, por (gtin, geohash, raio).
+
+    Guarda só o que já foi interpretado: o status (200/204) e a lista de produtos.
+    Entradas mais velhas que 'ttl_horas' são ignoradas; acima de 'max_entradas'
+    as mais antigas são removidas. Pode ser usado por várias threads.
+    """
+
+    def __init__(self, arquivo, ttl_horas=6, max_entradas=200000):
+        self.arquivo = arquivo
+        self.ttl_segundos = ttl_horas * 3600
+        self.max_entradas = max_entradas
+
+        self.hits = 0
+        self.misses = 0
+        self._insercoes_desde_limpeza = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(arquivo, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS respostas (
+                gtin TEXT NOT NULL,
+                geohash TEXT NOT NULL,
+                raio TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                produtos BLOB,
+                criado_em REAL NOT NULL,
+                PRIMARY KEY (gtin, geohash, raio)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_respostas_criado_em ON respostas (criado_em)")
+        self._conn.commit()
+        self._remover_expirados()
+
+    def obter(self, gtin, geohash, raio):
+        """
+        Retorna (status, produtos) se houver resposta válida no cache, senão None.
+        """
+        limite = time.time() - self.ttl_segundos
+        with self._lock:
+            linha = self._conn.execute(
+                "SELECT status, produtos FROM respostas WHERE gtin = ? AND geohash = ? AND raio = ? AND criado_em >= ?",
+                (str(gtin), str(geohash), str(raio), limite),
+            ).fetchone()
+            if linha is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        status, produtos = linha
+        return status, decodificar_json(zlib.decompress(produtos)) if produtos else []
+
+    def salvar(self, gtin, geohash, raio, status, produtos):
+        """Grava (ou substitui) a resposta interpretada de uma consulta."""
+        blob = zlib.compress(codificar_json(produtos)) if produtos else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO respostas (gtin, geohash, raio, status, produtos, criado_em) VALUES (?, ?, ?, ?, ?, ?)",
+                (str(gtin), str(geohash), str(raio), status, blob, time.time()),
+            )
+            self._conn.commit()
+            self._insercoes_desde_limpeza += 1
+            if self._insercoes_desde_limpeza >= 1000:
+                self._insercoes_desde_limpeza = 0
+                self._aplicar_limite()
+
+    def _remover_expirados(self):
+        """Função auxiliar privada. Apaga entradas vencidas e aplica o limite de tamanho."""
+        with self._lock:
+            self._conn.execute("DELETE FROM respostas WHERE criado_em < ?", (time.time() - self.ttl_segundos,))
+            self._aplicar_limite()
+            self._conn.commit()
+
+    def _aplicar_limite(self):
+        """Função auxiliar privada (chamada com o lock). Remove as entradas mais antigas além do limite."""
+        total = self._conn.execute("SELECT COUNT(*) FROM respostas").fetchone()[0]
+        excesso = total - self.max_entradas
+        if excesso > 0:
+            self._conn.execute(
+                "DELETE FROM respostas WHERE rowid IN (SELECT rowid FROM respostas ORDER BY criado_em LIMIT ?)",
+                (excesso,),
+            )
+            self._conn.commit()
+            logging.info(f"CACHE: {excesso} respostas antigas removidas (limite de {self.max_entradas}).")
+
+    def registrar_resumo(self):
+        """Imprime e loga os hits/misses do cache nesta coleta."""
+        total = self.hits + self.misses
+        taxa = (self.hits / total * 100) if total else 0.0
+        msg = f"CACHE DE RESPOSTAS: {self.hits} hits, {self.misses} misses ({taxa:.1f}% de acerto)"
+        print(f"##### {msg} #####")
+        logging.info(msg)
+
+    def fechar(self):
+        with self._lock:
+            self._conn.close()
+
+
+class CacheNegativo:
+    """
+    Memória persistente dos pares (gtin, geohash) que vivem retornando 204.
+
+    A cada 204 seguido o par passa a ser pulado por 1, 2, 4, 8... rotações
+    (até 'max_rotacoes'). Um 200 apaga o histórico e o par volta ao normal.
+    O estado fica em memória e é gravado no SQLite a cada alteração.
+
+    'rotacao' identifica a passada atual pelo grupo de GTINs (ver
+    flow._rotacao_atual): o back-off avança no máximo uma vez por rotação,
+    então reiniciar o mesmo grupo (falha de API, respostas vindas do cache)
+    não consome nem soma rotações de novo.
+    """
+
+    def __init__(self, arquivo, max_rotacoes=8, rotacao=None):
+        self.arquivo = arquivo
+        self.max_rotacoes = max_rotacoes
+        # Sem identificador, cada instância conta como uma rotação
+        self.rotacao = str(rotacao) if rotacao is not None else f"instancia-{time.time()}"
+        self.puladas = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(arquivo, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS pares_sem_dados (
+                gtin TEXT NOT NULL,
+                geohash TEXT NOT NULL,
+                sequencia_204 INTEGER NOT NULL,
+                pular_restantes INTEGER NOT NULL,
+                atualizado_em REAL NOT NULL,
+                rotacao TEXT,
+                pulado INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (gtin, geohash)
+            )
+        """)
+        # Arquivos de antes da contagem por rotação
+        colunas = {linha[1] for linha in self._conn.execute("PRAGMA table_info(pares_sem_dados)")}
+        if "rotacao" not in colunas:
+            self._conn.execute("ALTER TABLE pares_sem_dados ADD COLUMN rotacao TEXT")
+            self._conn.execute("ALTER TABLE pares_sem_dados ADD COLUMN pulado INTEGER NOT NULL DEFAULT 0")
+        self._conn.commit()
+
+        # (gtin, geohash) -> [sequencia_204, pular_restantes, rotacao, pulado]
+        self._pares = {
+            (gtin, geohash): [sequencia, pular, rotacao_par, pulado]
+            for gtin, geohash, sequencia, pular, rotacao_par, pulado in self._conn.execute(
+                "SELECT gtin, geohash, sequencia_204, pular_restantes, rotacao, pulado FROM pares_sem_dados"
+            )
+        }
+        logging.info(f"CACHE NEGATIVO: {len(self._pares)} pares com 204 recorrente carregados.")
+
+    def deve_pular(self, gtin, geohash):
+        """
+        Chamado quando a rotação chega ao par. Se ele ainda está em back-off,
+        retorna True (a consulta não deve ser feita); a rotação é consumida
+        só na primeira vez que o par é visto nesta rotação.
+        """
+        chave = (str(gtin), str(geohash))
+        with self._lock:
+            estado = self._pares.get(chave)
+            if not estado:
+                return False
+            if estado[2] == self.rotacao:
+                # Já visto nesta rotação (reinício do grupo): repete a decisão
+                pular = bool(estado[3])
+            elif estado[1] > 0:
+                estado[1] -= 1
+                estado[2], estado[3] = self.rotacao, 1
+                self._gravar(chave, estado)
+                pular = True
+            else:
+                pular = False
+            if pular:
+                self.puladas += 1
+            return pular
+
+    def registrar(self, gtin, geohash, status_code):
+        """
+        Atualiza o histórico do par com o resultado de uma consulta (da API ou
+        do cache de respostas). Um 204 conta uma vez por rotação.
+        """
+        chave = (str(gtin), str(geohash))
+        with self._lock:
+            if status_code == 204:
+                estado = self._pares.setdefault(chave, [0, 0, None, 0])
+                if estado[2] == self.rotacao and not estado[3]:
+                    return
+                estado[0] += 1
+                estado[1] = min(2 ** (estado[0] - 1), self.max_rotacoes)
+                estado[2], estado[3] = self.rotacao, 0
+                self._gravar(chave, estado)
+            elif status_code == 200 and chave in self._pares:
+                del self._pares[chave]
+                self._conn.execute("DELETE FROM pares_sem_dados WHERE gtin = ? AND geohash = ?", chave)
+                self._conn.commit()
+
+    def _gravar(self, chave, estado):
+        """Função auxiliar privada (chamada com o lock). Persiste o estado do par."""
+        self._conn.execute(
+            "INSERT OR REPLACE INTO pares_sem_dados "
+            "(gtin, geohash, sequencia_204, pular_restantes, atualizado_em, rotacao, pulado) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (chave[0], chave[1], estado[0], estado[1], time.time(), estado[2], estado[3]),
+        )
+        self._conn.commit()
+
+    def registrar_resumo(self):
+        """Imprime e loga quantas consultas foram economizadas nesta coleta."""
+        msg = f"CACHE NEGATIVO: {self.puladas} consultas puladas (204 recorrente), {len(self._pares)} pares em back-off"
+        print(f"##### {msg} #####")
+        logging.info(msg)
+
+    def fechar(self):
+        with self._lock:
+            self._conn.close()
@@ -1,14 +1,37 @@
 # db_manager.py
-import mariadb as mdb
-import pandas as pd
 import logging
+import os
+import tempfile
 import time
 from datetime import datetime, date
 
+from MP_Feeder.startup import sob_demanda, marcar
+from MP_Feeder import db_pool
+from MP_Feeder.batch_writer import gravar_em_blocos
+
+# Importados no primeiro uso (ver startup.py)
+pd = sob_demanda("pandas")
+mdb = sob_demanda("mariadb")
+
+# Carga das notas: 'load_data' usa LOAD DATA LOCAL INFILE + upsert em lote (cai
+# sozinho para o executemany se o servidor/cliente não permitir LOCAL INFILE)
+CONFIG_CARGA = {"load_data": False}
+_load_data_indisponivel = False
+
+def configurar_carga(load_data=None):
+    """Ajusta a estratégia de carga das notas (ver CONFIG_CARGA)."""
+    if load_data is not None:
+        CONFIG_CARGA["load_data"] = load_data
+
 # --- FUNÇÃO DE CONEXÃO AUXILIAR ---
 def _conectar_db(DB_CONFIG):
-    """Função auxiliar interna para abrir conexão com o DB correto."""
-    return mdb.connect(**DB_CONFIG, database="dbDrogamais")
+    """
+    Função auxiliar interna que empresta uma conexão do pool do DB correto.
+    O 'conn.close()' das funções abaixo a devolve ao pool.
+    """
+    conn = db_pool.conectar(DB_CONFIG, "dbDrogamais")
+    marcar("primeira_conexao_db")
+    return conn
 
 # ============================================
 # SEÇÃO DE PRODUTOS
@@ -50,114 +73,259 @@ def pegar_ultima_att_gtins(DB_CONFIG):
             logging.error(f"Formato de data desconhecido: {ultima_att_gtins_raw}")
             return None
 
-def fetch_dados_vendas_para_produtos(DB_CONFIG):
-    """
-    (ETL - Extract) Busca os dados brutos de vendas por valor e qtd.
-    A lógica de Transform (merge, drop) foi movida para o main.py.
-    """
-    logging.info("##### REFAZENDO LISTA DE PRODUTOS (ETAPA 1: EXTRAÇÃO) #####")
-    conn = _conectar_db(DB_CONFIG)
-    cursor = conn.cursor()
-
-    # 1. Buscando produtos mais vendidos por valor
-    logging.info("1. Buscando produtos mais vendidos por valor")
-    sql_valor = """
-        SELECT 
-            v.codigo_interno_produto, 
-            v.GTIN, 
-            v.descricao_produto, 
-            v.apresentacao_produto, 
-            v.nome_fantasia_fabricante,
-            SUM(v.valor_liquido_total) AS valor_total
-        FROM 
-            bronze_plugpharma_vendas v
-        WHERE 
-            v.data_venda >= CURDATE() - INTERVAL 90 DAY
-        GROUP BY 
-            v.codigo_interno_produto
-        ORDER BY valor_total DESC
-        LIMIT 3000;
-    """
-    cursor.execute(sql_valor)
-    resultados = cursor.fetchall()
-    columns = [desc[0] for desc in cursor.description]
-    produtos_por_valor = pd.DataFrame(resultados, columns=columns)
+# GTINs que não são produto de verdade (ENTREGA MOTOBOY etc.), fora da lista-alvo
+GTINS_SENTINELA = ("99999999999999", "88888888888888", "78000001")
 
-    # 2. Buscando produtos mais vendidos por quantidade
-    logging.info("2. Buscando produtos mais vendidos por quantidade")
-    sql_qtd = """
-        SELECT 
-            v.codigo_interno_produto, 
-            v.GTIN, 
-            v.descricao_produto, 
-            v.apresentacao_produto, 
+# Ranking das vendas numa passada só: os dois rankings (valor e quantidade) saem
+# do mesmo GROUP BY, e só os candidatos finais (já filtrados, normalizados para
+# 14 dígitos e sem GTIN repetido) voltam para o Python
+_SQL_PRODUTOS_CANDIDATOS = """
+    WITH vendas AS (
+        SELECT
+            v.codigo_interno_produto,
+            v.GTIN,
+            v.descricao_produto,
+            v.apresentacao_produto,
             v.nome_fantasia_fabricante,
+            SUM(v.valor_liquido_total) AS valor_total,
             SUM(v.qtd_de_produtos) AS qtd_total
-        FROM 
+        FROM
             bronze_plugpharma_vendas v
-        WHERE 
-            v.data_venda >= CURDATE() - INTERVAL 90 DAY
-        GROUP BY 
+        WHERE
+            v.data_venda >= CURDATE() - INTERVAL %s DAY
+        GROUP BY
             v.codigo_interno_produto
-        ORDER BY qtd_total DESC
-        LIMIT 3000;
+    ),
+    ranking AS (
+        SELECT
+            vendas.*,
+            ROW_NUMBER() OVER (ORDER BY valor_total DESC) AS posicao_valor,
+            ROW_NUMBER() OVER (ORDER BY qtd_total DESC) AS posicao_qtd
+        FROM vendas
+    ),
+    candidatos AS (
+        SELECT
+            codigo_interno_produto,
+            IF(CHAR_LENGTH(GTIN) < 14, LPAD(GTIN, 14, '0'), GTIN) AS GTIN,
+            descricao_produto,
+            apresentacao_produto,
+            nome_fantasia_fabricante,
+            posicao_qtd
+        FROM ranking
+        WHERE posicao_valor <= %s
+          AND posicao_qtd <= %s
+          AND GTIN IS NOT NULL
+          AND GTIN NOT IN ({sentinelas})
+    ),
+    unicos AS (
+        SELECT
+            candidatos.*,
+            ROW_NUMBER() OVER (PARTITION BY GTIN ORDER BY posicao_qtd) AS ordem_gtin
+        FROM candidatos
+    )
+    SELECT
+        codigo_interno_produto,
+        GTIN,
+        descricao_produto,
+        apresentacao_produto,
+        nome_fantasia_fabricante
+    FROM unicos
+    WHERE ordem_gtin = 1
+    ORDER BY posicao_qtd
+    LIMIT %s
+"""
+
+def fetch_produtos_candidatos(DB_CONFIG, dias=90, limite_ranking=3000, limite_produtos=1600):
+    """
+    (ETL - Extract + Transform) Seleciona os produtos-alvo direto no banco:
+    os que estão entre os 'limite_ranking' mais vendidos dos últimos 'dias'
+    por valor E por quantidade, sem os GTINs sentinela, com o GTIN em 14
+    dígitos e sem GTIN repetido, na ordem do ranking por quantidade.
+    Retorna no máximo 'limite_produtos' linhas, lidas por um cursor do lado
+    do servidor. Loga o tempo no banco e os bytes recebidos.
     """
-    cursor.execute(sql_qtd)
-    resultados = cursor.fetchall()
-    columns = [desc[0] for desc in cursor.description]
-    produtos_por_qtd = pd.DataFrame(resultados, columns=columns)
+    print("##### REFAZENDO LISTA DE PRODUTOS (RANKING DE VENDAS NO BANCO) #####")
+    logging.info("##### REFAZENDO LISTA DE PRODUTOS (RANKING DE VENDAS NO BANCO) #####")
 
-    cursor.close()
-    conn.close()
-    
-    # 3. Retorna os DFs brutos para o main.py fazer a transformação
-    return produtos_por_valor, produtos_por_qtd
+    sql = _SQL_PRODUTOS_CANDIDATOS.format(sentinelas=', '.join(['%s'] * len(GTINS_SENTINELA)))
+    parametros = (dias, limite_ranking, limite_ranking, *GTINS_SENTINELA, limite_produtos)
+
+    conn = _conectar_db(DB_CONFIG)
+    cursor = conn.cursor()
+    try:
+        bytes_antes = _bytes_enviados_sessao(cursor)
+
+        # Cursor do lado do servidor: o resultado fica no banco e vem em blocos de 'prefetch_size'
+        cursor_servidor = conn.cursor(cursor_type=mdb.CURSOR.READ_ONLY, prefetch_size=500)
+        try:
+            inicio = time.perf_counter()
+            cursor_servidor.execute(sql, parametros)
+            tempo_consulta = time.perf_counter() - inicio
+
+            colunas = [desc[0] for desc in cursor_servidor.description]
+            linhas = []
+            while True:
+                bloco = cursor_servidor.fetchmany(500)
+                if not bloco:
+                    break
+                linhas.extend(bloco)
+            tempo_total = time.perf_counter() - inicio
+        finally:
+            cursor_servidor.close()
+
+        bytes_recebidos = _bytes_enviados_sessao(cursor) - bytes_antes
+    finally:
+        cursor.close()
+        conn.close()
+
+    Produtos = pd.DataFrame(linhas, columns=colunas)
+    msg = (
+        f"Lista de produtos: {len(Produtos)} candidatos em {tempo_total:.2f}s "
+        f"(consulta {tempo_consulta:.2f}s, {bytes_recebidos / 1024:.1f} KB recebidos do banco)"
+    )
+    print(f"##### {msg} #####")
+    logging.info(msg)
+    return Produtos
+
+def _bytes_enviados_sessao(cursor):
+    """Função auxiliar privada. Bytes que o servidor já enviou nesta sessão (Bytes_sent)."""
+    cursor.execute("SHOW SESSION STATUS LIKE 'Bytes_sent'")
+    resultado = cursor.fetchone()
+    return int(resultado[1]) if resultado else 0
+
+# Tamanho das colunas de bronze_menorPreco_produtos (v1_02): valores maiores são rejeitados
+_LIMITES_PRODUTOS = {"id_produto": 20, "descricao": 60, "fabricante": 100, "apresentacao": 100, "tipo": 50}
 
 def insert_produtos_atualizados(DB_CONFIG, produtos_df):
     """
     INSERT Incremental: Grava uma nova linha para cada execução.
     Usa 'data_insercao' para fixar a data de criação e compor a PK sem erros futuros.
+    A preparação é vetorizada e o INSERT vai num único executemany. Linhas
+    inválidas não vão ao banco; se o banco recusar o lote, ele é dividido ao
+    meio até isolar as linhas com erro. Retorna as linhas rejeitadas
+    (GTIN, codigo_interno_produto, motivo).
     """
-    if produtos_df.empty: return
+    if produtos_df.empty: return pd.DataFrame(columns=["GTIN", "codigo_interno_produto", "motivo"])
 
     logging.info(f"4. Inserindo {len(produtos_df)} produtos (Incremental)...")
-    conn = _conectar_db(DB_CONFIG)
-    cursor = conn.cursor()
-    
     agora = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    Produtos, Rejeitados = _preparar_produtos(produtos_df)
+
+    colunas = ["gtin", "id_produto", "descricao", "fabricante", "apresentacao", "tipo"]
+    valores = [Produtos[coluna].astype(object).where(Produtos[coluna].notna(), None).tolist() for coluna in colunas]
+    data_tuples = [(*linha, agora) for linha in zip(*valores)]  # data_insercao no fim
 
     sql = """
         INSERT INTO bronze_menorPreco_produtos 
         (gtin, id_produto, descricao, fabricante, apresentacao, tipo, data_insercao)
         VALUES (%s, %s, %s, %s, %s, %s, %s)
     """
-    
-    sucessos = 0
-    for _, row in produtos_df.iterrows():
-        try:
-            gtin_normalizado = str(row["GTIN"]).zfill(14)
-
-            cursor.execute(sql, (
-                gtin_normalizado, 
-                row["codigo_interno_produto"], 
-                row["descricao_produto"], 
-                row["nome_fantasia_fabricante"], 
-                row["apresentacao_produto"],
-                row.get("tipo"),
-                agora  # Vai para data_insercao
-            ))
-            sucessos += 1
-        except Exception as e:
-            logging.error(f"Erro ao inserir {row['GTIN']}: {e}")
-
-    conn.commit()
-    logging.info(f"Sucesso: {sucessos} produtos inseridos.")
-    cursor.close()
-    conn.close()
 
-def coletar_produtos_no_banco(DB_CONFIG):
+    conn = _conectar_db(DB_CONFIG)
+    cursor = conn.cursor()
+    try:
+        start_time = time.time()
+        idas = [0]
+        recusadas = _executemany_isolando_erros(cursor, sql, data_tuples, Produtos.index.tolist(), idas)
+        conn.commit()
+        end_time = time.time()
+    except Exception as e:
+        logging.error(f"Erro ao inserir produtos: {e}", exc_info=True)
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+    if recusadas:
+        indices, motivos = zip(*recusadas)
+        Rejeitados = pd.concat([Rejeitados, pd.DataFrame({
+            "GTIN": Produtos.loc[list(indices), "gtin"].tolist(),
+            "codigo_interno_produto": Produtos.loc[list(indices), "id_produto"].tolist(),
+            "motivo": list(motivos),
+        })], ignore_index=True)
+
+    for linha in Rejeitados.itertuples(index=False):
+        logging.error(f"Produto rejeitado {linha.GTIN} (código {linha.codigo_interno_produto}): {linha.motivo}")
+    sucessos = len(data_tuples) - len(recusadas)
+    print(f"##### {sucessos} PRODUTOS INSERIDOS, {len(Rejeitados)} REJEITADOS ({idas[0]} idas ao banco, {end_time - start_time:.2f}s) #####")
+    logging.info(f"Sucesso: {sucessos} produtos inseridos, {len(Rejeitados)} rejeitados. {idas[0]} idas ao banco em {end_time - start_time:.2f}s.")
+    return Rejeitados
+
+def _preparar_produtos(produtos_df):
+    """
+    Função auxiliar privada. Normaliza as colunas de uma vez (GTIN com 14
+    dígitos, ids sem '.0') e separa as linhas que o banco recusaria, com o
+    motivo. Retorna (Produtos válidos, Rejeitados).
+    """
+    def _texto(coluna):
+        if coluna not in produtos_df.columns:
+            return pd.Series(pd.NA, index=produtos_df.index, dtype="string")
+        return produtos_df[coluna].astype("string").str.strip()
+
+    Produtos = pd.DataFrame({
+        "gtin": _texto("GTIN").str.replace(r"\.0$", "", regex=True).str.zfill(14),
+        "id_produto": _texto("codigo_interno_produto").str.replace(r"\.0$", "", regex=True),
+        "descricao": _texto("descricao_produto"),
+        "fabricante": _texto("nome_fantasia_fabricante"),
+        "apresentacao": _texto("apresentacao_produto"),
+        "tipo": _texto("tipo"),
+    })
+
+    motivos = pd.Series(pd.NA, index=Produtos.index, dtype="string")
+    def _rejeitar(mascara, motivo):
+        motivos[mascara.fillna(False).astype(bool) & motivos.isna()] = motivo
+
+    _rejeitar(Produtos["gtin"].isna(), "GTIN vazio")
+    _rejeitar(~Produtos["gtin"].str.fullmatch(r"\d{14}").fillna(False).astype(bool), "GTIN não numérico ou com mais de 14 dígitos")
+    _rejeitar(Produtos["id_produto"].isna() | (Produtos["id_produto"] == ""), "codigo_interno_produto vazio")
+    for coluna, limite in _LIMITES_PRODUTOS.items():
+        _rejeitar(Produtos[coluna].str.len() > limite, f"{coluna} com mais de {limite} caracteres")
+    _rejeitar(Produtos.duplicated(subset=["id_produto", "gtin"]), "repetido no lote (mesmo código e GTIN)")
+
+    rejeitar = motivos.notna()
+    Rejeitados = pd.DataFrame({
+        "GTIN": Produtos.loc[rejeitar, "gtin"],
+        "codigo_interno_produto": Produtos.loc[rejeitar, "id_produto"],
+        "motivo": motivos[rejeitar],
+    }).reset_index(drop=True)
+    return Produtos[~rejeitar], Rejeitados
+
+def _executemany_isolando_erros(cursor, sql, linhas, rotulos, idas):
+    """
+    Função auxiliar privada. executemany de 'linhas' protegido por um
+    SAVEPOINT. Se o banco recusar o lote por erro de dado (IntegrityError/
+    DataError), desfaz até o savepoint e divide o lote ao meio, até isolar as
+    linhas com erro. Erros de conexão sobem. Retorna [(rotulo, motivo)] das
+    linhas recusadas; 'idas' (lista de 1 elemento) conta as idas ao banco.
+    """
+    if not linhas:
+        return []
+    cursor.execute("SAVEPOINT lote_produtos")
+    idas[0] += 2
+    try:
+        cursor.executemany(sql, linhas)
+        return []
+    except (mdb.IntegrityError, mdb.DataError) as e:
+        cursor.execute("ROLLBACK TO SAVEPOINT lote_produtos")
+        idas[0] += 1
+        if len(linhas) == 1:
+            return [(rotulos[0], str(e))]
+        meio = len(linhas) // 2
+        return (
+            _executemany_isolando_erros(cursor, sql, linhas[:meio], rotulos[:meio], idas)
+            + _executemany_isolando_erros(cursor, sql, linhas[meio:], rotulos[meio:], idas)
+        )
+
+# Consultas dos caminhos quentes ficam em constantes para o utils/verificar_planos.py
+# conferir os planos de execução exatamente do SQL que roda aqui
+_SQL_GTINS_DA_LISTA = "SELECT gtin FROM bronze_menorPreco_produtos WHERE DATE(data_insercao) = %s"
+
+def coletar_produtos_no_banco(DB_CONFIG, data_insercao=None):
     """
     Coleta os GTINs da lista de produtos do dia.
+    'data_insercao': data da lista mais recente, se já conhecida (ex.: o
+    'pegar_ultima_att_gtins' do prefetch); sem ela, o MAX é consultado aqui.
     """
     print("##### COLETANDO OS PRODUTOS NO BANCO #####")
     logging.info("##### COLETANDO OS PRODUTOS NO BANCO #####")
@@ -165,21 +333,24 @@ def coletar_produtos_no_banco(DB_CONFIG):
     conn = _conectar_db(DB_CONFIG)
     cursor = conn.cursor()
 
-    sql_data = "SELECT MAX(data_insercao) FROM bronze_menorPreco_produtos"
-    cursor.execute(sql_data)
-    maior_data = cursor.fetchone()
-    data_obj = maior_data[0] if maior_data else None
+    data_obj = data_insercao
+    if data_obj is None:
+        sql_data = "SELECT MAX(data_insercao) FROM bronze_menorPreco_produtos"
+        cursor.execute(sql_data)
+        maior_data = cursor.fetchone()
+        data_obj = maior_data[0] if maior_data else None
 
     if not data_obj:
         logging.error("Nenhuma data de atualização encontrada. Tabela de produtos pode estar vazia.")
+        cursor.close()
+        conn.close()
         return pd.DataFrame(columns=["gtin"]) 
     
     # Converte para objeto date se for datetime
     if isinstance(data_obj, datetime):
         data_obj = data_obj.date()
 
-    sql_gtin = "SELECT gtin FROM bronze_menorPreco_produtos WHERE DATE(data_insercao) = %s"
-    cursor.execute(sql_gtin, (data_obj,)) 
+    cursor.execute(_SQL_GTINS_DA_LISTA, (data_obj,))
     gtins = cursor.fetchall()
     
     cursor.close()
@@ -221,24 +392,8 @@ def fetch_gtins_principais(DB_CONFIG, codigos_internos_list):
         cursor.close()
         conn.close()
 
-def atualizar_fabricantes_via_iqvia(DB_CONFIG, lista_gtins):
-    """
-    Atualiza o fabricante usando a base IQVIA apenas para os GTINs fornecidos.
-    """
-    if not lista_gtins:
-        logging.info("Nenhum GTIN para atualizar via IQVIA.")
-        return
-
-    print(f"##### 🧬 ENRIQUECENDO {len(lista_gtins)} PRODUTOS COM BASE IQVIA #####")
-    logging.info(f"##### ENRIQUECENDO {len(lista_gtins)} PRODUTOS COM BASE IQVIA #####")
-
-    conn = _conectar_db(DB_CONFIG)
-    cursor = conn.cursor()
-
-    format_strings = ','.join(['%s'] * len(lista_gtins))
-
-    # MUDANÇA: Referência explicita a data_insercao no SET, conforme solicitado.
-    sql = f"""
+# '{gtins}': um placeholder %s por GTIN
+_SQL_FABRICANTES_IQVIA = """
     UPDATE bronze_menorPreco_produtos mp
     INNER JOIN (
         SELECT 
@@ -255,8 +410,27 @@ def atualizar_fabricantes_via_iqvia(DB_CONFIG, lista_gtins):
     WHERE 
         iq.fabricante_iqvia IS NOT NULL 
         AND iq.fabricante_iqvia <> ''
-        AND mp.gtin IN ({format_strings});
+        AND mp.gtin IN ({gtins});
+"""
+
+def atualizar_fabricantes_via_iqvia(DB_CONFIG, lista_gtins):
+    """
+    Atualiza o fabricante usando a base IQVIA apenas para os GTINs fornecidos.
     """
+    if not lista_gtins:
+        logging.info("Nenhum GTIN para atualizar via IQVIA.")
+        return
+
+    print(f"##### 🧬 ENRIQUECENDO {len(lista_gtins)} PRODUTOS COM BASE IQVIA #####")
+    logging.info(f"##### ENRIQUECENDO {len(lista_gtins)} PRODUTOS COM BASE IQVIA #####")
+
+    conn = _conectar_db(DB_CONFIG)
+    cursor = conn.cursor()
+
+    format_strings = ','.join(['%s'] * len(lista_gtins))
+
+    # MUDANÇA: Referência explicita a data_insercao no SET, conforme solicitado.
+    sql = _SQL_FABRICANTES_IQVIA.format(gtins=format_strings)
 
     try:
         start_time = time.time()
@@ -278,17 +452,7 @@ def atualizar_fabricantes_via_iqvia(DB_CONFIG, lista_gtins):
 # SEÇÃO DE LOJAS E GEOHASH
 # ============================================
 
-def pegar_geohashs_BD(DB_CONFIG):
-    """
-    Coleta os Geohashs das cidades onde temos lojas ativas no 'COMPARADOR DE PREÇOS'.
-    """
-    print("##### PEGANDO GEOHASHS #####")
-    logging.info("##### PEGANDO GEOHASHS #####")
-
-    conn = _conectar_db(DB_CONFIG)
-    cursor = conn.cursor()
-
-    sql = """
+_SQL_GEOHASHS = """
         WITH auditorias_filtradas AS (
             SELECT DISTINCT userEmail
             FROM dbSults.tb_report_auditoria_embedded
@@ -308,9 +472,19 @@ def pegar_geohashs_BD(DB_CONFIG):
             ON b.cidade COLLATE utf8mb4_uca1400_ai_ci = p.cidade_normalizada COLLATE utf8mb4_uca1400_ai_ci
         GROUP BY 
             p.geohash; 
+"""
+
+def pegar_geohashs_BD(DB_CONFIG):
     """
-    
-    cursor.execute(sql)
+    Coleta os Geohashs das cidades onde temos lojas ativas no 'COMPARADOR DE PREÇOS'.
+    """
+    print("##### PEGANDO GEOHASHS #####")
+    logging.info("##### PEGANDO GEOHASHS #####")
+
+    conn = _conectar_db(DB_CONFIG)
+    cursor = conn.cursor()
+
+    cursor.execute(_SQL_GEOHASHS)
     geohash = cursor.fetchall()
     print(f"##### { len(geohash)} GEOHASHS COLETADOS NO BANCO #####")
     logging.info(f"##### { len(geohash)} GEOHASHS COLETADOS NO BANCO #####")
@@ -341,10 +515,43 @@ def coletar_lojas_do_banco(DB_CONFIG):
     Lojas = pd.DataFrame(lista_lojas, columns=["id_loja"])
     return Lojas
 
+def coletar_lojas_sem_coordenadas(DB_CONFIG, limite):
+    """
+    Coleta até 'limite' lojas cadastradas sem latitude/longitude (as gravadas
+    "cruas" pelos workers), já com o 'endereco' do Nominatim. As tentadas há mais
+    tempo vêm primeiro, para uma loja não encontrada não ocupar o limite todo dia.
+    """
+    conn = _conectar_db(DB_CONFIG)
+    cursor = conn.cursor()
+
+    sql = """
+        SELECT
+            id_loja, nome_fantasia, razao_social, logradouro, cidade, geohash,
+            CONCAT(COALESCE(logradouro, ''), ', ', COALESCE(cidade, ''), ', PR, Brasil') AS endereco
+        FROM bronze_menorPreco_lojas
+        WHERE latitude IS NULL OR longitude IS NULL
+        ORDER BY data_atualizacao
+        LIMIT %s
+    """
+    cursor.execute(sql, (limite,))
+    lista_lojas = cursor.fetchall()
+    colunas = [desc[0] for desc in cursor.description]
+    cursor.close()
+    conn.close()
+
+    return pd.DataFrame(lista_lojas, columns=colunas)
+
+# Colunas da carga de lojas, na ordem do INSERT
+_COLUNAS_CARGA_LOJAS = [
+    "id_loja", "nome_fantasia", "razao_social", "logradouro", "Latitude", "Longitude", "cidade", "geohash",
+]
+
 def inserir_lojas_sc(Lojas_SC, now_obj, DB_CONFIG):
     """
     (ETL - Load) Insere um DataFrame de lojas novas (sem cadastro) no banco.
-    Usa INSERT IGNORE para evitar falhas com duplicatas.
+    Lojas já cadastradas só têm coordenadas/geohash atualizados (coordenada
+    nula não apaga a que já existe).
+    Grava em blocos, com commit e retentativa por bloco (ver batch_writer).
     """
     print("##### INSERINDO LOJAS NÃO CADASTRADAS #####")
     logging.info("##### INSERINDO LOJAS NÃO CADASTRADAS #####")
@@ -354,8 +561,27 @@ def inserir_lojas_sc(Lojas_SC, now_obj, DB_CONFIG):
         logging.info("##### NENHUMA LOJA NOVA PARA INSERIR. #####")
         return
 
-    conn = _conectar_db(DB_CONFIG)
-    cursor = conn.cursor()
+    try:
+        start_time = time.time()
+        print(f"Iniciando 'executemany' para {len(Lojas_SC)} lojas...")
+        
+        afetadas = gravar_em_blocos(
+            DB_CONFIG, Lojas_SC, "bronze_menorPreco_lojas", "id_loja", _COLUNAS_CARGA_LOJAS,
+            _executar_lojas_executemany, ids=("id_loja",)
+        )
+        end_time = time.time()
+        
+        print(f"Commit de {len(Lojas_SC)} lojas concluído. Tempo: {end_time - start_time:.2f} segundos.")
+        print(f"##### {afetadas} (Reportado pelo driver) NOVAS LOJAS INSERIDAS #####")
+        logging.info(f"##### {afetadas} (Reportado pelo driver) NOVAS LOJAS INSERIDAS #####")
+
+    except Exception as e:
+        print(f"❌ Erro no 'executemany' de lojas: {e}")
+        logging.error(f"❌ Erro no 'executemany' de lojas: {e}", exc_info=True)
+        raise e
+
+def _executar_lojas_executemany(cursor, Lojas_SC, linhas):
+    """Função auxiliar privada. INSERT de um bloco de lojas (o commit é do batch_writer)."""
     Lojas_SC = Lojas_SC.astype(object).where(pd.notnull(Lojas_SC), None)
 
     data_tuples = [
@@ -373,37 +599,19 @@ def inserir_lojas_sc(Lojas_SC, now_obj, DB_CONFIG):
         (id_loja, nome_fantasia, razao_social, logradouro, latitude, longitude, cidade, geohash, data_atualizacao)
         VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW())
         ON DUPLICATE KEY UPDATE
-            latitude = VALUES(latitude),
-            longitude = VALUES(longitude),
+            latitude = COALESCE(VALUES(latitude), latitude),
+            longitude = COALESCE(VALUES(longitude), longitude),
             geohash = VALUES(geohash),
             data_atualizacao = NOW();
     """
-
-    try:
-        start_time = time.time()
-        print(f"Iniciando 'executemany' para {len(data_tuples)} lojas...")
-        
-        cursor.executemany(sql, data_tuples)
-        conn.commit()
-        end_time = time.time()
-        
-        print(f"Commit de {len(data_tuples)} lojas concluído. Tempo: {end_time - start_time:.2f} segundos.")
-        print(f"##### {cursor.rowcount} (Reportado pelo driver) NOVAS LOJAS INSERIDAS #####")
-        logging.info(f"##### {cursor.rowcount} (Reportado pelo driver) NOVAS LOJAS INSERIDAS #####")
-
-    except Exception as e:
-        print(f"❌ Erro no 'executemany' de lojas: {e}")
-        logging.error(f"❌ Erro no 'executemany' de lojas: {e}", exc_info=True)
-        conn.rollback()
-        raise e 
-    finally:
-        cursor.close()
-        conn.close()
+    cursor.executemany(sql, data_tuples)
     
 # ============================================
 # SEÇÃO DE NOTAS FISCAIS
 # ============================================
 
+_SQL_ULTIMO_GTIN = "SELECT gtin FROM bronze_menorPreco_notas ORDER BY data_atualizacao DESC LIMIT 1"
+
 def pegar_ultimo_gtin(DB_CONFIG):
     """
     Pega o GTIN da última nota fiscal PROCESSADA (data_atualizacao),
@@ -416,20 +624,151 @@ def pegar_ultimo_gtin(DB_CONFIG):
     cursor = conn.cursor()
     
     # ALTERAÇÃO AQUI: Mudamos de 'ORDER BY date' para 'ORDER BY data_atualizacao'
-    sql = "SELECT gtin FROM bronze_menorPreco_notas ORDER BY data_atualizacao DESC LIMIT 1"
-    
-    cursor.execute(sql)
+    cursor.execute(_SQL_ULTIMO_GTIN)
     dados = cursor.fetchone()
     cursor.close()
     conn.close()
 
-    gtin = dados[0] if dados else None 
+    gtin = dados[0] if dados else None
     return gtin
 
+# ============================================
+# SEÇÃO DE ESTADO DA ROTAÇÃO (mp_feeder_run_state)
+# ============================================
+
+_SQL_ESTADO_ROTACAO = """
+    SELECT id_estado, grupo, total_grupos, ultimo_gtin, data_lista_produtos, fim
+    FROM mp_feeder_run_state
+    ORDER BY id_estado DESC
+    LIMIT 1
+"""
+
+def pegar_estado_rotacao(DB_CONFIG):
+    """
+    Retorna o último grupo de GTINs concluído (dict com id_estado, grupo,
+    total_grupos, ultimo_gtin, data_lista_produtos e fim), lido pela chave primária.
+    Retorna None se a tabela estiver vazia ou não existir (migração v1_12
+    não aplicada): aí a rotação cai no 'pegar_ultimo_gtin'.
+    """
+    print("##### COLETANDO ESTADO DA ROTAÇÃO DE GRUPOS #####")
+    logging.info("##### COLETANDO ESTADO DA ROTAÇÃO DE GRUPOS #####")
+
+    conn = _conectar_db(DB_CONFIG)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(_SQL_ESTADO_ROTACAO)
+        dados = cursor.fetchone()
+    except mdb.Error as e:
+        if getattr(e, "errno", None) != 1146:
+            raise
+        logging.warning("ROTAÇÃO: tabela mp_feeder_run_state não existe (rode o init_db.py). Usando o último GTIN das notas.")
+        return None
+    finally:
+        cursor.close()
+        conn.close()
+
+    if not dados:
+        return None
+    id_estado, grupo, total_grupos, ultimo_gtin, data_lista_produtos, fim = dados
+    if isinstance(data_lista_produtos, datetime):
+        data_lista_produtos = data_lista_produtos.date()
+    return {
+        "id_estado": id_estado, "grupo": grupo, "total_grupos": total_grupos, "ultimo_gtin": ultimo_gtin,
+        "data_lista_produtos": data_lista_produtos, "fim": fim,
+    }
+
+def registrar_estado_rotacao(DB_CONFIG, grupo, inicio, fim, id_rodada=None):
+    """
+    Grava o fim de um grupo de GTINs: número do grupo, último GTIN, início/fim
+    e contadores ('grupo' é o dict montado na seleção do grupo). Com 'id_rodada'
+    (modo worker), só o primeiro worker a terminar a rodada grava.
+    Retorna True se o registro foi gravado por esta chamada.
+    """
+    conn = _conectar_db(DB_CONFIG)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            INSERT IGNORE INTO mp_feeder_run_state
+                (grupo, total_grupos, ultimo_gtin, data_lista_produtos, id_rodada,
+                 inicio, fim, consultas, notas, lojas)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, (
+            grupo["grupo"], grupo["total_grupos"], grupo["ultimo_gtin"], grupo["data_lista_produtos"], id_rodada,
+            inicio.replace(tzinfo=None), fim.replace(tzinfo=None),
+            grupo["consultas"], grupo["notas"], grupo["lojas"],
+        ))
+        gravado = cursor.rowcount == 1
+        conn.commit()
+    except mdb.Error as e:
+        if getattr(e, "errno", None) != 1146:
+            raise
+        logging.warning("ROTAÇÃO: tabela mp_feeder_run_state não existe (rode o init_db.py). Estado do grupo não gravado.")
+        return False
+    finally:
+        cursor.close()
+        conn.close()
+
+    if not gravado:
+        logging.info(f"ROTAÇÃO: rodada {id_rodada} já registrada por outro worker.")
+        return False
+
+    msg = (
+        f"ROTAÇÃO: grupo {grupo['grupo']}/{grupo['total_grupos']} concluído "
+        f"({grupo['consultas']} consultas, {grupo['notas']} notas, {grupo['lojas']} lojas)"
+    )
+    print(f"##### {msg} #####")
+    logging.info(msg)
+    return True
+
+def fetch_rendimento_pares(DB_CONFIG, dias=90):
+    """
+    Agrega o histórico recente da bronze_menorPreco_notas por (gtin, geohash):
+    notas retornadas, lojas distintas e preços distintos (proxy de mudanças de preço).
+    Usado pelo agendador para priorizar as consultas mais produtivas.
+    """
+    print("##### COLETANDO RENDIMENTO HISTÓRICO DOS PARES (GTIN, GEOHASH) #####")
+    logging.info("##### COLETANDO RENDIMENTO HISTÓRICO DOS PARES (GTIN, GEOHASH) #####")
+
+    conn = _conectar_db(DB_CONFIG)
+    cursor = conn.cursor()
+
+    sql = """
+        SELECT
+            gtin,
+            geohash,
+            COUNT(*) AS notas,
+            COUNT(DISTINCT id_loja) AS lojas,
+            COUNT(DISTINCT valor) AS precos
+        FROM bronze_menorPreco_notas
+        WHERE data_atualizacao >= (NOW() - INTERVAL %s DAY)
+          AND gtin IS NOT NULL AND geohash IS NOT NULL
+        GROUP BY gtin, geohash
+    """
+
+    cursor.execute(sql, (dias,))
+    dados = cursor.fetchall()
+    cursor.close()
+    conn.close()
+
+    print(f"##### {len(dados)} PARES COM HISTÓRICO NOS ÚLTIMOS {dias} DIAS #####")
+    logging.info(f"##### {len(dados)} PARES COM HISTÓRICO NOS ÚLTIMOS {dias} DIAS #####")
+    return pd.DataFrame(dados, columns=["gtin", "geohash", "notas", "lojas", "precos"])
+
+# Colunas da carga de notas, na ordem do INSERT (a coluna 'date' recebe o 'datahora')
+_COLUNAS_CARGA_NOTAS = [
+    "id_nota", "datahora", "id_loja", "geohash", "gtin",
+    "descricao", "valor_desconto", "valor_tabela", "valor", "cidade",
+]
+
 def inserir_notas(Notas, now_obj, DB_CONFIG):
     """
     (ETL - Load) Insere um DataFrame de notas fiscais no banco.
-    Usa INSERT IGNORE para evitar falhas com duplicatas.
+    Notas já existentes (id_nota) só têm o data_atualizacao renovado.
+    Grava em blocos, com commit e retentativa por bloco; uma carga retomada
+    pula os blocos já gravados (ver batch_writer).
+    Com CONFIG_CARGA['load_data'], cada bloco vai por LOAD DATA LOCAL INFILE
+    numa tabela de staging + um único INSERT ... SELECT; senão (ou se o
+    LOCAL INFILE estiver desabilitado), pelo executemany.
     """
     print("##### INSERINDO NOTAS NO BANCO #####")
     logging.info("##### INSERINDO NOTAS NO BANCO #####")
@@ -439,9 +778,54 @@ def inserir_notas(Notas, now_obj, DB_CONFIG):
         logging.info("##### NENHUMA NOTA NOVA PARA INSERIR. #####")
         return
 
-    conn = _conectar_db(DB_CONFIG)
-    cursor = conn.cursor()
-    Notas = Notas.where(pd.notnull(Notas), None) 
+    try:
+        start_time = time.time()
+        print(f"Iniciando carga de {len(Notas)} notas...")
+
+        afetadas = gravar_em_blocos(
+            DB_CONFIG, Notas, "bronze_menorPreco_notas", "id_nota", _COLUNAS_CARGA_NOTAS,
+            _gravar_bloco_notas, ids=("id_nota", "id_loja"), gtins=("gtin",),
+            local_infile=_usar_load_data()
+        )
+        end_time = time.time()
+
+        _registrar_vazao_carga("LOAD DATA" if _usar_load_data() else "executemany", len(Notas), end_time - start_time)
+        print(f"##### {afetadas} (Reportado pelo driver) NOVAS NOTAS INSERIDAS #####")
+        logging.info(f"##### {afetadas} (Reportado pelo driver) NOVAS NOTAS INSERIDAS #####")
+
+    except Exception as e:
+        print(f"❌ Erro na carga de notas: {e}")
+        logging.error(f"❌ Erro na carga de notas: {e}", exc_info=True)
+        raise e
+
+def _usar_load_data():
+    """Função auxiliar privada."""
+    return CONFIG_CARGA["load_data"] and not _load_data_indisponivel
+
+def _gravar_bloco_notas(cursor, bloco, linhas):
+    """Função auxiliar privada. Grava um bloco de notas pelo LOAD DATA ou pelo executemany."""
+    global _load_data_indisponivel
+
+    if _usar_load_data():
+        try:
+            _executar_notas_load_data(cursor, linhas)
+            return
+        except mdb.Error as e:
+            if not _erro_local_infile(e):
+                raise
+            # Desabilitado no servidor ou no cliente: não adianta tentar de novo neste processo
+            _load_data_indisponivel = True
+            print(f"##### ⚠️ LOAD DATA LOCAL INFILE INDISPONÍVEL ({e}). USANDO EXECUTEMANY. #####")
+            logging.warning(f"##### ⚠️ LOAD DATA LOCAL INFILE INDISPONÍVEL ({e}). USANDO EXECUTEMANY. #####")
+
+    _executar_notas_executemany(cursor, bloco)
+
+def _executar_notas_executemany(cursor, Notas):
+    """Função auxiliar privada. INSERT linha a linha (executemany + ON DUPLICATE KEY UPDATE), sem commit."""
+    # 'datahora' vai ao driver como datetime nativo (o MariaDB não precisa reinterpretar texto)
+    if "datahora" in Notas.columns and pd.api.types.is_datetime64_any_dtype(Notas["datahora"]):
+        Notas = Notas.assign(datahora=pd.Series(Notas["datahora"].dt.to_pydatetime(), index=Notas.index, dtype=object))
+    Notas = Notas.astype(object).where(pd.notnull(Notas), None) 
 
     data_tuples = []
     for row in Notas.itertuples(index=False):
@@ -461,24 +845,234 @@ def inserir_notas(Notas, now_obj, DB_CONFIG):
         ON DUPLICATE KEY UPDATE
             data_atualizacao = NOW();
     """
+    cursor.executemany(sql, data_tuples)
 
+def _executar_notas_load_data(cursor, linhas):
+    """
+    Função auxiliar privada. Carga em lote, sem commit: grava as linhas (já
+    em TSV, ver batch_writer.campos_texto) num arquivo temporário, carrega
+    numa tabela temporária da conexão e faz o upsert com um único
+    INSERT ... SELECT. A tabela temporária some quando a conexão volta ao
+    pool (reset da sessão).
+    """
+    descritor, arquivo = tempfile.mkstemp(prefix="mp_feeder_notas_", suffix=".tsv")
     try:
-        start_time = time.time()
-        print(f"Iniciando 'executemany' para {len(data_tuples)} notas...")
-        
-        cursor.executemany(sql, data_tuples)
+        with os.fdopen(descritor, "w", encoding="utf-8", newline="\n") as f:
+            f.write("\n".join(linhas.tolist()))
+            f.write("\n")
+
+        cursor.execute("""
+            CREATE TEMPORARY TABLE IF NOT EXISTS tmp_carga_notas (
+                id_nota varchar(120) NOT NULL,
+                date datetime DEFAULT NULL,
+                id_loja varchar(50) DEFAULT NULL,
+                geohash varchar(12) DEFAULT NULL,
+                gtin varchar(14) DEFAULT NULL,
+                descricao varchar(120) DEFAULT NULL,
+                valor_desconto decimal(10,2) DEFAULT NULL,
+                valor_tabela decimal(10,2) DEFAULT NULL,
+                valor decimal(10,2) DEFAULT NULL,
+                cidade varchar(50) DEFAULT NULL
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """)
+        cursor.execute("TRUNCATE TABLE tmp_carga_notas")
+
+        # Barras normais funcionam também no Windows; aspas no caminho são escapadas
+        caminho_sql = arquivo.replace("\\", "/").replace("'", "\\'")
+        cursor.execute(f"""
+            LOAD DATA LOCAL INFILE '{caminho_sql}'
+            INTO TABLE tmp_carga_notas
+            CHARACTER SET utf8mb4
+            FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'
+            LINES TERMINATED BY '\\n'
+            (id_nota, date, id_loja, geohash, gtin, descricao, valor_desconto, valor_tabela, valor, cidade)
+        """)
+        if cursor.rowcount != len(linhas):
+            logging.warning(f"LOAD DATA: {len(linhas)} notas no arquivo, {cursor.rowcount} carregadas na staging.")
+
+        cursor.execute("""
+            INSERT INTO bronze_menorPreco_notas
+            (id_nota, date, id_loja, geohash, gtin, descricao, valor_desconto, valor_tabela, valor, cidade, data_atualizacao)
+            SELECT id_nota, date, id_loja, geohash, gtin, descricao, valor_desconto, valor_tabela, valor, cidade, NOW()
+            FROM tmp_carga_notas
+            ON DUPLICATE KEY UPDATE
+                data_atualizacao = NOW()
+        """)
+    finally:
+        os.remove(arquivo)
+
+def _erro_local_infile(erro):
+    """
+    Função auxiliar privada. True se o erro for do LOCAL INFILE desabilitado
+    (no servidor: 'local_infile=OFF'; no cliente: opção não habilitada).
+    """
+    texto = str(erro).lower()
+    return getattr(erro, "errno", None) in (1148, 2068, 3948, 4166) or "local infile" in texto or "local_infile" in texto or "not allowed" in texto
+
+def _registrar_vazao_carga(metodo, linhas, segundos):
+    """Função auxiliar privada. Loga linhas/segundo de um caminho de carga."""
+    vazao = linhas / segundos if segundos > 0 else float("inf")
+    msg = f"CARGA NOTAS ({metodo}): {linhas} notas em {segundos:.2f}s ({vazao:,.0f} notas/s)"
+    print(f"##### {msg} #####")
+    logging.info(msg)
+
+# ============================================
+# SEÇÃO DA FILA DE CONSULTAS (WORKERS)
+# ============================================
+
+def popular_fila_consultas(DB_CONFIG, Consultas, id_rodada):
+    """
+    Grava as consultas da rodada (plano do query_plan) na fila compartilhada
+    (mp_feeder_fila_consultas).
+    Só o primeiro worker popula: os demais encontram a rodada pronta e apenas
+    consomem. Um lock nomeado (GET_LOCK) evita que dois workers populem juntos.
+    Retorna o total de consultas da rodada na fila.
+    """
+    print(f"##### PREPARANDO FILA DE CONSULTAS DA RODADA {id_rodada} #####")
+    logging.info(f"##### PREPARANDO FILA DE CONSULTAS DA RODADA {id_rodada} #####")
+
+    conn = _conectar_db(DB_CONFIG)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT GET_LOCK(%s, 60)", (f"mp_feeder_fila_{id_rodada}",))
+        if cursor.fetchone()[0] != 1:
+            raise Exception(f"Não foi possível obter o lock da fila da rodada {id_rodada}.")
+
+        # Rodadas paradas há mais de 7 dias não servem mais para nada
+        cursor.execute(
+            "DELETE FROM mp_feeder_fila_consultas WHERE id_rodada <> %s AND data_atualizacao < NOW() - INTERVAL 7 DAY",
+            (id_rodada,)
+        )
         conn.commit()
-        end_time = time.time()
-        
-        print(f"Commit de {len(data_tuples)} notas concluído. Tempo: {end_time - start_time:.2f} segundos.")
-        print(f"##### {cursor.rowcount} (Reportado pelo driver) NOVAS NOTAS INSERIDAS #####")
-        logging.info(f"##### {cursor.rowcount} (Reportado pelo driver) NOVAS NOTAS INSERIDAS #####")
+        cursor.execute("SELECT COUNT(*) FROM mp_feeder_fila_consultas WHERE id_rodada = %s", (id_rodada,))
+        total = cursor.fetchone()[0]
 
+        if total == 0 and not Consultas.empty:
+            # O plano é lido em blocos: a lista inteira de consultas nunca fica em memória
+            data_tuples = []
+            for indice, gtin, geohash in Consultas.consultas():
+                data_tuples.append((id_rodada, int(indice), str(gtin), str(geohash)))
+                if len(data_tuples) >= 10000:
+                    cursor.executemany(
+                        "INSERT IGNORE INTO mp_feeder_fila_consultas (id_rodada, indice, gtin, geohash) VALUES (%s, %s, %s, %s)",
+                        data_tuples
+                    )
+                    data_tuples = []
+            if data_tuples:
+                cursor.executemany(
+                    "INSERT IGNORE INTO mp_feeder_fila_consultas (id_rodada, indice, gtin, geohash) VALUES (%s, %s, %s, %s)",
+                    data_tuples
+                )
+            conn.commit()
+            total = len(Consultas)
+            print(f"##### {total} CONSULTAS ENFILEIRADAS #####")
+            logging.info(f"##### {total} CONSULTAS ENFILEIRADAS NA RODADA {id_rodada} #####")
+        else:
+            print(f"##### RODADA {id_rodada} JÁ ESTÁ NA FILA ({total} CONSULTAS) #####")
+            logging.info(f"##### RODADA {id_rodada} JÁ ESTÁ NA FILA ({total} CONSULTAS) #####")
+
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (f"mp_feeder_fila_{id_rodada}",))
+        cursor.fetchone()
+        return total
+    except Exception as e:
+        conn.rollback()
+        logging.error(f"❌ Erro ao popular a fila de consultas: {e}", exc_info=True)
+        raise e
+    finally:
+        cursor.close()
+        conn.close()
+
+def reservar_lote_fila(DB_CONFIG, id_rodada, worker, tamanho_lote=50, visibilidade_segundos=600):
+    """
+    Reserva (lease) até 'tamanho_lote' consultas pendentes, ou cujo lease venceu
+    (worker morto), por 'visibilidade_segundos'. SKIP LOCKED deixa vários workers
+    reservarem ao mesmo tempo sem esperar uns pelos outros.
+    Retorna um DataFrame com as colunas gtin, geohash e index (vazio = nada disponível).
+    """
+    conn = _conectar_db(DB_CONFIG)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT indice, gtin, geohash
+            FROM mp_feeder_fila_consultas
+            WHERE id_rodada = %s
+              AND (status = 'pendente' OR (status = 'em_andamento' AND lease_ate < NOW()))
+            ORDER BY indice
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        """, (id_rodada, tamanho_lote))
+        linhas = cursor.fetchall()
+
+        if linhas:
+            indices = [linha[0] for linha in linhas]
+            placeholders = ', '.join(['%s'] * len(indices))
+            cursor.execute(f"""
+                UPDATE mp_feeder_fila_consultas
+                SET status = 'em_andamento', worker = %s,
+                    lease_ate = NOW() + INTERVAL %s SECOND, tentativas = tentativas + 1
+                WHERE id_rodada = %s AND indice IN ({placeholders})
+            """, (worker, visibilidade_segundos, id_rodada, *indices))
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        logging.error(f"❌ Erro ao reservar lote da fila: {e}", exc_info=True)
+        raise e
+    finally:
+        cursor.close()
+        conn.close()
+
+    return pd.DataFrame(
+        [(gtin, geohash, indice) for indice, gtin, geohash in linhas],
+        columns=["gtin", "geohash", "index"]
+    )
+
+def concluir_lote_fila(DB_CONFIG, id_rodada, worker, indices_concluidos, indices_devolvidos):
+    """
+    Marca como concluídas as consultas já gravadas e devolve à fila (pendente)
+    as que o worker não chegou a resolver. Só altera linhas ainda reservadas por
+    este worker: se o lease venceu e outro worker pegou a consulta, ela é dele.
+    """
+    conn = _conectar_db(DB_CONFIG)
+    cursor = conn.cursor()
+    try:
+        for status, indices in (("concluida", indices_concluidos), ("pendente", indices_devolvidos)):
+            if not indices:
+                continue
+            placeholders = ', '.join(['%s'] * len(indices))
+            cursor.execute(f"""
+                UPDATE mp_feeder_fila_consultas
+                SET status = %s, lease_ate = NULL
+                WHERE id_rodada = %s AND worker = %s AND status = 'em_andamento'
+                  AND indice IN ({placeholders})
+            """, (status, id_rodada, worker, *[int(i) for i in indices]))
+        conn.commit()
     except Exception as e:
-        print(f"❌ Erro no 'executemany': {e}")
-        logging.error(f"❌ Erro no 'executemany': {e}", exc_info=True)
         conn.rollback()
+        logging.error(f"❌ Erro ao concluir lote da fila: {e}", exc_info=True)
         raise e
     finally:
         cursor.close()
-        conn.close()
\ No newline at end of file
+        conn.close()
+
+def contar_fila(DB_CONFIG, id_rodada):
+    """
+    Retorna quantas consultas da rodada estão em cada situação:
+    {'pendente', 'em_andamento', 'concluida', 'lease_vencido'}.
+    """
+    conn = _conectar_db(DB_CONFIG)
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT
+            SUM(status = 'pendente'),
+            SUM(status = 'em_andamento' AND lease_ate >= NOW()),
+            SUM(status = 'concluida'),
+            SUM(status = 'em_andamento' AND lease_ate < NOW())
+        FROM mp_feeder_fila_consultas
+        WHERE id_rodada = %s
+    """, (id_rodada,))
+    linha = cursor.fetchone()
+    cursor.close()
+    conn.close()
+
+    chaves = ("pendente", "em_andamento", "concluida", "lease_vencido")
+    return {chave: int(valor or 0) for chave, valor in zip(chaves, linha)}
@@ -0,0 +1,286 @@
+# db_pool.py
+import logging
+import threading
+import time
+
+from MP_Feeder.startup import sob_demanda
+
+mdb = sob_demanda("mariadb")
+
+# ============================================
+# CONFIGURAÇÃO
+# ============================================
+
+# tamanho: conexões mantidas por banco | validar_apos_segundos: conexão ociosa há mais
+# tempo que isso leva um ping (e reconnect) antes de ser entregue |
+# espera_segundos: tempo máximo esperando uma conexão livre antes de abrir uma avulsa
+CONFIG_POOL = {"tamanho": 5, "validar_apos_segundos": 30, "espera_segundos": 30}
+
+# A validação nativa do mariadb.ConnectionPool fica desligada (intervalo enorme, em ms):
+# o ping/reconnect é feito aqui, para poder contar as reconexões e tratar a falha.
+_VALIDACAO_NATIVA_MS = 24 * 60 * 60 * 1000
+
+_pools = {}
+_lock = threading.Lock()
+
+
+def configurar_pool(tamanho=None, validar_apos_segundos=None, espera_segundos=None):
+    """
+    Ajusta o pool. Deve ser chamado antes da primeira conexão
+    (os pools são criados com a configuração vigente).
+    """
+    with _lock:
+        if tamanho is not None:
+            CONFIG_POOL["tamanho"] = tamanho
+        if validar_apos_segundos is not None:
+            CONFIG_POOL["validar_apos_segundos"] = validar_apos_segundos
+        if espera_segundos is not None:
+            CONFIG_POOL["espera_segundos"] = espera_segundos
+
+
+# ============================================
+# POOL POR BANCO
+# ============================================
+
+class _PoolBanco:
+    """
+    Um mariadb.ConnectionPool por (host, porta, usuário, banco), preenchido sob
+    demanda: a conexão só é aberta quando não há nenhuma livre e o pool ainda
+    não chegou no tamanho. Um semáforo limita as conexões em uso ao tamanho do
+    pool (quem passar disso espera em vez de receber PoolError).
+    """
+
+    def __init__(self, nome, DB_CONFIG, database, local_infile=False):
+        self.argumentos = {**DB_CONFIG, "database": database}
+        if local_infile:
+            self.argumentos["local_infile"] = True
+        self.tamanho = CONFIG_POOL["tamanho"]
+        self.validar_apos_segundos = CONFIG_POOL["validar_apos_segundos"]
+        self.espera_segundos = CONFIG_POOL["espera_segundos"]
+        self.pool = mdb.ConnectionPool(
+            pool_name=nome,
+            pool_size=self.tamanho,
+            pool_reset_connection=True,
+            pool_validation_interval=_VALIDACAO_NATIVA_MS,
+        )
+        self._vagas = threading.BoundedSemaphore(self.tamanho)
+        self._ultimo_uso = {}
+        self._lock = threading.Lock()
+        # Serializa get/add no mariadb.ConnectionPool: sem ele, a conexão recém-adicionada
+        # pode ser pega por outra thread entre o add_connection e o get_connection
+        self._lock_pool = threading.Lock()
+        self.stats = {
+            "aquisicoes": 0, "tempo_aquisicao": 0.0, "maior_aquisicao": 0.0,
+            "em_uso": 0, "pico_em_uso": 0,
+            "conexoes_novas": 0, "reconexoes": 0, "conexoes_avulsas": 0,
+        }
+
+    def obter(self):
+        inicio = time.perf_counter()
+        if not self._vagas.acquire(timeout=self.espera_segundos):
+            # Alguém segurou conexões demais (vazamento?): não trava a rodada por isso
+            logging.warning(
+                f"POOL DB: nenhuma das {self.tamanho} conexões liberou em {self.espera_segundos}s. "
+                "Abrindo uma conexão avulsa."
+            )
+            conn = mdb.connect(**self.argumentos)
+            with self._lock:
+                self.stats["conexoes_avulsas"] += 1
+            return ConexaoDB(conn, None)
+
+        try:
+            with self._lock_pool:
+                conn = self._conexao_livre()
+            nova = conn is None
+            if nova:
+                # O connect fica fora do lock (as threads abrem conexões em paralelo); o semáforo
+                # garante que o pool não passa do tamanho
+                conexao_nova = mdb.connect(**self.argumentos)
+                with self._lock_pool:
+                    self.pool.add_connection(conexao_nova)
+                    conn = self._conexao_livre()
+            if conn is None:
+                raise mdb.PoolError(f"POOL DB: nenhuma conexão livre no pool de {self.argumentos['database']}")
+            if nova:
+                with self._lock:
+                    self.stats["conexoes_novas"] += 1
+            else:
+                self._validar(conn)
+        except BaseException:
+            self._vagas.release()
+            raise
+
+        duracao = time.perf_counter() - inicio
+        with self._lock:
+            self.stats["aquisicoes"] += 1
+            self.stats["tempo_aquisicao"] += duracao
+            self.stats["maior_aquisicao"] = max(self.stats["maior_aquisicao"], duracao)
+            self.stats["em_uso"] += 1
+            self.stats["pico_em_uso"] = max(self.stats["pico_em_uso"], self.stats["em_uso"])
+            em_uso = self.stats["em_uso"]
+        logging.debug(f"POOL DB: conexão obtida em {duracao * 1000:.1f} ms ({em_uso}/{self.tamanho} em uso)")
+        return ConexaoDB(conn, self)
+
+    def _conexao_livre(self):
+        """Função auxiliar privada. Conexão livre do pool, ou None se não houver."""
+        try:
+            return self.pool.get_connection()
+        except mdb.PoolError:
+            return None
+
+    def _validar(self, conn):
+        """
+        Função auxiliar privada. Health check: conexão ociosa há mais de
+        'validar_apos_segundos' leva um ping; se o servidor a derrubou
+        (wait_timeout, restart), reconecta. Se nem o reconnect funcionar,
+        devolve a conexão ao pool e propaga o erro.
+        """
+        with self._lock:
+            ultimo_uso = self._ultimo_uso.get(id(conn), 0.0)
+        if time.monotonic() - ultimo_uso < self.validar_apos_segundos:
+            return
+        try:
+            conn.ping()
+        except mdb.Error:
+            try:
+                conn.reconnect()
+            except mdb.Error:
+                conn.close()
+                raise
+            with self._lock:
+                self.stats["reconexoes"] += 1
+            logging.warning("POOL DB: conexão ociosa tinha caído e foi reconectada.")
+
+    def devolver(self, conn, validar=False):
+        with self._lock:
+            # 'validar': força o ping/reconnect no próximo uso (ex.: depois de um erro de conexão)
+            self._ultimo_uso[id(conn)] = float("-inf") if validar else time.monotonic()
+            self.stats["em_uso"] -= 1
+        try:
+            # Conexão de pool: o close() a devolve ao pool (com reset da sessão)
+            conn.close()
+        except mdb.Error as e:
+            if not validar:
+                raise
+            logging.warning(f"POOL DB: erro ao devolver conexão com problema ao pool: {e}")
+        finally:
+            self._vagas.release()
+
+
+class ConexaoDB:
+    """
+    Conexão emprestada do pool. Repassa tudo para a conexão do mariadb
+    (cursor, commit, rollback...); 'close()' a devolve ao pool. Se o código
+    esquecer o close() (ex.: exceção antes dele), ela volta ao pool quando
+    o objeto é descartado. Com 'pool' None (conexão avulsa), 'close()' fecha de fato.
+    """
+
+    def __init__(self, conn, pool):
+        self.__dict__["_conn"] = conn
+        self.__dict__["_pool"] = pool
+
+    def __getattr__(self, atributo):
+        return getattr(self._conexao(), atributo)
+
+    def __setattr__(self, atributo, valor):
+        setattr(self._conexao(), atributo, valor)
+
+    def _conexao(self):
+        """Função auxiliar privada."""
+        conn = self.__dict__.get("_conn")
+        if conn is None:
+            raise mdb.ProgrammingError("Conexão já devolvida ao pool")
+        return conn
+
+    def close(self):
+        conn = self.__dict__.pop("_conn", None)
+        if conn is None:
+            return
+        if self._pool is None:
+            conn.close()
+        else:
+            self._pool.devolver(conn)
+
+    def descartar(self):
+        """
+        Devolve a conexão depois de um erro (ex.: conexão perdida): no próximo
+        uso ela leva ping e, se preciso, reconnect.
+        """
+        conn = self.__dict__.pop("_conn", None)
+        if conn is None:
+            return
+        if self._pool is None:
+            try:
+                conn.close()
+            except mdb.Error:
+                pass
+        else:
+            self._pool.devolver(conn, validar=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+def conectar(DB_CONFIG, database="dbDrogamais", local_infile=False):
+    """
+    Retorna uma conexão do pool do banco (criando o pool na primeira chamada).
+    Use como antes: 'conn.cursor()', 'conn.commit()' e 'conn.close()'.
+    'local_infile=True' usa um pool à parte, com LOAD DATA LOCAL INFILE liberado no cliente.
+    """
+    chave = (DB_CONFIG.get("host"), DB_CONFIG.get("port"), DB_CONFIG.get("user"), database, local_infile)
+    with _lock:
+        pool = _pools.get(chave)
+        if pool is None:
+            pool = _PoolBanco(f"mp_feeder_{len(_pools) + 1}", DB_CONFIG, database, local_infile)
+            _pools[chave] = pool
+    return pool.obter()
+
+
+def fechar_pools():
+    """Fecha as conexões livres de todos os pools."""
+    with _lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.pool.close()
+
+
+# ============================================
+# ESTATÍSTICAS
+# ============================================
+
+def estatisticas_db():
+    """Retorna, por banco: aquisições, tempo de aquisição, uso do pool e reconexões."""
+    resultado = {}
+    with _lock:
+        pools = dict(_pools)
+    for (host, _porta, _usuario, database, local_infile), pool in pools.items():
+        with pool._lock:
+            stats = dict(pool.stats)
+        aquisicoes = stats["aquisicoes"]
+        stats["aquisicao_media"] = stats["tempo_aquisicao"] / aquisicoes if aquisicoes else 0.0
+        stats["tamanho"] = pool.tamanho
+        resultado[f"{database}@{host}" + (" (local_infile)" if local_infile else "")] = stats
+    return resultado
+
+
+def registrar_estatisticas_db():
+    """Imprime e loga o uso do pool de conexões com o banco."""
+    for banco, stats in estatisticas_db().items():
+        msg = (
+            f"POOL DB {banco}: {stats['aquisicoes']} aquisições, {stats['conexoes_novas']} conexões abertas, "
+            f"pico de {stats['pico_em_uso']}/{stats['tamanho']} em uso, {stats['reconexoes']} reconexões, "
+            f"{stats['conexoes_avulsas']} avulsas, aquisição média {stats['aquisicao_media'] * 1000:.1f} ms "
+            f"(máx. {stats['maior_aquisicao'] * 1000:.0f} ms)"
+        )
+        print(f"##### {msg} #####")
+        logging.info(msg)
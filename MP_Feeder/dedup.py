@@ -0,0 +1,109 @@
+# dedup.py
+import hashlib
+import logging
+import math
+from collections import Counter
+
+
+class FiltroBloom:
+    """
+    Filtro de Bloom simples (bytearray + double hashing com blake2b).
+    Pode dar falso positivo (na taxa configurada), nunca falso negativo.
+    """
+
+    def __init__(self, capacidade, taxa_falso_positivo=0.001):
+        self.num_bits = max(8, int(math.ceil(-capacidade * math.log(taxa_falso_positivo) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / capacidade * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    def adicionar(self, item):
+        """Adiciona o item. Retorna True se ele (provavelmente) ainda não estava no filtro."""
+        digest = hashlib.blake2b(str(item).encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        novo = False
+        for i in range(self.num_hashes):
+            posicao = (h1 + i * h2) % self.num_bits
+            byte, bit = posicao >> 3, 1 << (posicao & 7)
+            if not self.bits[byte] & bit:
+                self.bits[byte] |= bit
+                novo = True
+        return novo
+
+
+class VistosColeta:
+    """
+    Memória dos id_nota e id_loja já vistos NESTA coleta. Como os círculos de
+    geohashs vizinhos se sobrepõem, a mesma nota volta várias vezes; com isso
+    as repetições são descartadas antes de virar linha em qualquer buffer.
+
+    Os id_nota ficam num set exato até 'max_ids_exatos'; acima disso migram
+    para um filtro de Bloom ('capacidade_bloom', 'taxa_falso_positivo') para
+    limitar a memória em coletas muito longas. As repetições são contadas por geohash.
+    """
+
+    def __init__(self, max_ids_exatos=1000000, capacidade_bloom=20000000, taxa_falso_positivo=0.0001):
+        self.max_ids_exatos = max_ids_exatos
+        self.capacidade_bloom = capacidade_bloom
+        self.taxa_falso_positivo = taxa_falso_positivo
+
+        self._notas = set()
+        self._bloom = None
+        self._lojas = set()
+
+        self.notas_unicas = 0
+        self.notas_repetidas = Counter()  # geohash -> repetições de id_nota
+        self.lojas_repetidas = Counter()  # geohash -> repetições de id_loja sem cadastro
+
+    def nota_nova(self, id_nota, geohash):
+        """True na primeira vez que o id_nota aparece; conta a repetição caso contrário."""
+        if self._bloom is not None:
+            novo = self._bloom.adicionar(id_nota)
+        else:
+            novo = id_nota not in self._notas
+            if novo:
+                self._notas.add(id_nota)
+                if len(self._notas) > self.max_ids_exatos:
+                    self._migrar_para_bloom()
+
+        if novo:
+            self.notas_unicas += 1
+        else:
+            self.notas_repetidas[geohash] += 1
+        return novo
+
+    def loja_nova(self, id_loja, geohash):
+        """True na primeira vez que a loja (sem cadastro) aparece."""
+        if id_loja in self._lojas:
+            self.lojas_repetidas[geohash] += 1
+            return False
+        self._lojas.add(id_loja)
+        return True
+
+    def _migrar_para_bloom(self):
+        """Função auxiliar privada. Troca o set exato pelo filtro de Bloom."""
+        logging.warning(
+            f"DEDUP: mais de {self.max_ids_exatos} id_nota distintos. "
+            f"Migrando para filtro de Bloom (falso positivo ~{self.taxa_falso_positivo:.4%})."
+        )
+        self._bloom = FiltroBloom(self.capacidade_bloom, self.taxa_falso_positivo)
+        for id_nota in self._notas:
+            self._bloom.adicionar(id_nota)
+        self._notas = set()
+
+    def registrar_resumo(self, top=10):
+        """Imprime e loga quantas repetições foram descartadas (total e por geohash)."""
+        total_notas = sum(self.notas_repetidas.values())
+        total_lojas = sum(self.lojas_repetidas.values())
+        msg = (
+            f"DEDUP: {self.notas_unicas} notas únicas, {total_notas} notas repetidas e "
+            f"{total_lojas} lojas repetidas descartadas na leitura"
+            + (" (filtro de Bloom ativo)" if self._bloom is not None else "")
+        )
+        print(f"##### {msg} #####")
+        logging.info(msg)
+
+        for geohash, repetidas in self.notas_repetidas.most_common(top):
+            logging.info(
+                f"DEDUP {geohash}: {repetidas} notas repetidas, {self.lojas_repetidas.get(geohash, 0)} lojas repetidas"
+            )
@@ -1,26 +1,25 @@
 # error_handler.py
 import os
 import logging
-import pandas as pd
+from MP_Feeder.startup import sob_demanda
 
 # É preciso importar o mandarMSG aqui, pois este módulo é responsável por notificar
 from MP_Feeder.api_services import mandarMSG 
 from MP_Feeder.etl_utils import finalizar_indice # Precisamos disso para o handle_success
+from MP_Feeder.partial_store import salvar_parciais
+
+pd = sob_demanda("pandas")
 
 def save_partial_data(Notas_geral, Lojas_SC_geral, indice_para_salvar):
     """
-    Salva os DataFrames e o índice em arquivos CSV locais.
+    Salva os DataFrames (Parquet tipado, ver partial_store) e o índice em arquivos locais.
     """
-    arquivo_notas_parciais = "notas_parciais.csv"
-    arquivo_lojas_parciais = "lojas_parciais.csv"
+    arquivo_notas_parciais = "notas_parciais.parquet"
+    arquivo_lojas_parciais = "lojas_parciais.parquet"
     arquivo_indice = "ultimo_indice.txt"
     
     try:
-        if not Notas_geral.empty:
-            Notas_geral.to_csv(arquivo_notas_parciais, index=False)
-        
-        if not Lojas_SC_geral.empty:
-            Lojas_SC_geral.to_csv(arquivo_lojas_parciais, index=False)
+        salvar_parciais(Notas_geral, Lojas_SC_geral, arquivo_notas_parciais, arquivo_lojas_parciais)
         
         # Salva o índice de qualquer maneira
         with open(arquivo_indice, "w") as f:
@@ -29,13 +28,13 @@ def save_partial_data(Notas_geral, Lojas_SC_geral, indice_para_salvar):
         print(f"##### DADOS SALVOS EM {arquivo_notas_parciais} E ÍNDICE SALVO EM {indice_para_salvar} #####")
         logging.info(f"DADOS SALVOS EM {arquivo_notas_parciais} E ÍNDICE SALVO EM {indice_para_salvar}")
     
-    except Exception as e_csv:
-        print(f"❌❌ ERRO CRÍTICO AO SALVAR ARQUIVO CSV: {e_csv}")
-        logging.critical(f"ERRO CRÍTICO AO SALVAR ARQUIVO CSV: {e_csv}")
+    except Exception as e_parcial:
+        print(f"❌❌ ERRO CRÍTICO AO SALVAR DADOS PARCIAIS: {e_parcial}")
+        logging.critical(f"ERRO CRÍTICO AO SALVAR DADOS PARCIAIS: {e_parcial}")
 
 def handle_execution_error(e, Notas_geral, Lojas_SC_geral, indice_para_salvar, now_gmt3, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID):
     """
-    Handler principal de erros. Decide se salva CSVs e notifica.
+    Handler principal de erros. Decide se salva os dados parciais e notifica.
     """
     print(f"❌ Erro na execução: {e}")
     logging.error(f"❌ Erro na execução: {e}", exc_info=True) 
@@ -43,7 +42,7 @@ def handle_execution_error(e, Notas_geral, Lojas_SC_geral, indice_para_salvar, n
     # Se a falha foi de conexão com o banco E temos dados para salvar
     if ("connect" in str(e) or "10060" in str(e)) and (not Notas_geral.empty or not Lojas_SC_geral.empty):
         print("##### ❌ FALHA DE CONEXÃO COM O BANCO. SALVANDO DADOS PARCIAIS... #####")
-        logging.critical("FALHA DE CONEXÃO COM O BANCO. Salvando dados parciais em CSV.")
+        logging.critical("FALHA DE CONEXÃO COM O BANCO. Salvando dados parciais.")
         save_partial_data(Notas_geral, Lojas_SC_geral, indice_para_salvar)
     
     # Envia notificação de erro (exceto se for o erro de 'circuit break' que já notifica)
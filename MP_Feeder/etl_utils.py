@@ -1,9 +1,16 @@
 # etl_utils.py
-import pandas as pd
 import os
 import logging
 from datetime import datetime # <-- CORREÇÃO DE IMPORTAÇÃO
 
+from MP_Feeder.startup import sob_demanda
+from MP_Feeder.query_plan import PlanoConsultas
+
+pd = sob_demanda("pandas")
+
+# Tamanho dos grupos da rotação de GTINs (um grupo por execução)
+PRODUTOS_POR_GRUPO = 200
+
 def setup_logging():
     """
     Configura o logging para salvar em um arquivo com data/hora.
@@ -56,60 +63,51 @@ def finalizar_indice(arquivo_indice):
 # SEÇÃO DE LÓGICA DE NEGÓCIO E TRANSFORMAÇÃO
 # ============================================
 
-def transformar_dados_produtos(produtos_por_valor, produtos_por_qtd):
-    """
-    (ETL - Transform) Recebe os DataFrames brutos do banco e aplica
-    a lógica de merge, filtro e limpeza do Pandas.
-    """
-    print("3. Mesclando as duas bases de dados")
-    logging.info("3. Mesclando as duas bases de dados")
-    
-    Produtos = pd.merge(produtos_por_qtd, produtos_por_valor, how="inner")
-    Produtos.drop_duplicates(inplace=True)
-    
-    # Remove colunas desnecessárias do merge
-    Produtos.drop(columns=["valor_total", "qtd_total"], inplace=True, errors='ignore') 
-    
-    # Filtra GTINs inválidos ANTES de normalizar
-    Produtos = Produtos[Produtos["GTIN"] != "99999999999999"]
-    Produtos = Produtos[Produtos["GTIN"] != "88888888888888"]
-    Produtos = Produtos[Produtos["GTIN"] != "78000001"] # ENTREGA MOTOBOY
-    
-    # --- LÓGICA DE LIMPEZA CORRIGIDA ---
-    
-    # 1. Normaliza os GTINs para 14 dígitos (como string)
-    #    Removemos .0 se vier de um número
-    Produtos["GTIN"] = Produtos["GTIN"].astype(str).str.zfill(14)
-    
-    # 2. Dededuplica pela CHAVE PRIMÁRIA (GTIN) PRIMEIRO.
-    #    Isso garante que só temos 1 de cada gtin na lista.
-    Produtos.drop_duplicates(subset=['GTIN'], keep='first', inplace=True)
-    
-    # 3. AGORA sim, pega os 1000 melhores da lista limpa.
-    Produtos = Produtos.head(1600)
-    
-    print(f"Transformação concluída. Enviando {len(Produtos)} produtos únicos para carga.")
-    logging.info(f"Transformação concluída. Enviando {len(Produtos)} produtos únicos para carga.")
-    
-    return Produtos
-
-def grupo_eans_selecionados(EANs, ult_gtin, arquivo_indice):
+def grupo_eans_selecionados(EANs, ult_gtin, arquivo_indice, estado=None, data_lista=None):
     """
     Divide a lista de EANs em grupos e seleciona o próximo grupo a ser
-    executado, com base no último GTIN da execução anterior.
+    executado. Retorna (grupo, número do grupo começando em 1; 0 se não há EANs).
+
+    Com 'estado' (último grupo concluído, da mp_feeder_run_state) vai direto
+    para o grupo seguinte. Se a lista de produtos mudou desde então
+    ('data_lista'), continua a partir do grupo que tem o último GTIN do estado.
+    Sem estado (tabela vazia), usa o último GTIN da execução anterior.
     """
     logging.info("##### SELECIONANDO GRUPO DE GTINS #####")
 
-    produtos_por_grupo = 200
+    produtos_por_grupo = PRODUTOS_POR_GRUPO
     grupos = [
         EANs.iloc[i : i + produtos_por_grupo]
         for i in range(0, len(EANs), produtos_por_grupo)
     ]
-    
-    if ult_gtin is None or EANs.empty:
-        print("Nenhum GTIN anterior encontrado ou lista de EANs vazia. Retornando o primeiro grupo.")
-        logging.info("Nenhum GTIN anterior encontrado ou lista de EANs vazia. Retornando o primeiro grupo.")
-        return grupos[0] if grupos else pd.DataFrame(columns=["gtin"])
+    if not grupos:
+        print("Lista de EANs vazia.")
+        logging.info("Lista de EANs vazia.")
+        return pd.DataFrame(columns=["gtin"]), 0
+
+    if estado is not None:
+        if estado["data_lista_produtos"] == data_lista and estado["total_grupos"] == len(grupos):
+            proximo = estado["grupo"] % len(grupos)
+            print(f"Último grupo concluído: {estado['grupo']}/{len(grupos)}. Enviando Grupo {proximo + 1} para busca...")
+            logging.info(f"Último grupo concluído: {estado['grupo']}/{len(grupos)}. Enviando Grupo {proximo + 1} para busca...")
+            return grupos[proximo], proximo + 1
+
+        # Lista refeita: continua depois do grupo que contém o último GTIN concluído
+        for idx, grupo in enumerate(grupos):
+            if estado["ultimo_gtin"] in grupo["gtin"].values:
+                proximo = (idx + 1) % len(grupos)
+                print(f"Lista de produtos mudou. GTIN {estado['ultimo_gtin']} está no Grupo {idx + 1}; enviando Grupo {proximo + 1}...")
+                logging.info(f"Lista de produtos mudou. GTIN {estado['ultimo_gtin']} está no Grupo {idx + 1}; enviando Grupo {proximo + 1}...")
+                return grupos[proximo], proximo + 1
+        print("Lista de produtos mudou e o último GTIN concluído não está nela. Retornando o primeiro grupo.")
+        logging.info("Lista de produtos mudou e o último GTIN concluído não está nela. Retornando o primeiro grupo.")
+        return grupos[0], 1
+
+    # --- Fallback (mp_feeder_run_state vazia): último GTIN das notas + arquivo de índice ---
+    if ult_gtin is None:
+        print("Nenhum GTIN anterior encontrado. Retornando o primeiro grupo.")
+        logging.info("Nenhum GTIN anterior encontrado. Retornando o primeiro grupo.")
+        return grupos[0], 1
 
     for idx, grupo in enumerate(grupos):
         if ult_gtin in grupo["gtin"].values:
@@ -117,32 +115,31 @@ def grupo_eans_selecionados(EANs, ult_gtin, arquivo_indice):
             logging.info(f"GTIN {ult_gtin} encontrado no Grupo {idx + 1}")
 
             if idx + 1 < len(grupos):
-                try:
-                    # Verifica se o arquivo de índice existe
-                    with open(arquivo_indice, "r") as f:
-                        # Se existe, é porque a última falhou. Repete o grupo atual.
-                        logging.info(f"##### ÚLTIMA EXECUÇÃO NÃO FINALIZADA, ENVIANDO GRUPO {idx + 1} #####")
-                        print(f"##### ÚLTIMA EXECUÇÃO NÃO FINALIZADA, ENVIANDO GRUPO {idx + 1} #####")
-                        return grupos[idx]
-                except FileNotFoundError:
-                    # Se não existe, a última foi bem-sucedida. Envia o próximo grupo.
-                    print(f"Enviando Grupo {idx + 2} para busca...")
-                    logging.info(f"Enviando Grupo {idx + 2} para busca...")
-                    return grupos[idx + 1]  
+                # Verifica se o arquivo de índice existe (None no modo worker: o progresso fica na fila)
+                if arquivo_indice and os.path.exists(arquivo_indice):
+                    # Se existe, é porque a última falhou. Repete o grupo atual.
+                    logging.info(f"##### ÚLTIMA EXECUÇÃO NÃO FINALIZADA, ENVIANDO GRUPO {idx + 1} #####")
+                    print(f"##### ÚLTIMA EXECUÇÃO NÃO FINALIZADA, ENVIANDO GRUPO {idx + 1} #####")
+                    return grupos[idx], idx + 1
+                # Se não existe, a última foi bem-sucedida. Envia o próximo grupo.
+                print(f"Enviando Grupo {idx + 2} para busca...")
+                logging.info(f"Enviando Grupo {idx + 2} para busca...")
+                return grupos[idx + 1], idx + 2
             else:
                 # Era o último grupo. Volta para o primeiro.
                 print("Não há mais grupos para enviar. Retornando o primeiro grupo.")
                 logging.info("Não há mais grupos para enviar. Retornando o primeiro grupo.")
-                return grupos[0]  
+                return grupos[0], 1
 
     print(f"GTIN {ult_gtin} não encontrado em nenhum dos grupos. Retornando o primeiro grupo.")
     logging.info(f"GTIN {ult_gtin} não encontrado em nenhum dos grupos. Retornando o primeiro grupo.")
-    return grupos[0] if grupos else pd.DataFrame(columns=["gtin"])
+    return grupos[0], 1
 
 def gerar_consultas(Geohashs, EANs):
     """
-    Gera o "produto cartesiano" entre EANs e Geohashs para criar
-    a lista de todas as consultas que a API do Menor Preço deve fazer.
+    Gera o plano de consultas (produto cartesiano entre EANs e Geohashs) que a
+    API do Menor Preço deve fazer. O produto não é materializado: o
+    PlanoConsultas calcula cada par a partir do índice.
     """
     print("##### CALCULANDO O NÚMERO DE CONSULTAS QUE SERÃO FEITAS #####")
     logging.info("##### CALCULANDO O NÚMERO DE CONSULTAS QUE SERÃO FEITAS #####")
@@ -150,22 +147,11 @@ def gerar_consultas(Geohashs, EANs):
     if EANs.empty or Geohashs.empty:
         print("##### ATENÇÃO: Lista de EANs ou Geohashs está vazia. Nenhuma consulta será gerada. #####")
         logging.warning("##### ATENÇÃO: Lista de EANs ou Geohashs está vazia. Nenhuma consulta será gerada. #####")
-        return pd.DataFrame(columns=["gtin", "geohash", "index"])
-
-    EANs = EANs.copy()
-    EANs.loc[:, "key"] = 1
-    Geohashs = Geohashs.copy()
-    Geohashs.loc[:, "key"] = 1
-
-    consultas = pd.merge(
-        EANs,
-        Geohashs,
-        on="key",
-    ).drop("key", axis=1)
-    consultas.reset_index(drop=True, inplace=True)
-    consultas["index"] = consultas.index
+        return PlanoConsultas([], [])
+
+    consultas = PlanoConsultas(EANs["gtin"].tolist(), Geohashs["geohash"].tolist())
     
     print(f"##### {len(consultas)} CONSULTAS GERADAS #####")
     logging.info(f"##### {len(consultas)} CONSULTAS GERADAS #####")
 
-    return consultas
\ No newline at end of file
+    return consultas
@@ -1,86 +1,150 @@
 # flow.py
-import os
+import time
 import logging
-import pandas as pd
+from datetime import datetime
 
 # Importa as ferramentas de cada módulo
 from MP_Feeder.db_manager import (
-    pegar_ultima_att_gtins, fetch_dados_vendas_para_produtos, 
-    insert_produtos_atualizados, pegar_geohashs_BD,
-    coletar_produtos_no_banco, pegar_ultimo_gtin, coletar_lojas_do_banco,
-    inserir_lojas_sc, inserir_notas,
+    fetch_produtos_candidatos, insert_produtos_atualizados,
+    coletar_lojas_do_banco, coletar_lojas_sem_coordenadas, inserir_lojas_sc, inserir_notas,
+    registrar_estado_rotacao,
     fetch_gtins_principais,
-    atualizar_fabricantes_via_iqvia
+    atualizar_fabricantes_via_iqvia,
+    popular_fila_consultas, reservar_lote_fila, concluir_lote_fila, contar_fila
 )
-from MP_Feeder.api_services import buscar_notas, buscar_lat_lon_lojas_sc_nominatim
+from MP_Feeder.api_services import (
+    buscar_notas, buscar_notas_async, buscar_lat_lon_lojas_sc_nominatim, URL_MENOR_PRECO,
+    LIMITE_DIARIO_GEOCODING, _preparar_saida
+)
+from MP_Feeder.rate_limiter import LimitadorAIMD
+from MP_Feeder.cache_respostas import CacheRespostas, CacheNegativo
+from MP_Feeder.stream_loader import GravadorStreaming
+from MP_Feeder.spill_accumulator import AcumuladorColeta
+from MP_Feeder.geohash_planner import planejar_centros
+from MP_Feeder.query_scheduler import carregar_ranking, ordenar_consultas
+from MP_Feeder.query_plan import LoteConsultas
+from MP_Feeder.dedup import VistosColeta
+from MP_Feeder.response_parser import registrar_estatisticas_datahora
+from MP_Feeder.journal import JournalColeta, journal_pendente, reproduzir_journal, limpar_journal
+from MP_Feeder.partial_store import parciais_pendentes, carregar_parciais, remover_parciais
+from MP_Feeder.run_context import prefetch_contexto, recarregar_produtos
 from MP_Feeder.etl_utils import (
-    recuperar_ultimo_indice, transformar_dados_produtos,
-    grupo_eans_selecionados, gerar_consultas
+    recuperar_ultimo_indice,
+    grupo_eans_selecionados, gerar_consultas, PRODUTOS_POR_GRUPO
 )
+from MP_Feeder.startup import sob_demanda
+
+# Importados no primeiro uso (ver startup.py)
+pd = sob_demanda("pandas")
+http_client = sob_demanda("MP_Feeder.http_client")
+
+class ColetaInterrompida(Exception):
+    """
+    Erro na coleta com carga streaming. Leva junto o que o gravador não chegou a
+    gravar e o índice do último lote gravado, para o main.py salvar os parciais
+    (a mensagem é a do erro original, para as checagens do error_handler).
+    """
+
+    def __init__(self, erro, Notas, Lojas_SC, indice):
+        super().__init__(str(erro))
+        self.Notas = Notas
+        self.Lojas_SC = Lojas_SC
+        self.indice = indice
 
 def run_recovery_flow(configs, now_gmt3):
     """
-    Executa a lógica de recuperação de dados parciais (CSV).
-    (Esta função já está correta, pois ela só carrega dados)
+    Executa a lógica de recuperação de dados parciais: arquivos salvos na falha anterior (se houver)
+    e o journal da coleta que não chegou a ser carregada no banco.
     """
-    print("##### ⚠️ DADOS PARCIAIS .CSV ENCONTRADOS. TENTANDO CARREGAR... #####")
-    logging.warning("##### DADOS PARCIAIS .CSV ENCONTRADOS. TENTANDO CARREGAR... #####")
-    
     # Desempacota configs
     DB_CONFIG = configs['DB_CONFIG']
     arquivo_indice = configs['arquivo_indice']
     arquivo_notas_parciais = configs['arquivo_notas_parciais']
     arquivo_lojas_parciais = configs['arquivo_lojas_parciais']
-    
-    # Carrega os dados salvos da última falha
-    Notas_csv = pd.read_csv(arquivo_notas_parciais)
-    Lojas_csv = pd.DataFrame()
-    if os.path.exists(arquivo_lojas_parciais):
-        Lojas_csv = pd.read_csv(arquivo_lojas_parciais)
-    
-    # Pega o índice que já foi salvo na falha anterior
-    ultimo_indice = recuperar_ultimo_indice(arquivo_indice)
-    print(f"##### DADOS CARREGADOS. TENTANDO INSERIR NO BANCO (LOTE DO ÍNDICE {ultimo_indice}) #####")
-    
+    diretorio_journal = configs.get('diretorio_journal')
+
+    ultimo_indice = None
+
+    if parciais_pendentes(arquivo_notas_parciais):
+        print("##### ⚠️ DADOS PARCIAIS ENCONTRADOS. TENTANDO CARREGAR... #####")
+        logging.warning("##### DADOS PARCIAIS ENCONTRADOS. TENTANDO CARREGAR... #####")
+
+        # Carrega (e valida) os dados salvos da última falha; CSV antigo é migrado antes
+        inicio = time.perf_counter()
+        Notas_parciais, Lojas_parciais = carregar_parciais(arquivo_notas_parciais, arquivo_lojas_parciais)
+        logging.info(f"DADOS PARCIAIS: {len(Notas_parciais)} notas e {len(Lojas_parciais)} lojas lidas em {time.perf_counter() - inicio:.2f}s")
+
+        # Pega o índice que já foi salvo na falha anterior
+        ultimo_indice = recuperar_ultimo_indice(arquivo_indice)
+        print(f"##### DADOS CARREGADOS. TENTANDO INSERIR NO BANCO (LOTE DO ÍNDICE {ultimo_indice}) #####")
+
+        _carregar_dados_recuperados(Notas_parciais, Lojas_parciais, now_gmt3, DB_CONFIG, "ARQUIVO PARCIAL")
+
+        # Limpa os arquivos parciais
+        print("##### SUCESSO AO SALVAR DADOS PARCIAIS. LIMPANDO ARQUIVOS. #####")
+        remover_parciais(arquivo_notas_parciais, arquivo_lojas_parciais)
+
+    if journal_pendente(diretorio_journal):
+        print("##### ⚠️ JOURNAL DA COLETA ANTERIOR ENCONTRADO. REPRODUZINDO... #####")
+        logging.warning("##### JOURNAL DA COLETA ANTERIOR ENCONTRADO. REPRODUZINDO... #####")
+        inicio = time.perf_counter()
+
+        notas, lojas, indice_journal, registros, tempo_leitura = reproduzir_journal(diretorio_journal)
+        Notas_journal, Lojas_journal = _preparar_saida(notas, lojas)
+        _carregar_dados_recuperados(Notas_journal, Lojas_journal, now_gmt3, DB_CONFIG, "JOURNAL")
+
+        # A coleta recomeça de onde o journal parou (o índice salvo pode estar atrasado)
+        if indice_journal is not None:
+            ultimo_indice = max(indice_journal, recuperar_ultimo_indice(arquivo_indice))
+            with open(arquivo_indice, "w") as f:
+                f.write(str(ultimo_indice))
+
+        limpar_journal(diretorio_journal)
+        msg = (
+            f"JOURNAL: {registros} consultas reproduzidas ({len(Notas_journal)} notas, {len(Lojas_journal)} lojas). "
+            f"Leitura {tempo_leitura:.2f}s, recuperação total {time.perf_counter() - inicio:.2f}s. Índice: {ultimo_indice}"
+        )
+        print(f"##### {msg} #####")
+        logging.info(msg)
+
+    # Retorna o índice para o 'main' poder salvar
+    return ultimo_indice
+
+def _carregar_dados_recuperados(Notas, Lojas, now_gmt3, DB_CONFIG, origem):
+    """
+    Função auxiliar privada. Insere notas e lojas recuperadas (arquivo parcial ou journal),
+    geocodificando só as lojas que ainda não estão no banco.
+    """
     # 1. Carrega as lojas que JÁ ESTÃO no banco
     print("##### Verificando lojas já cadastradas no banco... #####")
     Lojas_no_banco_df = coletar_lojas_do_banco(DB_CONFIG)
     lojas_ja_cadastradas_set = set(Lojas_no_banco_df["id_loja"])
     print(f"##### {len(lojas_ja_cadastradas_set)} lojas CADASTRADAS no banco. #####")
     
-    # 2. Insere as LOJAS do CSV (já filtradas)
-    if not Lojas_csv.empty:
-        Lojas_csv_sem_duplicatas = Lojas_csv.drop_duplicates(subset=["id_loja"]).reset_index(drop=True)
-        lojas_para_buscar_latlon = Lojas_csv_sem_duplicatas[
-            ~Lojas_csv_sem_duplicatas['id_loja'].isin(lojas_ja_cadastradas_set)
+    # 2. Insere as LOJAS recuperadas (já filtradas)
+    if not Lojas.empty:
+        Lojas_sem_duplicatas = Lojas.drop_duplicates(subset=["id_loja"]).reset_index(drop=True)
+        lojas_para_buscar_latlon = Lojas_sem_duplicatas[
+            ~Lojas_sem_duplicatas['id_loja'].isin(lojas_ja_cadastradas_set)
         ]
         total_para_buscar = len(lojas_para_buscar_latlon)
-        total_ignoradas_csv = len(Lojas_csv_sem_duplicatas) - total_para_buscar
+        total_ignoradas = len(Lojas_sem_duplicatas) - total_para_buscar
         
-        if total_ignoradas_csv > 0:
-            print(f"##### Ignorando {total_ignoradas_csv} lojas do CSV que já estão no banco. #####")
+        if total_ignoradas > 0:
+            print(f"##### Ignorando {total_ignoradas} lojas do {origem} que já estão no banco. #####")
         
         if total_para_buscar > 0:
-            print(f"##### 💾 RECUPERANDO {total_para_buscar} LOJAS (REAIS) DO CSV... #####")
-            Lojas_SC_com_latlon = buscar_lat_lon_lojas_sc_nominatim(lojas_para_buscar_latlon)
+            print(f"##### 💾 RECUPERANDO {total_para_buscar} LOJAS (REAIS) DO {origem}... #####")
+            Lojas_SC_com_latlon = buscar_lat_lon_lojas_sc_nominatim(lojas_para_buscar_latlon.reset_index(drop=True))
             inserir_lojas_sc(Lojas_SC_com_latlon, now_gmt3, DB_CONFIG)
         else:
-            print("##### Nenhuma loja nova do CSV para buscar/inserir. #####")
-    
-    # 3. Insere as NOTAS do CSV
-    if not Notas_csv.empty:
-        Notas_csv_sem_duplicatas = Notas_csv.drop_duplicates(subset=["id_nota"]).reset_index(drop=True)
-        print(f"##### 💾 RECUPERANDO {len(Notas_csv_sem_duplicatas)} NOTAS DO CSV... #####")
-        inserir_notas(Notas_csv_sem_duplicatas, now_gmt3, DB_CONFIG)
+            print(f"##### Nenhuma loja nova do {origem} para buscar/inserir. #####")
     
-    # 4. Limpa os arquivos CSV
-    print("##### SUCESSO AO SALVAR DADOS DO CSV. LIMPANDO ARQUIVOS. #####")
-    os.remove(arquivo_notas_parciais)
-    if os.path.exists(arquivo_lojas_parciais):
-        os.remove(arquivo_lojas_parciais)
-    
-    # Retorna o índice para o 'main' poder salvar
-    return ultimo_indice
+    # 3. Insere as NOTAS recuperadas
+    if not Notas.empty:
+        Notas_sem_duplicatas = Notas.drop_duplicates(subset=["id_nota"]).reset_index(drop=True)
+        print(f"##### 💾 RECUPERANDO {len(Notas_sem_duplicatas)} NOTAS DO {origem}... #####")
+        inserir_notas(Notas_sem_duplicatas, now_gmt3, DB_CONFIG)
 
 def run_normal_flow(configs, now_gmt3, today_gmt3):
     """
@@ -91,12 +155,12 @@ def run_normal_flow(configs, now_gmt3, today_gmt3):
     
     # Desempacota configs
     DB_CONFIG = configs['DB_CONFIG']
-    TELEGRAM_TOKEN = configs['TELEGRAM_TOKEN']
-    TELEGRAM_CHAT_ID = configs['TELEGRAM_CHAT_ID']
     arquivo_indice = configs['arquivo_indice']
 
     ### II Verificação da Lista de Produtos (GTINs):
-    ultima_att_gtins = pegar_ultima_att_gtins(DB_CONFIG)
+    # Leituras iniciais da rodada (data da lista, geohashs, GTINs, último GTIN, lojas) em paralelo
+    contexto = prefetch_contexto(DB_CONFIG, max_paralelo=configs.get('paralelo_prefetch', 4))
+    ultima_att_gtins = contexto.ultima_att_gtins
     
     ### III Atualização da Lista de Produtos (Se necessário):
     data_31_dias_atras = today_gmt3 - pd.Timedelta(days=31)
@@ -107,11 +171,8 @@ def run_normal_flow(configs, now_gmt3, today_gmt3):
         print("##### 🔄 ATUALIZANDO LISTA DE PRODUTOS (MAIS DE 30 DIAS) #####")
         logging.info("Atualizando lista de produtos (Mais de 30 dias)...")
         
-        # 1. Extrair (Vendas)
-        produtos_por_valor, produtos_por_qtd = fetch_dados_vendas_para_produtos(DB_CONFIG)
-        
-        # 2. Transformar (Passo 1: Pegar Top 1000 produtos)
-        Produtos_top_1000 = transformar_dados_produtos(produtos_por_valor, produtos_por_qtd)
+        # 1 e 2. Extrair + Transformar (ranking de vendas, filtro e normalização feitos no banco)
+        Produtos_top_1000 = fetch_produtos_candidatos(DB_CONFIG)
         
         # 3. Extrair (Passo 2: Buscar GTINs principais e TIPO para o Top 1000)
         if not Produtos_top_1000.empty:
@@ -146,27 +207,319 @@ def run_normal_flow(configs, now_gmt3, today_gmt3):
 
             # 2. Passa a lista para a função
             atualizar_fabricantes_via_iqvia(DB_CONFIG, lista_gtins)
+
+            # A lista do prefetch ficou velha: relê os GTINs da lista nova
+            contexto = recarregar_produtos(contexto, DB_CONFIG)
         
     else:
         print("##### LISTA DE PRODUTOS ATUALIZADA RECENTEMENTE. PULANDO ATUALIZAÇÃO. #####")
         logging.info("##### LISTA DE PRODUTOS ATUALIZADA RECENTEMENTE. PULANDO ATUALIZAÇÃO. #####")
 
     ### IV Coleta dos Alvos de Consulta (Geohashs e EANs):
-    Geohashs = pegar_geohashs_BD(DB_CONFIG)
-    EANs = coletar_produtos_no_banco(DB_CONFIG)
-    ult_gtin = pegar_ultimo_gtin(DB_CONFIG)
-    EANs_Selecionados = grupo_eans_selecionados(EANs, ult_gtin, arquivo_indice)
-    Consultas = gerar_consultas(Geohashs, EANs_Selecionados)
-    Lojas = coletar_lojas_do_banco(DB_CONFIG) 
+    Consultas, grupo = _gerar_consultas_da_rodada(configs, contexto)
+    Lojas = contexto.Lojas
 
     ### V Tratamento de Falhas (Recuperação de Índice):
     ultimo_indice = recuperar_ultimo_indice(arquivo_indice)
 
     ### VI Coleta de Notas (Loop Principal):
-    Notas_geral, Lojas_SC_geral, run_completo, indice_para_salvar = buscar_notas(
-        Consultas, Lojas, ultimo_indice, arquivo_indice,
-        TELEGRAM_TOKEN, TELEGRAM_CHAT_ID
-    )
+    limitador, cache, cache_negativo, vistos = _preparar_recursos_coleta(configs, _rotacao_atual(contexto, today_gmt3))
+
+    # Carga streaming: grava micro-lotes durante a coleta (e só então avança o índice)
+    gravador = None
+    if configs.get('carga_streaming'):
+        gravador = GravadorStreaming(
+            DB_CONFIG, now_gmt3, arquivo_indice,
+            tamanho_lote=configs.get('tamanho_lote_streaming', 5000),
+            intervalo_segundos=configs.get('intervalo_lote_streaming', 60)
+        )
+    elif configs.get('max_linhas_memoria'):
+        # Sem streaming: acumula com no máximo N linhas em memória e despeja o resto no disco
+        gravador = AcumuladorColeta(
+            configs.get('diretorio_spill'),
+            max_linhas_memoria=configs['max_linhas_memoria']
+        )
+
+    # Journal write-ahead: cada consulta concluída vai para o disco (apagado pelo main.py após a carga)
+    journal = None
+    if configs.get('diretorio_journal'):
+        journal = JournalColeta(
+            configs['diretorio_journal'],
+            tamanho_segmento_mb=configs.get('tamanho_segmento_journal_mb', 64)
+        )
+
+    erro_coleta = None
+    try:
+        Notas_geral, Lojas_SC_geral, run_completo, indice_para_salvar, _ = _executar_coleta(
+            configs, Consultas, Lojas, ultimo_indice,
+            limitador, cache, cache_negativo, vistos, gravador, journal
+        )
+    except Exception as e:
+        erro_coleta = e
+    finally:
+        try:
+            if gravador:
+                # O que não pôde ser gravado (ou foi só acumulado) volta para a carga normal do main.py
+                # (e arquivo parcial em caso de falha)
+                Notas_pendentes, Lojas_pendentes = gravador.finalizar()
+            if journal:
+                journal.registrar_resumo()
+                journal.fechar()
+        finally:
+            # Mesmo com 404/erro fatal na coleta: fecha os caches e registra as estatísticas
+            _encerrar_recursos_coleta(cache, cache_negativo)
+
+    if erro_coleta is not None:
+        if configs.get('carga_streaming'):
+            # O que o gravador não gravou não pode se perder com o erro
+            indice = gravador.indice_gravado if gravador.indice_gravado is not None else ultimo_indice
+            raise ColetaInterrompida(erro_coleta, Notas_pendentes, Lojas_pendentes, indice) from erro_coleta
+        raise erro_coleta
+    
+    if gravador:
+        Notas_geral, Lojas_SC_geral = Notas_pendentes, Lojas_pendentes
+        # O que a carga streaming já gravou conta para o grupo (o resto é somado no main.py)
+        grupo["notas"] += getattr(gravador, "notas_gravadas", 0)
+        grupo["lojas"] += getattr(gravador, "lojas_gravadas", 0)
+
+    if configs.get('carga_streaming') and Lojas_SC_geral.empty:
+        # As lojas foram gravadas sem coordenadas: uma geocodificação só, no fim da rodada.
+        # (Se sobraram lojas não gravadas, a carga do main.py geocodifica essas e as
+        # pendentes no banco ficam para a próxima rodada: um limite do Nominatim por rodada.)
+        _geocodificar_lojas_pendentes(DB_CONFIG, now_gmt3)
     
     # Retorna o estado da execução para o 'main' decidir o que fazer
-    return Notas_geral, Lojas_SC_geral, run_completo, indice_para_salvar
\ No newline at end of file
+    return Notas_geral, Lojas_SC_geral, run_completo, indice_para_salvar, grupo
+
+def run_worker_flow(configs, now_gmt3, today_gmt3, worker_id):
+    """
+    Modo worker (main.py --worker): vários processos, na mesma máquina ou em
+    máquinas diferentes, dividem a rodada do dia pela fila mp_feeder_fila_consultas.
+
+    Cada worker reserva lotes de consultas (lease com tempo de visibilidade),
+    coleta, grava notas/lojas no banco e só então marca o lote como concluído.
+    Leases de workers mortos vencem e voltam a ser reservados por outros.
+    A atualização da lista de produtos (passos II/III) fica com o fluxo normal.
+
+    As lojas novas são gravadas sem coordenadas; o worker que registra o fim da
+    rodada geocodifica as pendentes, dentro de um único LIMITE_DIARIO_GEOCODING.
+
+    Retorna (rodada_concluida, api_ok).
+    """
+    DB_CONFIG = configs['DB_CONFIG']
+    id_rodada = configs.get('id_rodada') or today_gmt3.isoformat()
+    # O progresso fica na fila: o ultimo_indice.txt é do fluxo normal e seria
+    # compartilhado por todos os workers da máquina (seleção do grupo, ranking)
+    configs = {**configs, 'arquivo_indice': None}
+    print(f"##### WORKER {worker_id}: RODADA {id_rodada} #####")
+    logging.info(f"##### WORKER {worker_id}: RODADA {id_rodada} #####")
+
+    # Só o primeiro worker da rodada de fato enfileira as consultas
+    contexto = prefetch_contexto(DB_CONFIG, max_paralelo=configs.get('paralelo_prefetch', 4))
+    Consultas, grupo = _gerar_consultas_da_rodada(configs, contexto)
+    popular_fila_consultas(DB_CONFIG, Consultas, id_rodada)
+    Lojas = contexto.Lojas
+
+    limitador, cache, cache_negativo, vistos = _preparar_recursos_coleta(configs, _rotacao_atual(contexto, today_gmt3))
+    tamanho_lote = configs.get('tamanho_lote_fila', 50)
+    visibilidade = configs.get('visibilidade_fila_segundos', 600)
+    lotes = 0
+
+    try:
+        while True:
+            Lote = reservar_lote_fila(DB_CONFIG, id_rodada, worker_id, tamanho_lote, visibilidade)
+
+            if Lote.empty:
+                situacao = contar_fila(DB_CONFIG, id_rodada)
+                if situacao['pendente'] + situacao['em_andamento'] + situacao['lease_vencido'] == 0:
+                    print(f"##### WORKER {worker_id}: RODADA {id_rodada} CONCLUÍDA ({lotes} LOTES NESTE WORKER) #####")
+                    logging.info(f"##### WORKER {worker_id}: RODADA {id_rodada} CONCLUÍDA ({lotes} lotes neste worker) #####")
+                    # Um registro por rodada (INSERT IGNORE no id_rodada); notas/lojas são as deste worker
+                    if registrar_estado_rotacao(DB_CONFIG, grupo, now_gmt3, datetime.now(now_gmt3.tzinfo), id_rodada=id_rodada):
+                        # Só quem gravou o registro geocodifica: um limite do Nominatim por rodada
+                        _geocodificar_lojas_pendentes(DB_CONFIG, now_gmt3)
+                    return True, True
+                # Ainda há lotes com outros workers: espera (se algum morrer, o lease vence)
+                logging.info(f"WORKER {worker_id}: fila sem lotes livres {situacao}. Aguardando...")
+                time.sleep(configs.get('espera_fila_segundos', 30))
+                continue
+
+            indices = Lote["index"].tolist()
+            Notas, Lojas_SC, lote_completo, _, resolvidas = _executar_coleta(
+                configs, LoteConsultas(Lote), Lojas, min(indices), limitador, cache, cache_negativo, vistos, None, None
+            )
+
+            # Grava ANTES de concluir: se o worker morrer aqui, o lote é refeito (inserts idempotentes)
+            if not Lojas_SC.empty:
+                # Sem Nominatim aqui (seria um limite por lote): coordenadas no fim da rodada
+                Lojas_SC = Lojas_SC.drop_duplicates(subset=["id_loja"]).reset_index(drop=True)
+                inserir_lojas_sc(Lojas_SC.assign(Latitude=None, Longitude=None), now_gmt3, DB_CONFIG)
+                grupo["lojas"] += len(Lojas_SC)
+                Lojas = pd.concat([Lojas, Lojas_SC[["id_loja"]]], ignore_index=True)
+            if not Notas.empty:
+                Notas = Notas.drop_duplicates(subset=["id_nota"]).reset_index(drop=True)
+                inserir_notas(Notas, now_gmt3, DB_CONFIG)
+                grupo["notas"] += len(Notas)
+
+            # O lote não é contíguo: só sai da fila o que foi de fato resolvido. Falhas
+            # (mesmo as superadas por um sucesso depois) voltam para outro worker refazer
+            concluidas = [i for i in indices if i in resolvidas]
+            devolvidas = [i for i in indices if i not in resolvidas]
+            concluir_lote_fila(DB_CONFIG, id_rodada, worker_id, concluidas, devolvidas)
+            lotes += 1
+
+            if not lote_completo:
+                # Circuit breaker: devolve o resto e deixa o main.py reiniciar o worker
+                return False, False
+    finally:
+        _encerrar_recursos_coleta(cache, cache_negativo)
+
+def _geocodificar_lojas_pendentes(DB_CONFIG, now_gmt3):
+    """
+    Função auxiliar privada. Busca as coordenadas de até LIMITE_DIARIO_GEOCODING
+    lojas gravadas sem elas (o resto fica para a próxima rodada ou para o
+    utils/atualizar_coords_nulas.py).
+    """
+    Lojas_sem_coordenadas = coletar_lojas_sem_coordenadas(DB_CONFIG, LIMITE_DIARIO_GEOCODING)
+    if Lojas_sem_coordenadas.empty:
+        print("##### NENHUMA LOJA SEM COORDENADAS. #####")
+        return
+    Lojas_com_latlon = buscar_lat_lon_lojas_sc_nominatim(Lojas_sem_coordenadas)
+    inserir_lojas_sc(Lojas_com_latlon, now_gmt3, DB_CONFIG)
+
+def _gerar_consultas_da_rodada(configs, contexto):
+    """
+    Função auxiliar privada (passo IV). Seleciona o grupo de GTINs e os
+    geohashs da rodada (já lidos no prefetch do 'contexto') e gera a lista
+    de consultas, já otimizada/ordenada conforme as configs.
+    Retorna (Consultas, grupo), com o dict do grupo para a mp_feeder_run_state.
+    """
+    DB_CONFIG = configs['DB_CONFIG']
+    arquivo_indice = configs['arquivo_indice']
+
+    Geohashs = contexto.Geohashs
+    EANs_Selecionados, numero_grupo = grupo_eans_selecionados(
+        contexto.EANs, contexto.ult_gtin, arquivo_indice,
+        estado=contexto.estado_rotacao, data_lista=contexto.ultima_att_gtins
+    )
+
+    # Remove cidades cujo círculo de busca já está coberto pelo de uma vizinha
+    if configs.get('otimizar_geohashs'):
+        total_geohashs = len(Geohashs)
+        Geohashs = planejar_centros(
+            Geohashs,
+            raio_km=configs.get('raio_busca_km', 20),
+            margem_km=configs.get('margem_cobertura_km', 5)
+        )
+        economizadas = (total_geohashs - len(Geohashs)) * len(EANs_Selecionados)
+        print(f"##### PLANEJADOR DE GEOHASHS: {economizadas} CONSULTAS ECONOMIZADAS (DE {total_geohashs * len(EANs_Selecionados)}) #####")
+        logging.info(f"##### PLANEJADOR DE GEOHASHS: {economizadas} consultas economizadas (de {total_geohashs * len(EANs_Selecionados)}) #####")
+
+    Consultas = gerar_consultas(Geohashs, EANs_Selecionados)
+
+    # Executa primeiro os pares mais produtivos e amostra os de baixo rendimento
+    if configs.get('agendar_por_rendimento'):
+        Ranking = carregar_ranking(
+            DB_CONFIG, configs['arquivo_ranking_rendimento'], arquivo_indice,
+            ttl_horas=configs.get('ttl_ranking_horas', 24),
+            dias=configs.get('dias_historico_rendimento', 90)
+        )
+        Consultas = ordenar_consultas(
+            Consultas, Ranking,
+            taxa_amostragem=configs.get('taxa_amostragem_baixo_rendimento', 0.25)
+        )
+
+    # Estado do grupo, gravado na mp_feeder_run_state quando ele terminar (contadores somados na carga)
+    grupo = {
+        "grupo": numero_grupo,
+        "total_grupos": -(-len(contexto.EANs) // PRODUTOS_POR_GRUPO),
+        "ultimo_gtin": EANs_Selecionados["gtin"].iloc[-1] if not EANs_Selecionados.empty else None,
+        "data_lista_produtos": contexto.ultima_att_gtins,
+        "consultas": len(Consultas), "notas": 0, "lojas": 0,
+    }
+    return Consultas, grupo
+
+def _rotacao_atual(contexto, today_gmt3):
+    """
+    Função auxiliar privada. Identifica a passada atual pelo grupo de GTINs (para
+    o back-off do cache negativo): o último registro da mp_feeder_run_state, que
+    só muda quando o grupo termina; sem estado gravado, a data (um grupo por dia).
+    """
+    estado = contexto.estado_rotacao
+    if estado and estado.get("id_estado") is not None:
+        return f"estado-{estado['id_estado']}"
+    return today_gmt3.isoformat()
+
+def _preparar_recursos_coleta(configs, rotacao=None):
+    """
+    Função auxiliar privada. Cria o limitador de taxa, os caches, a memória de
+    ids já vistos (dedup) e ajusta o pool HTTP do Menor Preço. 'rotacao'
+    identifica a passada atual pelo grupo (ver _rotacao_atual).
+    Retorna (limitador, cache, cache_negativo, vistos).
+    """
+    limitador = LimitadorAIMD(
+        taxa_inicial=configs.get('taxa_inicial_api', 3.0),
+        taxa_maxima=configs.get('taxa_maxima_api', 10.0)
+    )
+
+    # Cache em disco das respostas (evita repetir consultas após um reinício)
+    cache = None
+    if configs.get('arquivo_cache'):
+        cache = CacheRespostas(
+            configs['arquivo_cache'],
+            ttl_horas=configs.get('ttl_cache_horas', 6),
+            max_entradas=configs.get('max_entradas_cache', 200000)
+        )
+
+    # Back-off dos pares que vivem retornando 204 (persistido entre execuções)
+    cache_negativo = None
+    if configs.get('arquivo_cache_negativo'):
+        cache_negativo = CacheNegativo(
+            configs['arquivo_cache_negativo'],
+            max_rotacoes=configs.get('max_rotacoes_pulo_204', 8),
+            rotacao=rotacao
+        )
+
+    # O pool keep-alive do Menor Preço precisa comportar todas as requisições em voo
+    max_concorrencia = configs.get('max_concorrencia', 8)
+    http_client.configurar_host(URL_MENOR_PRECO, pool_maxsize=max(configs.get('pool_http_menor_preco', 16), max_concorrencia))
+
+    # Notas/lojas repetidas (círculos sobrepostos) são descartadas já na leitura
+    vistos = VistosColeta(max_ids_exatos=configs.get('max_ids_dedup_exatos', 1000000))
+
+    return limitador, cache, cache_negativo, vistos
+
+def _executar_coleta(configs, Consultas, Lojas, ultimo_indice, limitador, cache, cache_negativo, vistos, gravador, journal):
+    """
+    Função auxiliar privada. Roda o motor de coleta escolhido nas configs:
+    'sequencial' (padrão) ou 'async' (várias requisições em voo).
+    Retorna a tupla do motor mais o set dos índices de fato resolvidos.
+    """
+    resolvidas = set()
+    if configs.get('motor_coleta', 'sequencial') == 'async':
+        resultado = buscar_notas_async(
+            Consultas, Lojas, ultimo_indice, configs['arquivo_indice'],
+            configs['TELEGRAM_TOKEN'], configs['TELEGRAM_CHAT_ID'],
+            max_concorrencia=configs.get('max_concorrencia', 8),
+            limitador=limitador, cache=cache, cache_negativo=cache_negativo,
+            gravador=gravador, journal=journal, vistos=vistos, resolvidas=resolvidas
+        )
+    else:
+        resultado = buscar_notas(
+            Consultas, Lojas, ultimo_indice, configs['arquivo_indice'],
+            configs['TELEGRAM_TOKEN'], configs['TELEGRAM_CHAT_ID'],
+            limitador=limitador, cache=cache, cache_negativo=cache_negativo,
+            gravador=gravador, journal=journal, vistos=vistos, resolvidas=resolvidas
+        )
+    return (*resultado, resolvidas)
+
+def _encerrar_recursos_coleta(cache, cache_negativo):
+    """Função auxiliar privada. Registra as estatísticas da coleta e fecha os caches."""
+    http_client.registrar_estatisticas_http()
+    registrar_estatisticas_datahora()
+    if cache:
+        cache.registrar_resumo()
+        cache.fechar()
+    if cache_negativo:
+        cache_negativo.registrar_resumo()
+        cache_negativo.fechar()
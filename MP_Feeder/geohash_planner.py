@@ -0,0 +1,88 @@
+# geohash_planner.py
+import logging
+import math
+
+from MP_Feeder.startup import sob_demanda
+
+pd = sob_demanda("pandas")
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_RAIO_TERRA_KM = 6371.0
+
+
+def decodificar_geohash(geohash):
+    """
+    Converte um geohash no ponto central (latitude, longitude) da sua célula.
+    """
+    lat_min, lat_max = -90.0, 90.0
+    lon_min, lon_max = -180.0, 180.0
+    bit_longitude = True
+
+    for caractere in geohash.lower():
+        valor = _BASE32.index(caractere)
+        for bit in (16, 8, 4, 2, 1):
+            if bit_longitude:
+                meio = (lon_min + lon_max) / 2
+                if valor & bit:
+                    lon_min = meio
+                else:
+                    lon_max = meio
+            else:
+                meio = (lat_min + lat_max) / 2
+                if valor & bit:
+                    lat_min = meio
+                else:
+                    lat_max = meio
+            bit_longitude = not bit_longitude
+
+    return (lat_min + lat_max) / 2, (lon_min + lon_max) / 2
+
+
+def distancia_km(lat1, lon1, lat2, lon2):
+    """Distância em km entre dois pontos (fórmula de Haversine)."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * _RAIO_TERRA_KM * math.asin(math.sqrt(a))
+
+
+def planejar_centros(Geohashs, raio_km=20, margem_km=5):
+    """
+    Reduz a lista de geohashs a um conjunto mínimo (guloso) de centros de consulta
+    cujos círculos de 'raio_km' ainda cobrem todas as cidades-alvo.
+
+    Uma cidade conta como coberta quando seu centro fica a até (raio_km - margem_km)
+    de algum centro escolhido; a margem protege a área urbana ao redor do ponto.
+    Os candidatos são os próprios geohashs (a API só aceita geohash como 'local').
+    A ordem original é mantida, então o plano é determinístico entre execuções.
+    """
+    if Geohashs.empty:
+        return Geohashs
+
+    geohashs = Geohashs["geohash"].dropna().astype(str).drop_duplicates().tolist()
+    pontos = [decodificar_geohash(g) for g in geohashs]
+    alcance = max(0.0, raio_km - margem_km)
+
+    # cobertura[i] = cidades (índices) cobertas por um círculo centrado na cidade i
+    cobertura = []
+    for lat_c, lon_c in pontos:
+        cobertura.append({
+            j for j, (lat, lon) in enumerate(pontos)
+            if distancia_km(lat_c, lon_c, lat, lon) <= alcance
+        })
+
+    descobertas = set(range(len(geohashs)))
+    escolhidos = []
+    while descobertas:
+        # Guloso: o candidato que cobre mais cidades ainda descobertas (empate: o primeiro)
+        melhor = max(range(len(geohashs)), key=lambda i: (len(cobertura[i] & descobertas), -i))
+        escolhidos.append(melhor)
+        descobertas -= cobertura[melhor]
+
+    escolhidos.sort()
+    Centros = pd.DataFrame({"geohash": [geohashs[i] for i in escolhidos]})
+
+    print(f"##### PLANEJADOR DE GEOHASHS: {len(geohashs)} CIDADES COBERTAS POR {len(Centros)} CENTROS #####")
+    logging.info(f"##### PLANEJADOR DE GEOHASHS: {len(geohashs)} CIDADES COBERTAS POR {len(Centros)} CENTROS (raio {raio_km} km, margem {margem_km} km) #####")
+    return Centros
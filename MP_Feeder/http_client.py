@@ -0,0 +1,191 @@
+# http_client.py
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# ============================================
+# CONFIGURAÇÃO POR HOST
+# ============================================
+
+# pool_maxsize: conexões keep-alive mantidas por host | timeout: segundos por requisição
+CONFIG_PADRAO = {"pool_maxsize": 4, "timeout": 20}
+CONFIG_HOSTS = {
+    "menorpreco.notaparana.pr.gov.br": {"pool_maxsize": 16, "timeout": 20},
+    "nominatim.openstreetmap.org": {"pool_maxsize": 2, "timeout": 20},
+    "api.telegram.org": {"pool_maxsize": 2, "timeout": 10},
+}
+
+_sessoes = {}
+_estatisticas = {}
+_lock = threading.Lock()
+
+
+def _host_de(url_ou_host):
+    """Função auxiliar privada. Aceita URL completa ou só o host."""
+    if "://" in url_ou_host:
+        return urlsplit(url_ou_host).hostname
+    return url_ou_host
+
+
+def _stats(host):
+    """Função auxiliar privada. Retorna (criando se preciso) o contador do host."""
+    with _lock:
+        if host not in _estatisticas:
+            _estatisticas[host] = {"requisicoes": 0, "conexoes_novas": 0, "tempo_handshake": 0.0}
+        return _estatisticas[host]
+
+
+# ============================================
+# INSTRUMENTAÇÃO (CONEXÕES NOVAS E HANDSHAKE)
+# ============================================
+
+class _ConexaoHTTPMedida(HTTPConnection):
+    def connect(self):
+        inicio = time.perf_counter()
+        super().connect()
+        _registrar_conexao(self.host, time.perf_counter() - inicio)
+
+
+class _ConexaoHTTPSMedida(HTTPSConnection):
+    def connect(self):
+        # Inclui TCP + TLS: é exatamente o custo que o keep-alive evita
+        inicio = time.perf_counter()
+        super().connect()
+        _registrar_conexao(self.host, time.perf_counter() - inicio)
+
+
+class _PoolHTTPMedido(HTTPConnectionPool):
+    ConnectionCls = _ConexaoHTTPMedida
+
+
+class _PoolHTTPSMedido(HTTPSConnectionPool):
+    ConnectionCls = _ConexaoHTTPSMedida
+
+
+class _AdaptadorMedido(HTTPAdapter):
+    """HTTPAdapter cujo pool usa as conexões instrumentadas acima."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _PoolHTTPMedido, "https": _PoolHTTPSMedido}
+
+
+def _registrar_conexao(host, duracao):
+    stats = _stats(host)
+    with _lock:
+        stats["conexoes_novas"] += 1
+        stats["tempo_handshake"] += duracao
+
+
+def _registrar_requisicao(response, *args, **kwargs):
+    """Hook de resposta do requests: conta as requisições por host."""
+    stats = _stats(_host_de(response.url))
+    with _lock:
+        stats["requisicoes"] += 1
+
+
+# ============================================
+# SESSÕES COMPARTILHADAS
+# ============================================
+
+def configurar_host(url_ou_host, pool_maxsize=None, timeout=None):
+    """
+    Ajusta o pool e/ou o timeout de um host. Deve ser chamado antes da
+    primeira requisição ao host (a sessão é criada com o tamanho vigente).
+    """
+    host = _host_de(url_ou_host)
+    with _lock:
+        config = dict(CONFIG_HOSTS.get(host, CONFIG_PADRAO))
+        if pool_maxsize is not None:
+            config["pool_maxsize"] = pool_maxsize
+        if timeout is not None:
+            config["timeout"] = timeout
+        CONFIG_HOSTS[host] = config
+        sessao_antiga = _sessoes.pop(host, None)
+    if sessao_antiga is not None:
+        sessao_antiga.close()
+
+
+def obter_sessao(url_ou_host):
+    """
+    Retorna a sessão keep-alive (uma por host), criando-a na primeira chamada.
+    """
+    host = _host_de(url_ou_host)
+    with _lock:
+        sessao = _sessoes.get(host)
+        if sessao is not None:
+            return sessao
+
+        config = CONFIG_HOSTS.get(host, CONFIG_PADRAO)
+        adaptador = _AdaptadorMedido(
+            pool_connections=1,
+            pool_maxsize=config["pool_maxsize"],
+            pool_block=False,
+        )
+        sessao = requests.Session()
+        sessao.mount("https://", adaptador)
+        sessao.mount("http://", adaptador)
+        sessao.headers.update({"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"})
+        sessao.hooks["response"].append(_registrar_requisicao)
+        _sessoes[host] = sessao
+        return sessao
+
+
+def get(url, **kwargs):
+    """
+    Substituto do 'requests.get' usando a sessão pooled do host.
+    Se 'timeout' não for informado, usa o timeout configurado para o host.
+    """
+    host = _host_de(url)
+    kwargs.setdefault("timeout", CONFIG_HOSTS.get(host, CONFIG_PADRAO)["timeout"])
+    return obter_sessao(host).get(url, **kwargs)
+
+
+def fechar_sessoes():
+    """Fecha todas as sessões (e seus pools)."""
+    with _lock:
+        sessoes = list(_sessoes.values())
+        _sessoes.clear()
+    for sessao in sessoes:
+        sessao.close()
+
+
+# ============================================
+# ESTATÍSTICAS
+# ============================================
+
+def estatisticas_http():
+    """
+    Retorna, por host: requisições, conexões novas, conexões reaproveitadas
+    e tempo total/médio de handshake (TCP + TLS).
+    """
+    with _lock:
+        resultado = {}
+        for host, stats in _estatisticas.items():
+            novas = stats["conexoes_novas"]
+            resultado[host] = {
+                "requisicoes": stats["requisicoes"],
+                "conexoes_novas": novas,
+                "reaproveitadas": max(0, stats["requisicoes"] - novas),
+                "tempo_handshake": stats["tempo_handshake"],
+                "handshake_medio": stats["tempo_handshake"] / novas if novas else 0.0,
+            }
+        return resultado
+
+
+def registrar_estatisticas_http():
+    """Imprime e loga as estatísticas de reaproveitamento de conexões por host."""
+    for host, stats in estatisticas_http().items():
+        msg = (
+            f"HTTP {host}: {stats['requisicoes']} requisições, {stats['conexoes_novas']} conexões novas, "
+            f"{stats['reaproveitadas']} reaproveitadas, handshake total {stats['tempo_handshake']:.2f}s "
+            f"(médio {stats['handshake_medio'] * 1000:.0f} ms)"
+        )
+        print(f"##### {msg} #####")
+        logging.info(msg)
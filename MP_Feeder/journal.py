@@ -0,0 +1,137 @@
+# journal.py
+import glob
+import logging
+import os
+import threading
+import time
+
+from MP_Feeder.response_parser import (
+    codificar_json, decodificar_json, novo_buffer_notas, novo_buffer_lojas
+)
+
+_PREFIXO = "coleta-"
+_EXTENSAO = ".jsonl"
+
+
+class JournalColeta:
+    """
+    Journal append-only (write-ahead) da coleta. Cada consulta concluída vira
+    UMA linha JSON com suas notas, lojas sem cadastro e o índice seguro de
+    retomada, gravada com flush + fsync antes de a coleta seguir.
+
+    Os arquivos são segmentados (rotação ao passar de 'tamanho_segmento_mb')
+    e só são apagados por 'limpar()', depois que os dados foram carregados no
+    banco. Se o processo morrer por QUALQUER motivo, 'reproduzir_journal'
+    reconstrói o que ainda não foi carregado.
+    """
+
+    def __init__(self, diretorio, tamanho_segmento_mb=64):
+        self.diretorio = diretorio
+        self.tamanho_segmento = tamanho_segmento_mb * 1024 * 1024
+        os.makedirs(diretorio, exist_ok=True)
+
+        self.registros = 0
+        self.bytes_gravados = 0
+        self.tempo_escrita = 0.0
+
+        self._lock = threading.Lock()
+        self._arquivo = None
+        self._numero_segmento = _ultimo_segmento(diretorio)
+
+    def registrar(self, notas, lojas, indice_seguro):
+        """Grava (e faz fsync de) o resultado de uma consulta concluída (buffers colunares)."""
+        linha = codificar_json({"i": int(indice_seguro), "n": notas.colunas, "l": lojas.colunas}) + b"\n"
+
+        with self._lock:
+            inicio = time.perf_counter()
+            if self._arquivo is None or self._arquivo.tell() + len(linha) > self.tamanho_segmento:
+                self._rotacionar()
+            self._arquivo.write(linha)
+            self._arquivo.flush()
+            os.fsync(self._arquivo.fileno())
+            self.tempo_escrita += time.perf_counter() - inicio
+            self.registros += 1
+            self.bytes_gravados += len(linha)
+
+    def _rotacionar(self):
+        """Função auxiliar privada (chamada com o lock). Fecha o segmento atual e abre o próximo."""
+        if self._arquivo is not None:
+            self._arquivo.close()
+        self._numero_segmento += 1
+        caminho = os.path.join(self.diretorio, f"{_PREFIXO}{self._numero_segmento:06d}{_EXTENSAO}")
+        self._arquivo = open(caminho, "ab")
+
+    def limpar(self):
+        """Checkpoint: os dados já estão no banco, então os segmentos podem ser apagados."""
+        with self._lock:
+            if self._arquivo is not None:
+                self._arquivo.close()
+                self._arquivo = None
+            limpar_journal(self.diretorio)
+
+    def registrar_resumo(self):
+        """Imprime e loga o custo de escrita do journal nesta coleta."""
+        medio = (self.tempo_escrita / self.registros * 1000) if self.registros else 0.0
+        msg = (
+            f"JOURNAL: {self.registros} registros, {self.bytes_gravados / 1024 / 1024:.1f} MB, "
+            f"{self.tempo_escrita:.2f}s em escrita+fsync ({medio:.2f} ms por consulta)"
+        )
+        print(f"##### {msg} #####")
+        logging.info(msg)
+
+    def fechar(self):
+        with self._lock:
+            if self._arquivo is not None:
+                self._arquivo.close()
+                self._arquivo = None
+
+
+def _segmentos(diretorio):
+    """Função auxiliar privada. Lista os segmentos do journal em ordem."""
+    return sorted(glob.glob(os.path.join(diretorio, f"{_PREFIXO}*{_EXTENSAO}")))
+
+
+def _ultimo_segmento(diretorio):
+    """Função auxiliar privada. Número do último segmento existente (0 se nenhum)."""
+    segmentos = _segmentos(diretorio)
+    if not segmentos:
+        return 0
+    return int(os.path.basename(segmentos[-1])[len(_PREFIXO):-len(_EXTENSAO)])
+
+
+def journal_pendente(diretorio):
+    """True se houver registros no journal ainda não carregados no banco."""
+    return bool(diretorio) and any(os.path.getsize(s) > 0 for s in _segmentos(diretorio))
+
+
+def reproduzir_journal(diretorio):
+    """
+    Lê todos os segmentos e reconstrói o que foi coletado.
+    Uma última linha incompleta (queda no meio da escrita) é descartada.
+    Retorna (buffer_notas, buffer_lojas, indice_seguro, registros, segundos).
+    """
+    inicio = time.perf_counter()
+    notas, lojas = novo_buffer_notas(), novo_buffer_lojas()
+    indice_seguro = None
+    registros = 0
+
+    for caminho in _segmentos(diretorio):
+        with open(caminho, "rb") as f:
+            for numero, linha in enumerate(f, start=1):
+                try:
+                    registro = decodificar_json(linha)
+                except ValueError:
+                    logging.warning(f"JOURNAL: linha {numero} de {caminho} incompleta/corrompida. Ignorada.")
+                    continue
+                notas.estender(novo_buffer_notas(registro["n"]))
+                lojas.estender(novo_buffer_lojas(registro["l"]))
+                indice_seguro = registro["i"] if indice_seguro is None else max(indice_seguro, registro["i"])
+                registros += 1
+
+    return notas, lojas, indice_seguro, registros, time.perf_counter() - inicio
+
+
+def limpar_journal(diretorio):
+    """Apaga todos os segmentos do journal."""
+    for caminho in _segmentos(diretorio):
+        os.remove(caminho)
@@ -0,0 +1,202 @@
+# partial_store.py
+import logging
+import os
+
+from MP_Feeder.startup import sob_demanda
+
+pd = sob_demanda("pandas")
+
+# Versão do esquema gravada nos metadados do Parquet (muda se as colunas mudarem)
+VERSAO_ESQUEMA = "1"
+_CHAVE_VERSAO = "mp_feeder_esquema"
+
+# Colunas obrigatórias e seus tipos. 'string' preserva zeros à esquerda dos
+# GTINs e não transforma ids em float quando há nulos.
+ESQUEMA_NOTAS = {
+    "id_nota": "string",
+    "datahora": "datetime64[ns]",
+    "id_loja": "string",
+    "geohash": "string",
+    "gtin": "string",
+    "descricao": "string",
+    "valor_desconto": "float64",
+    "valor_tabela": "float64",
+    "valor": "float64",
+    "cidade": "string",
+}
+ESQUEMA_LOJAS = {
+    "id_loja": "string",
+    "nome_fantasia": "string",
+    "razao_social": "string",
+    "logradouro": "string",
+    "cidade": "string",
+    "geohash": "string",
+    "local": "string",
+}
+
+FORMATO_DATAHORA = "%Y-%m-%d %H:%M:%S"
+
+
+def salvar_parciais(Notas, Lojas, arquivo_notas, arquivo_lojas):
+    """
+    Grava os dados parciais em Parquet (zstd), já com os tipos do esquema.
+    A escrita é atômica (arquivo temporário + os.replace). Sem pyarrow,
+    cai para o CSV antigo, que a recuperação migra depois.
+    'Notas' pode ser um DataFrame ou as notas acumuladas em disco
+    (spill_accumulator), gravadas lote a lote.
+    """
+    try:
+        if not Notas.empty:
+            _gravar_parquet(
+                (_aplicar_esquema(lote, ESQUEMA_NOTAS, "notas") for lote in _em_lotes(Notas)), arquivo_notas
+            )
+        if not Lojas.empty:
+            _gravar_parquet([_aplicar_esquema(Lojas, ESQUEMA_LOJAS, "lojas")], arquivo_lojas)
+        return "parquet"
+    except ImportError as e:
+        logging.warning(f"PARCIAIS: pyarrow indisponível ({e}). Salvando em CSV (formato antigo).")
+        if not Notas.empty:
+            for numero, lote in enumerate(_em_lotes(Notas)):
+                lote.to_csv(_caminho_csv_legado(arquivo_notas), index=False, mode="w" if numero == 0 else "a", header=numero == 0)
+        if not Lojas.empty:
+            Lojas.to_csv(_caminho_csv_legado(arquivo_lojas), index=False)
+        return "csv"
+
+
+def parciais_pendentes(arquivo_notas):
+    """True se houver notas parciais no disco (Parquet ou CSV antigo)."""
+    return os.path.exists(arquivo_notas) or os.path.exists(_caminho_csv_legado(arquivo_notas))
+
+
+def carregar_parciais(arquivo_notas, arquivo_lojas):
+    """
+    Lê e valida os dados parciais. CSVs antigos encontrados no disco são
+    migrados para Parquet antes (e apagados). Retorna (Notas, Lojas).
+    """
+    _migrar_csv_legado(arquivo_notas, ESQUEMA_NOTAS, "notas")
+    _migrar_csv_legado(arquivo_lojas, ESQUEMA_LOJAS, "lojas")
+
+    Notas = _ler_parquet(arquivo_notas, ESQUEMA_NOTAS, "notas")
+    Lojas = _ler_parquet(arquivo_lojas, ESQUEMA_LOJAS, "lojas")
+    return Notas, Lojas
+
+
+def remover_parciais(arquivo_notas, arquivo_lojas):
+    """Apaga os dados parciais (e CSVs antigos, se sobrou algum)."""
+    for arquivo in (arquivo_notas, arquivo_lojas):
+        for caminho in (arquivo, _caminho_csv_legado(arquivo)):
+            if os.path.exists(caminho):
+                os.remove(caminho)
+
+
+def _em_lotes(dados):
+    """Função auxiliar privada. DataFrame -> [DataFrame]; acumulador em disco -> seus lotes."""
+    return [dados] if isinstance(dados, pd.DataFrame) else dados.lotes()
+
+
+def _caminho_csv_legado(arquivo):
+    """Função auxiliar privada. 'notas_parciais.parquet' -> 'notas_parciais.csv'."""
+    return os.path.splitext(arquivo)[0] + ".csv"
+
+
+def _gravar_parquet(lotes, arquivo):
+    """
+    Função auxiliar privada. Escrita atômica em Parquet com a versão do esquema.
+    Cada DataFrame de 'lotes' (já no esquema) vira um row group.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    temporario = f"{arquivo}.tmp"
+    escritor = None
+    try:
+        for df in lotes:
+            tabela = pa.Table.from_pandas(df, preserve_index=False)
+            if escritor is None:
+                esquema = tabela.schema.with_metadata({
+                    **(tabela.schema.metadata or {}),
+                    _CHAVE_VERSAO.encode(): VERSAO_ESQUEMA.encode(),
+                })
+                escritor = pq.ParquetWriter(temporario, esquema, compression="zstd")
+            escritor.write_table(tabela.cast(escritor.schema))
+    finally:
+        if escritor is not None:
+            escritor.close()
+    if escritor is not None:
+        os.replace(temporario, arquivo)
+
+
+def _ler_parquet(arquivo, esquema, nome):
+    """Função auxiliar privada. Lê um Parquet parcial e valida versão e colunas."""
+    if not os.path.exists(arquivo):
+        return pd.DataFrame()
+
+    import pyarrow.parquet as pq
+
+    tabela = pq.read_table(arquivo)
+    versao = (tabela.schema.metadata or {}).get(_CHAVE_VERSAO.encode(), b"").decode()
+    if versao != VERSAO_ESQUEMA:
+        raise ValueError(
+            f"Dados parciais de {nome} ({arquivo}) com esquema '{versao}', esperado '{VERSAO_ESQUEMA}'."
+        )
+    return _aplicar_esquema(tabela.to_pandas(), esquema, nome)
+
+
+def _aplicar_esquema(df, esquema, nome):
+    """
+    Função auxiliar privada. Confere se as colunas obrigatórias existem e
+    converte cada uma para o tipo do esquema. Colunas extras são mantidas.
+    Valores que não convertem viram nulos e são contados no log.
+    """
+    faltando = [coluna for coluna in esquema if coluna not in df.columns]
+    if faltando:
+        raise ValueError(f"Dados parciais de {nome} sem as colunas obrigatórias: {faltando}")
+
+    df = df.copy()
+    for coluna, tipo in esquema.items():
+        ja_convertida = str(df[coluna].dtype) == tipo or (
+            tipo.startswith("datetime64") and pd.api.types.is_datetime64_any_dtype(df[coluna])
+        )
+        if ja_convertida:
+            continue
+        nulos_antes = int(df[coluna].isna().sum())
+        if tipo.startswith("datetime64"):
+            df[coluna] = pd.to_datetime(df[coluna], format=FORMATO_DATAHORA, errors="coerce")
+        elif tipo == "float64":
+            df[coluna] = pd.to_numeric(df[coluna], errors="coerce").astype("float64")
+        elif pd.api.types.is_float_dtype(df[coluna]) and (df[coluna].dropna() % 1 == 0).all():
+            # Ids inteiros com nulos chegam como float: 123.0 deve virar '123'
+            df[coluna] = df[coluna].astype("Int64").astype("string")
+        else:
+            df[coluna] = df[coluna].astype("string")
+
+        invalidos = int(df[coluna].isna().sum()) - nulos_antes
+        if invalidos > 0:
+            logging.warning(f"PARCIAIS: {invalidos} valores inválidos em {nome}.{coluna} viraram nulos.")
+    return df
+
+
+def _migrar_csv_legado(arquivo, esquema, nome):
+    """
+    Função auxiliar privada. Converte um CSV parcial antigo para Parquet.
+    Tudo é lido como texto (preserva zeros à esquerda); ids que o CSV antigo
+    gravou como float ('123.0') voltam a ser '123'.
+    """
+    caminho_csv = _caminho_csv_legado(arquivo)
+    if not os.path.exists(caminho_csv):
+        return
+
+    print(f"##### MIGRANDO DADOS PARCIAIS ANTIGOS {caminho_csv} -> {arquivo} #####")
+    logging.warning(f"##### MIGRANDO DADOS PARCIAIS ANTIGOS {caminho_csv} -> {arquivo} #####")
+
+    df = pd.read_csv(caminho_csv, dtype=str, keep_default_na=False, na_values=[""])
+    for coluna in ("id_nota", "id_loja"):
+        if coluna in df.columns:
+            df[coluna] = df[coluna].str.replace(r"\.0$", "", regex=True)
+
+    # Se já existe um Parquet (queda no meio da migração anterior), junta os dois
+    if os.path.exists(arquivo):
+        df = pd.concat([_ler_parquet(arquivo, esquema, nome), _aplicar_esquema(df, esquema, nome)], ignore_index=True)
+
+    _gravar_parquet([_aplicar_esquema(df, esquema, nome)], arquivo)
+    os.remove(caminho_csv)
@@ -0,0 +1,88 @@
+# query_plan.py
+from MP_Feeder.startup import sob_demanda
+
+np = sob_demanda("numpy")
+
+
+class PlanoConsultas:
+    """
+    Plano "preguiçoso" das consultas da rodada: o produto cartesiano GTIN x geohash
+    não é materializado. A consulta de índice 'i' é calculada na hora
+    (gtins[i // G], geohashs[i % G]), na mesma ordem do antigo merge por 'key'
+    (todos os geohashs do 1º GTIN, depois do 2º, ...).
+
+    A memória é O(GTINs + geohashs). Se o agendador reordenar/amostrar o plano,
+    'ordem' guarda só as posições originais mantidas (um array de inteiros).
+    """
+
+    __slots__ = ("gtins", "geohashs", "ordem")
+
+    def __init__(self, gtins, geohashs, ordem=None):
+        self.gtins = list(gtins)
+        self.geohashs = list(geohashs)
+        self.ordem = ordem
+
+    def __len__(self):
+        if self.ordem is not None:
+            return len(self.ordem)
+        return len(self.gtins) * len(self.geohashs)
+
+    def __getitem__(self, indice):
+        """(gtin, geohash) da consulta de índice 'indice', em O(1)."""
+        if not 0 <= indice < len(self):
+            raise IndexError(f"Consulta {indice} fora do plano ({len(self)} consultas).")
+        posicao = int(self.ordem[indice]) if self.ordem is not None else indice
+        linha, coluna = divmod(posicao, len(self.geohashs))
+        return self.gtins[linha], self.geohashs[coluna]
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+    def indices(self, inicio=0):
+        """Índices das consultas a partir de 'inicio' (um range: não ocupa memória)."""
+        return range(max(inicio, 0), len(self))
+
+    def consultas(self, inicio=0):
+        """Gera (indice, gtin, geohash) a partir de 'inicio' (seek direto, sem filtrar nada)."""
+        for indice in self.indices(inicio):
+            gtin, geohash = self[indice]
+            yield indice, gtin, geohash
+
+    def reordenar(self, posicoes):
+        """Novo plano com as consultas nas 'posicoes' (índices deste plano), nessa ordem."""
+        posicoes = np.asarray(posicoes, dtype=np.int64)
+        if self.ordem is not None:
+            posicoes = np.asarray(self.ordem, dtype=np.int64)[posicoes]
+        return PlanoConsultas(self.gtins, self.geohashs, posicoes)
+
+
+class LoteConsultas:
+    """
+    Consultas explícitas com índices arbitrários (ex.: um lote reservado da fila
+    dos workers). Tem a mesma interface de leitura do PlanoConsultas.
+    """
+
+    __slots__ = ("_indices", "_pares")
+
+    def __init__(self, Lote):
+        self._indices = [int(i) for i in Lote["index"]]
+        self._pares = dict(zip(self._indices, zip(Lote["gtin"], Lote["geohash"])))
+
+    def __len__(self):
+        return len(self._indices)
+
+    def __getitem__(self, indice):
+        return self._pares[indice]
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+    def indices(self, inicio=0):
+        return [i for i in self._indices if i >= inicio]
+
+    def consultas(self, inicio=0):
+        for indice in self.indices(inicio):
+            gtin, geohash = self._pares[indice]
+            yield indice, gtin, geohash
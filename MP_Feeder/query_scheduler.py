@@ -0,0 +1,97 @@
+# query_scheduler.py
+import hashlib
+import logging
+import os
+from datetime import datetime
+
+from MP_Feeder.db_manager import fetch_rendimento_pares
+from MP_Feeder.startup import sob_demanda
+
+np = sob_demanda("numpy")
+pd = sob_demanda("pandas")
+
+# Peso de cada sinal histórico na nota de rendimento do par
+PESO_NOTAS = 1.0
+PESO_LOJAS = 3.0
+PESO_PRECOS = 2.0
+
+
+def carregar_ranking(DB_CONFIG, arquivo_ranking, arquivo_indice, ttl_horas=24, dias=90):
+    """
+    Retorna o ranking de rendimento dos pares (gtin, geohash), lido do arquivo
+    local quando ainda está dentro do TTL (a agregação no banco é cara).
+
+    Enquanto houver uma rotação em andamento ('arquivo_indice' existe) o ranking
+    salvo é reaproveitado mesmo vencido: a ordem das consultas precisa ser a
+    mesma da execução que gravou o índice. 'arquivo_indice' None (modo worker)
+    desliga essa regra.
+    """
+    if os.path.exists(arquivo_ranking):
+        Ranking = pd.read_csv(arquivo_ranking, dtype={"gtin": str, "geohash": str})
+        gerado_em = datetime.fromisoformat(Ranking["gerado_em"].iloc[0]) if not Ranking.empty else None
+        idade_horas = (datetime.now() - gerado_em).total_seconds() / 3600 if gerado_em else None
+
+        if (arquivo_indice and os.path.exists(arquivo_indice)) or (idade_horas is not None and idade_horas < ttl_horas):
+            print(f"##### RANKING DE RENDIMENTO CARREGADO DO ARQUIVO ({len(Ranking)} PARES) #####")
+            logging.info(f"##### RANKING DE RENDIMENTO CARREGADO DE {arquivo_ranking} ({len(Ranking)} pares) #####")
+            return Ranking
+
+    Ranking = fetch_rendimento_pares(DB_CONFIG, dias=dias)
+    Ranking["gerado_em"] = datetime.now().replace(microsecond=0).isoformat()
+    Ranking.to_csv(arquivo_ranking, index=False)
+    return Ranking
+
+
+def _sorteio_deterministico(gtin, geohash, semente):
+    """Função auxiliar privada. Número em [0, 1) estável para o par e a semente."""
+    digest = hashlib.md5(f"{gtin}|{geohash}|{semente}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2**64
+
+
+def ordenar_consultas(Consultas, Ranking, rendimento_minimo=1.0, taxa_amostragem=0.25):
+    """
+    Reordena o plano de consultas por rendimento histórico (maior primeiro) e mantém só
+    uma amostra de 'taxa_amostragem' dos pares de baixo rendimento (< 'rendimento_minimo').
+
+    A amostra é determinística: usa o hash do par + a data do ranking, então o
+    mesmo ranking gera sempre o mesmo plano (e o índice de retomada continua válido).
+    Os índices passam a seguir a nova ordem (o plano guarda só as posições mantidas).
+    """
+    if Consultas.empty or Ranking.empty:
+        return Consultas
+
+    semente = Ranking["gerado_em"].iloc[0]
+    Ranking = Ranking.copy()
+    Ranking["rendimento"] = (
+        PESO_NOTAS * Ranking["notas"]
+        + PESO_LOJAS * Ranking["lojas"]
+        + PESO_PRECOS * Ranking["precos"]
+    )
+
+    # A API pode devolver o GTIN sem zeros à esquerda; compara sempre com 14 dígitos
+    Ranking["chave_gtin"] = Ranking["gtin"].astype(str).str.zfill(14)
+    Ranking = Ranking.groupby(["chave_gtin", "geohash"], as_index=False)["rendimento"].sum()
+
+    # Matriz GTIN x geohash só com números: o produto de strings não é montado
+    Matriz = Ranking.pivot(index="chave_gtin", columns="geohash", values="rendimento")
+    Matriz = Matriz.reindex(
+        index=[str(gtin).zfill(14) for gtin in Consultas.gtins], columns=Consultas.geohashs
+    ).fillna(0.0)
+    rendimento = Matriz.to_numpy().ravel()
+    if Consultas.ordem is not None:
+        rendimento = rendimento[np.asarray(Consultas.ordem, dtype=np.int64)]
+
+    mantidas = np.ones(len(rendimento), dtype=bool)
+    for indice in np.flatnonzero(rendimento < rendimento_minimo):
+        gtin, geohash = Consultas[int(indice)]
+        mantidas[indice] = _sorteio_deterministico(gtin, geohash, semente) < taxa_amostragem
+
+    # Ordenação estável: empates mantêm a ordem original (GTIN, depois geohash)
+    posicoes = np.flatnonzero(mantidas)
+    posicoes = posicoes[np.argsort(-rendimento[posicoes], kind="stable")]
+    Plano = Consultas.reordenar(posicoes)
+
+    adiadas = len(Consultas) - len(Plano)
+    print(f"##### AGENDADOR: {len(Plano)} CONSULTAS ORDENADAS POR RENDIMENTO, {adiadas} DE BAIXO RENDIMENTO ADIADAS #####")
+    logging.info(f"##### AGENDADOR: {len(Plano)} consultas ordenadas por rendimento, {adiadas} de baixo rendimento adiadas (amostragem {taxa_amostragem:.0%}) #####")
+    return Plano
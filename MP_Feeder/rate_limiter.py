@@ -0,0 +1,142 @@
+# rate_limiter.py
+import asyncio
+import logging
+import threading
+import time
+
+
+class LimitadorAIMD:
+    """
+    Token bucket com ajuste adaptativo AIMD (Additive Increase / Multiplicative Decrease).
+
+    - Começa em 'taxa_inicial' requisições/segundo.
+    - Respostas 200/204 rápidas: soma 'incremento' à taxa (até 'taxa_maxima').
+    - 5xx, timeout ou latência alta/subindo: multiplica a taxa por 'fator_reducao'
+      (até 'taxa_minima'), no máximo uma vez a cada 'intervalo_reducao' segundos,
+      para que uma rajada de falhas em voo não derrube a taxa de uma vez só.
+
+    É thread-safe e serve tanto para o motor sequencial quanto para o asyncio.
+    """
+
+    def __init__(self, taxa_inicial=3.0, taxa_minima=0.5, taxa_maxima=10.0,
+                 incremento=0.1, fator_reducao=0.5, latencia_alvo=3.0,
+                 fator_latencia=2.0, intervalo_reducao=5.0, intervalo_log=60.0, nome="Menor Preço"):
+        self.taxa = float(taxa_inicial)
+        self.taxa_minima = float(taxa_minima)
+        self.taxa_maxima = float(taxa_maxima)
+        self.incremento = float(incremento)
+        self.fator_reducao = float(fator_reducao)
+        self.latencia_alvo = float(latencia_alvo)
+        self.fator_latencia = float(fator_latencia)
+        self.intervalo_reducao = float(intervalo_reducao)
+        self.intervalo_log = float(intervalo_log)
+        self.nome = nome
+
+        self._lock = threading.Lock()
+        self._tokens = 1.0
+        self._ultimo_abastecimento = time.monotonic()
+        self._ultima_reducao = 0.0
+        self._ultimo_log = time.monotonic()
+        self._latencia_media = None
+
+        self.total_reducoes = 0
+        self.taxa_pico = self.taxa
+
+    # --- CONSUMO DE TOKENS ---
+
+    def reservar(self):
+        """
+        Reserva um token e devolve quantos segundos o chamador deve esperar.
+        O saldo pode ficar negativo: cada chamador entra "na fila" do próximo token.
+        """
+        with self._lock:
+            agora = time.monotonic()
+            decorrido = agora - self._ultimo_abastecimento
+            self._ultimo_abastecimento = agora
+            self._tokens = min(1.0, self._tokens + decorrido * self.taxa)
+            self._tokens -= 1.0
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.taxa
+
+    def aguardar(self):
+        """Bloqueia até o próximo token (motor sequencial / threads)."""
+        espera = self.reservar()
+        if espera > 0:
+            time.sleep(espera)
+
+    async def aguardar_async(self):
+        """Versão asyncio do 'aguardar'."""
+        espera = self.reservar()
+        if espera > 0:
+            await asyncio.sleep(espera)
+
+    # --- FEEDBACK DAS RESPOSTAS ---
+
+    def registrar_resultado(self, status_code=None, latencia=None, timeout=False):
+        """
+        Ajusta a taxa de acordo com o resultado de UMA requisição.
+        'status_code=None' indica falha de rede (sem resposta).
+        """
+        with self._lock:
+            latencia_anterior = self._latencia_media
+            if latencia is not None:
+                if self._latencia_media is None:
+                    self._latencia_media = latencia
+                else:
+                    self._latencia_media = 0.8 * self._latencia_media + 0.2 * latencia
+
+            motivo = None
+            if timeout:
+                motivo = "timeout"
+            elif status_code is None:
+                motivo = "falha de rede"
+            elif 500 <= status_code < 600:
+                motivo = f"HTTP {status_code}"
+            elif latencia is not None and latencia > self.latencia_alvo:
+                motivo = f"latência alta ({latencia:.2f}s)"
+            # "Subindo" só conta acima de metade do alvo, para ignorar ruído de milissegundos
+            elif (latencia is not None and latencia_anterior is not None
+                  and latencia > self.latencia_alvo / 2
+                  and latencia > latencia_anterior * self.fator_latencia):
+                motivo = f"latência subindo ({latencia_anterior:.2f}s -> {latencia:.2f}s)"
+
+            if motivo:
+                self._reduzir(motivo)
+            elif status_code in (200, 204):
+                self.taxa = min(self.taxa_maxima, self.taxa + self.incremento)
+                self.taxa_pico = max(self.taxa_pico, self.taxa)
+
+            self._log_periodico()
+
+    def _reduzir(self, motivo):
+        """Função auxiliar privada (chamada com o lock). Aplica o recuo multiplicativo."""
+        agora = time.monotonic()
+        if agora - self._ultima_reducao < self.intervalo_reducao:
+            return
+        taxa_anterior = self.taxa
+        self.taxa = max(self.taxa_minima, self.taxa * self.fator_reducao)
+        self._ultima_reducao = agora
+        self.total_reducoes += 1
+        logging.warning(
+            f"RATE LIMIT {self.nome}: recuo por {motivo}. "
+            f"Taxa {taxa_anterior:.2f} -> {self.taxa:.2f} req/s"
+        )
+
+    def _log_periodico(self):
+        """Função auxiliar privada (chamada com o lock). Loga a taxa atual de tempos em tempos."""
+        agora = time.monotonic()
+        if agora - self._ultimo_log >= self.intervalo_log:
+            self._ultimo_log = agora
+            latencia = f"{self._latencia_media:.2f}s" if self._latencia_media is not None else "-"
+            logging.info(f"RATE LIMIT {self.nome}: taxa atual {self.taxa:.2f} req/s (latência média {latencia})")
+
+    def registrar_resumo(self):
+        """Loga o resumo do limitador ao final da coleta."""
+        latencia = f"{self._latencia_media:.2f}s" if self._latencia_media is not None else "-"
+        msg = (
+            f"RATE LIMIT {self.nome}: taxa final {self.taxa:.2f} req/s, pico {self.taxa_pico:.2f} req/s, "
+            f"{self.total_reducoes} recuos, latência média {latencia}"
+        )
+        print(f"##### {msg} #####")
+        logging.info(msg)
@@ -0,0 +1,178 @@
+# response_parser.py
+import json
+import logging
+import threading
+
+from MP_Feeder.startup import sob_demanda
+
+pd = sob_demanda("pandas")
+
+# orjson é bem mais rápido para decodificar as respostas; sem ele, usa o json padrão
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+COLUNAS_NOTAS = (
+    "id_nota", "datahora", "id_loja", "geohash", "gtin",
+    "descricao", "valor_desconto", "valor_tabela", "valor", "cidade",
+)
+COLUNAS_LOJAS = (
+    "id_loja", "nome_fantasia", "razao_social", "logradouro", "cidade", "geohash", "local",
+)
+
+# Formato da 'datahora' da API (ex.: 2025-11-20T14:32:10.000Z), aplicado aos 19
+# primeiros caracteres: o banco guarda só até os segundos (DATETIME). Valores fora
+# dele ainda são tentados como ISO 8601 (sem o 'Z'); o resto vira NaT e é contado.
+FORMATO_DATAHORA_API = "%Y-%m-%dT%H:%M:%S"
+
+_estatisticas_datahora = {"convertidas": 0, "formato_alternativo": 0, "invalidas": 0}
+_lock_datahora = threading.Lock()
+
+
+def decodificar_json(conteudo):
+    """Decodifica bytes/str JSON (orjson se disponível)."""
+    if orjson is not None:
+        return orjson.loads(conteudo)
+    return json.loads(conteudo)
+
+
+def codificar_json(objeto):
+    """Codifica em bytes JSON UTF-8 (orjson se disponível). Tipos desconhecidos viram str."""
+    if orjson is not None:
+        return orjson.dumps(objeto, default=str)
+    return json.dumps(objeto, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+class BufferColunar:
+    """
+    Buffer "struct-of-arrays": uma lista por coluna em vez de um dict por linha.
+    Vira DataFrame direto (sem dicts intermediários) e é barato de fatiar/juntar.
+    """
+
+    __slots__ = ("nomes", "colunas")
+
+    def __init__(self, nomes, colunas=None):
+        self.nomes = nomes
+        self.colunas = colunas if colunas is not None else {nome: [] for nome in nomes}
+
+    def __len__(self):
+        return len(self.colunas[self.nomes[0]])
+
+    def fatia(self, inicio=0):
+        """Cópia das linhas a partir de 'inicio'."""
+        return BufferColunar(self.nomes, {nome: valores[inicio:] for nome, valores in self.colunas.items()})
+
+    def estender(self, outro):
+        for nome, valores in self.colunas.items():
+            valores.extend(outro.colunas[nome])
+
+    def limpar(self):
+        for valores in self.colunas.values():
+            valores.clear()
+
+    def para_dataframe(self):
+        return pd.DataFrame(self.colunas, columns=list(self.nomes))
+
+
+def normalizar_datahora(valores):
+    """
+    Converte a 'datahora' da API para datetime64 (sem inferência de formato).
+    Mantém o horário como veio (o 'Z' é descartado, como sempre foi).
+    Valores inválidos viram NaT e entram no contador de 'registrar_estatisticas_datahora'.
+    """
+    serie = pd.Series(valores, dtype=object) if not isinstance(valores, pd.Series) else valores
+    # Formato fixo e sem fração: o pandas usa o parser ISO rápido (inferir ou '%fZ' é várias vezes mais lento)
+    datas = pd.to_datetime(serie.str.slice(0, 19), format=FORMATO_DATAHORA_API, errors="coerce")
+
+    falhas = datas.isna() & serie.notna()
+    alternativas = 0
+    if falhas.any():
+        texto = serie[falhas].astype(str).str.rstrip("Z")
+        convertidas = pd.to_datetime(texto, format="ISO8601", errors="coerce")
+        if getattr(convertidas.dt, "tz", None) is not None:
+            convertidas = convertidas.dt.tz_localize(None)
+        datas.loc[falhas] = convertidas.dt.floor("s")
+        alternativas = int(falhas.sum())
+
+    invalidas = int((datas.isna() & serie.notna()).sum())
+    with _lock_datahora:
+        _estatisticas_datahora["convertidas"] += int(datas.notna().sum())
+        _estatisticas_datahora["formato_alternativo"] += alternativas - invalidas
+        _estatisticas_datahora["invalidas"] += invalidas
+    if invalidas:
+        exemplos = serie[datas.isna() & serie.notna()].head(3).tolist()
+        logging.warning(f"DATAHORA: {invalidas} valores inválidos viraram nulos. Exemplos: {exemplos}")
+    return datas
+
+
+def registrar_estatisticas_datahora():
+    """Imprime e loga quantas 'datahora' foram convertidas, por formato alternativo ou descartadas."""
+    with _lock_datahora:
+        stats = dict(_estatisticas_datahora)
+    msg = (
+        f"DATAHORA: {stats['convertidas']} convertidas ({stats['formato_alternativo']} fora do formato padrão), "
+        f"{stats['invalidas']} inválidas (nulas)"
+    )
+    print(f"##### {msg} #####")
+    logging.info(msg)
+
+
+def novo_buffer_notas(colunas=None):
+    return BufferColunar(COLUNAS_NOTAS, colunas)
+
+
+def novo_buffer_lojas(colunas=None):
+    return BufferColunar(COLUNAS_LOJAS, colunas)
+
+
+def extrair_produtos(produtos_encontrados, hash_local, lojas_cadastradas, notas, lojas_sem_cadastro, vistos=None):
+    """
+    Converte os produtos de UMA resposta da API direto para as colunas dos
+    buffers de notas e de lojas sem cadastro (compartilhada pelos motores de coleta).
+    Com 'vistos' (dedup.VistosColeta), notas e lojas já vistas na coleta são
+    descartadas antes de ocupar qualquer buffer.
+    """
+    # Os 'append' de cada coluna são resolvidos uma vez só, fora do laço
+    n = notas.colunas
+    n_id, n_datahora, n_loja, n_geohash, n_gtin = (
+        n["id_nota"].append, n["datahora"].append, n["id_loja"].append, n["geohash"].append, n["gtin"].append
+    )
+    n_desc, n_desconto, n_tabela, n_valor, n_cidade = (
+        n["descricao"].append, n["valor_desconto"].append, n["valor_tabela"].append, n["valor"].append, n["cidade"].append
+    )
+    l = lojas_sem_cadastro.colunas
+
+    for produto in produtos_encontrados:
+        get = produto.get
+        if vistos is not None and not vistos.nota_nova(get("id"), hash_local):
+            continue
+
+        estabelecimento = get("estabelecimento") or {}
+        id_loja = estabelecimento.get("codigo")
+        cidade = estabelecimento.get("mun", "")
+
+        n_id(get("id"))
+        n_datahora(get("datahora"))
+        n_loja(id_loja)
+        n_geohash(hash_local)
+        n_gtin(get("gtin"))
+        n_desc(get("desc"))
+        n_desconto(get("valor_desconto"))
+        n_tabela(get("valor_tabela"))
+        n_valor(get("valor"))
+        n_cidade(cidade)
+
+        if id_loja not in lojas_cadastradas and (vistos is None or vistos.loja_nova(id_loja, hash_local)):
+            logradouro = (
+                f"{estabelecimento.get('tp_logr', '')} "
+                f"{estabelecimento.get('nm_logr', '')}, "
+                f"{estabelecimento.get('nr_logr', '')}"
+            )
+            l["id_loja"].append(id_loja)
+            l["nome_fantasia"].append(estabelecimento.get("nm_fan", ""))
+            l["razao_social"].append(estabelecimento.get("nm_emp", ""))
+            l["logradouro"].append(logradouro.strip())
+            l["cidade"].append(cidade)
+            l["geohash"].append(hash_local)
+            l["local"].append(get("local", ""))
@@ -0,0 +1,125 @@
+# run_context.py
+import concurrent.futures
+import logging
+import time
+from dataclasses import dataclass, field, replace
+from datetime import date
+from typing import Any, Optional
+
+from MP_Feeder import db_pool
+from MP_Feeder.db_manager import (
+    pegar_ultima_att_gtins, pegar_geohashs_BD, coletar_produtos_no_banco,
+    pegar_ultimo_gtin, coletar_lojas_do_banco, pegar_estado_rotacao
+)
+from MP_Feeder.startup import sob_demanda, marcar
+
+pd = sob_demanda("pandas")
+
+
+@dataclass(frozen=True)
+class ContextoRodada:
+    """
+    Leituras do banco que a rodada faz antes da primeira requisição à API.
+    Imutável: quem precisar de outra versão (ex.: lista de produtos refeita)
+    cria uma nova com 'dataclasses.replace'. Os DataFrames não devem ser
+    alterados no lugar.
+    """
+    ultima_att_gtins: Optional[date]   # MAX(data_insercao) da lista de produtos
+    Geohashs: Any                      # DataFrame ['geohash']
+    EANs: Any                          # DataFrame ['gtin'] da lista mais recente
+    estado_rotacao: Optional[dict]     # último grupo concluído (mp_feeder_run_state)
+    ult_gtin: Optional[str]            # GTIN da última nota processada (só sem estado_rotacao)
+    Lojas: Any                         # DataFrame ['id_loja'] das lojas com coordenadas
+    tempos: dict = field(default_factory=dict, compare=False)   # segundos por leitura
+
+
+def prefetch_contexto(DB_CONFIG, max_paralelo=4):
+    """
+    Faz as leituras iniciais da rodada em paralelo (cada uma numa conexão do
+    pool) e retorna o ContextoRodada. O MAX(data_insercao) da lista de
+    produtos é consultado uma vez só e reaproveitado na coleta dos GTINs.
+    """
+    print("##### PREFETCH DO CONTEXTO DA RODADA #####")
+    logging.info("##### PREFETCH DO CONTEXTO DA RODADA #####")
+
+    leituras = {
+        "produtos": lambda: _lista_de_produtos(DB_CONFIG),
+        "geohashs": lambda: pegar_geohashs_BD(DB_CONFIG),
+        "rotacao": lambda: _rotacao(DB_CONFIG),
+        "lojas": lambda: coletar_lojas_do_banco(DB_CONFIG),
+    }
+    # Mais threads que conexões no pool só deixaria leituras esperando na fila do pool
+    max_paralelo = max(1, min(max_paralelo, db_pool.CONFIG_POOL["tamanho"], len(leituras)))
+
+    inicio = time.perf_counter()
+    resultados, tempos = {}, {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_paralelo, thread_name_prefix="prefetch") as executor:
+        futuros = {executor.submit(_cronometrar, leitura): nome for nome, leitura in leituras.items()}
+        for futuro in concurrent.futures.as_completed(futuros):
+            nome = futuros[futuro]
+            # Uma leitura com erro derruba a rodada, como antes (o main.py trata)
+            resultados[nome], tempos[nome] = futuro.result()
+    tempo_total = time.perf_counter() - inicio
+    marcar("contexto_rodada_pronto")
+
+    ultima_att_gtins, EANs = resultados["produtos"]
+    estado_rotacao, ult_gtin = resultados["rotacao"]
+    contexto = ContextoRodada(
+        ultima_att_gtins=ultima_att_gtins,
+        Geohashs=resultados["geohashs"],
+        EANs=EANs,
+        estado_rotacao=estado_rotacao,
+        ult_gtin=ult_gtin,
+        Lojas=resultados["lojas"],
+        tempos=tempos,
+    )
+
+    detalhes = ", ".join(f"{nome} {segundos:.2f}s" for nome, segundos in sorted(tempos.items()))
+    msg = (
+        f"PREFETCH: contexto da rodada em {tempo_total:.2f}s "
+        f"(em sequência seriam {sum(tempos.values()):.2f}s: {detalhes})"
+    )
+    print(f"##### {msg} #####")
+    logging.info(msg)
+    return contexto
+
+
+def recarregar_produtos(contexto, DB_CONFIG):
+    """
+    Novo contexto com a lista de produtos relida do banco (depois da
+    atualização mensal da bronze_menorPreco_produtos).
+    """
+    inicio = time.perf_counter()
+    ultima_att_gtins, EANs = _lista_de_produtos(DB_CONFIG)
+    tempos = {**contexto.tempos, "produtos": time.perf_counter() - inicio}
+    return replace(contexto, ultima_att_gtins=ultima_att_gtins, EANs=EANs, tempos=tempos)
+
+
+def _lista_de_produtos(DB_CONFIG):
+    """
+    Função auxiliar privada. (data da lista mais recente, GTINs dessa lista),
+    com um único MAX(data_insercao).
+    """
+    ultima_att_gtins = pegar_ultima_att_gtins(DB_CONFIG)
+    if ultima_att_gtins is None:
+        logging.error("Nenhuma data de atualização encontrada. Tabela de produtos pode estar vazia.")
+        return None, pd.DataFrame(columns=["gtin"])
+    return ultima_att_gtins, coletar_produtos_no_banco(DB_CONFIG, ultima_att_gtins)
+
+
+def _rotacao(DB_CONFIG):
+    """
+    Função auxiliar privada. (estado da rotação, último GTIN das notas); o
+    'ORDER BY data_atualizacao' nas notas só roda se não houver estado gravado.
+    """
+    estado = pegar_estado_rotacao(DB_CONFIG)
+    if estado is not None:
+        return estado, None
+    return None, pegar_ultimo_gtin(DB_CONFIG)
+
+
+def _cronometrar(leitura):
+    """Função auxiliar privada. (resultado, segundos) de uma leitura."""
+    inicio = time.perf_counter()
+    resultado = leitura()
+    return resultado, time.perf_counter() - inicio
@@ -0,0 +1,212 @@
+# spill_accumulator.py
+import gzip
+import heapq
+import logging
+import os
+import pickle
+import tempfile
+
+from MP_Feeder.startup import sob_demanda
+
+from MP_Feeder.api_services import _preparar_notas, _preparar_lojas
+from MP_Feeder.response_parser import BufferColunar, COLUNAS_NOTAS, COLUNAS_LOJAS
+
+pd = sob_demanda("pandas")
+
+
+class AcumuladorDisco:
+    """
+    Acumula linhas (buffers colunares) com no máximo 'max_linhas_memoria' em RAM.
+    Ao passar do limite, as linhas são ordenadas pela 'chave' e despejadas num
+    bloco comprimido (gzip de listas de tuplas em pickle) num diretório temporário.
+
+    'lotes()' faz o merge dos blocos ordenados (heapq), descarta chaves repetidas
+    (fica a primeira vista) e devolve a saída em lotes. Para o merge não abrir
+    blocos demais ao mesmo tempo, a cada 'max_blocos' despejos eles são
+    compactados num só, então a memória não depende do tamanho da coleta.
+    O diretório temporário some em 'fechar()' (ou quando o objeto é coletado).
+    """
+
+    def __init__(self, nomes, chave, diretorio=None, max_linhas_memoria=200000,
+                 linhas_por_pagina=5000, max_blocos=16, preparar=None):
+        self.nomes = tuple(nomes)
+        self.chave = self.nomes.index(chave)
+        self.max_linhas_memoria = max_linhas_memoria
+        self.linhas_por_pagina = linhas_por_pagina
+        self.max_blocos = max_blocos
+        self.preparar = preparar
+
+        self._buffer = BufferColunar(self.nomes)
+        self._diretorio_base = diretorio
+        self._temporario = None
+        self._blocos = []
+        self._numero_bloco = 0
+
+        self.linhas_recebidas = 0
+        self.duplicadas = 0
+        self._duplicadas_compactadas = 0
+        self.despejos = 0
+        self.bytes_despejados = 0
+
+    def __len__(self):
+        return self.linhas_recebidas
+
+    @property
+    def empty(self):
+        return self.linhas_recebidas == 0
+
+    def adicionar(self, buffer):
+        self._buffer.estender(buffer)
+        self.linhas_recebidas += len(buffer)
+        if len(self._buffer) >= self.max_linhas_memoria:
+            self._despejar()
+
+    def _chave_ordenacao(self, linha):
+        """Função auxiliar privada. Ids podem vir como int ou str da API: compara como texto."""
+        return str(linha[self.chave])
+
+    def _linhas_em_memoria(self):
+        """Função auxiliar privada. Linhas do buffer atual, ordenadas pela chave."""
+        linhas = zip(*(self._buffer.colunas[nome] for nome in self.nomes))
+        return sorted(linhas, key=self._chave_ordenacao)
+
+    def _novo_caminho(self):
+        """Função auxiliar privada. Caminho do próximo bloco (cria o diretório temporário na 1ª vez)."""
+        if self._temporario is None:
+            if self._diretorio_base:
+                os.makedirs(self._diretorio_base, exist_ok=True)
+            self._temporario = tempfile.TemporaryDirectory(prefix="mp_feeder_spill_", dir=self._diretorio_base)
+        self._numero_bloco += 1
+        return os.path.join(self._temporario.name, f"bloco-{self._numero_bloco:06d}.pkl.gz")
+
+    def _gravar_bloco(self, linhas):
+        """Função auxiliar privada. Grava linhas já ordenadas em páginas de 'linhas_por_pagina'."""
+        caminho = self._novo_caminho()
+        pagina = []
+        with gzip.open(caminho, "wb", compresslevel=3) as f:
+            for linha in linhas:
+                pagina.append(linha)
+                if len(pagina) >= self.linhas_por_pagina:
+                    pickle.dump(pagina, f, protocol=pickle.HIGHEST_PROTOCOL)
+                    pagina = []
+            if pagina:
+                pickle.dump(pagina, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self.bytes_despejados += os.path.getsize(caminho)
+        return caminho
+
+    def _despejar(self):
+        """Função auxiliar privada. Ordena o buffer e grava num novo bloco."""
+        self._blocos.append(self._gravar_bloco(self._linhas_em_memoria()))
+        self._buffer.limpar()
+        self.despejos += 1
+        logging.info(f"SPILL: {self.despejos} blocos despejados ({self.bytes_despejados / 1024 / 1024:.1f} MB)")
+
+        if len(self._blocos) >= self.max_blocos:
+            # Compacta: o merge final nunca abre mais que 'max_blocos' arquivos
+            antigos = self._blocos
+            self.duplicadas = 0
+            self._blocos = [self._gravar_bloco(self._merge(antigos, incluir_memoria=False))]
+            self._duplicadas_compactadas += self.duplicadas
+            for caminho in antigos:
+                os.remove(caminho)
+
+    def _merge(self, blocos, incluir_memoria=True):
+        """Função auxiliar privada. Merge ordenado dos blocos sem chaves repetidas."""
+        fontes = [_ler_bloco(caminho) for caminho in blocos]
+        if incluir_memoria:
+            fontes.append(iter(self._linhas_em_memoria()))
+
+        anterior = None
+        primeira = True
+        for linha in heapq.merge(*fontes, key=self._chave_ordenacao):
+            chave = self._chave_ordenacao(linha)
+            if not primeira and chave == anterior:
+                self.duplicadas += 1
+                continue
+            primeira = False
+            anterior = chave
+            yield linha
+
+    def lotes(self, tamanho_lote=50000):
+        """
+        Gera a saída deduplicada (ordenada pela chave) em lotes de até 'tamanho_lote'
+        linhas, como DataFrame (ou o que 'preparar' devolver a partir do buffer).
+        """
+        self.duplicadas = self._duplicadas_compactadas
+        lote = BufferColunar(self.nomes)
+        colunas = [lote.colunas[nome] for nome in self.nomes]
+
+        for linha in self._merge(self._blocos):
+            for coluna, valor in zip(colunas, linha):
+                coluna.append(valor)
+            if len(lote) >= tamanho_lote:
+                yield self._saida(lote)
+                lote = BufferColunar(self.nomes)
+                colunas = [lote.colunas[nome] for nome in self.nomes]
+
+        if len(lote):
+            yield self._saida(lote)
+
+    def _saida(self, lote):
+        """Função auxiliar privada."""
+        return self.preparar(lote) if self.preparar else lote.para_dataframe()
+
+    def fechar(self):
+        """Apaga os blocos do disco."""
+        self._buffer.limpar()
+        self._blocos = []
+        if self._temporario is not None:
+            self._temporario.cleanup()
+            self._temporario = None
+
+
+def _ler_bloco(caminho):
+    """Função auxiliar privada. Lê um bloco página a página (memória limitada)."""
+    with gzip.open(caminho, "rb") as f:
+        while True:
+            try:
+                pagina = pickle.load(f)
+            except EOFError:
+                return
+            yield from pagina
+
+
+class AcumuladorColeta:
+    """
+    Substitui as listas de notas/lojas que crescem sem limite na coleta normal
+    (sem carga streaming). Tem a mesma interface do GravadorStreaming
+    ('adicionar' por consulta e 'finalizar'), então os motores o recebem como 'gravador'.
+    """
+
+    def __init__(self, diretorio=None, max_linhas_memoria=200000):
+        self.notas = AcumuladorDisco(
+            COLUNAS_NOTAS, "id_nota", diretorio, max_linhas_memoria, preparar=_preparar_notas
+        )
+        self.lojas = AcumuladorDisco(
+            COLUNAS_LOJAS, "id_loja", diretorio, max_linhas_memoria, preparar=_preparar_lojas
+        )
+        self.indice_seguro = None
+
+    def adicionar(self, notas, lojas, indice_seguro):
+        self.notas.adicionar(notas)
+        self.lojas.adicionar(lojas)
+        self.indice_seguro = indice_seguro
+
+    def finalizar(self):
+        """
+        Retorna (notas, Lojas_SC_df): as notas ficam no acumulador (o main.py as
+        carrega com 'notas.lotes()'); as lojas sem cadastro são poucas e voltam
+        como DataFrame.
+        """
+        lotes_lojas = list(self.lojas.lotes(max(len(self.lojas), 1)))
+        Lojas_SC = lotes_lojas[0] if lotes_lojas else pd.DataFrame()
+        self.lojas.fechar()
+
+        msg = (
+            f"SPILL: {len(self.notas)} notas recebidas, {self.notas.despejos} blocos no disco "
+            f"({self.notas.bytes_despejados / 1024 / 1024:.1f} MB), "
+            f"máximo de {self.notas.max_linhas_memoria} linhas em memória"
+        )
+        print(f"##### {msg} #####")
+        logging.info(msg)
+        return self.notas, Lojas_SC
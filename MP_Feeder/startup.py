@@ -0,0 +1,150 @@
+# startup.py
+"""
+Inicialização rápida: dependências pesadas (pandas, numpy, mariadb, requests...)
+são importadas sob demanda, no primeiro uso. Não há import em segundo plano:
+importar as mesmas extensões C em duas threads ao mesmo tempo pode dar módulo
+parcialmente inicializado ou deadlock no lock de import.
+
+Com 'main.py --startup-report', mede o tempo de import de cada módulo e o
+tempo até a primeira conexão com o banco e a primeira requisição à API.
+"""
+import importlib
+import logging
+import sys
+import threading
+import time
+
+# Marcado no primeiro import deste módulo (o main.py o importa antes de tudo)
+INICIO = time.perf_counter()
+
+_marcos = {}
+_imports = []   # (modulo, segundos, thread), na ordem em que terminaram
+_lock = threading.Lock()
+# Serializa os imports sob demanda (ex.: as threads do prefetch usando pandas/mariadb juntas)
+_lock_imports = threading.RLock()
+_relatorio_ativo = False
+_local = threading.local()
+
+
+class _ModuloSobDemanda:
+    """
+    Substituto de um módulo: o import de verdade só acontece no primeiro acesso
+    a um atributo (ex.: 'pd.DataFrame'), uma thread por vez.
+    """
+
+    def __init__(self, nome):
+        self.__dict__["_nome"] = nome
+
+    def __getattr__(self, atributo):
+        modulo = sys.modules.get(self._nome)
+        if modulo is None or _inicializando(modulo):
+            with _lock_imports:
+                modulo = importlib.import_module(self._nome)
+        valor = getattr(modulo, atributo)
+        # Próximos acessos ao mesmo atributo não passam mais pelo __getattr__
+        self.__dict__[atributo] = valor
+        return valor
+
+    def __repr__(self):
+        return f"<módulo sob demanda '{self._nome}'>"
+
+
+def sob_demanda(nome):
+    """Retorna o módulo 'nome' (se já importado) ou um substituto que o importa no primeiro uso."""
+    return sys.modules.get(nome) or _ModuloSobDemanda(nome)
+
+
+def _inicializando(modulo):
+    """Função auxiliar privada. True se o módulo ainda está sendo importado (por outra thread)."""
+    spec = getattr(modulo, "__spec__", None)
+    return bool(getattr(spec, "_initializing", False))
+
+
+def marcar(evento):
+    """Registra (uma vez) o instante de um marco da inicialização, em segundos desde o início."""
+    if evento in _marcos:
+        return
+    with _lock:
+        if evento in _marcos:
+            return
+        _marcos[evento] = time.perf_counter() - INICIO
+    if evento == "primeira_requisicao_api":
+        # Sempre no log (com ou sem --startup-report), para acompanhar a partida entre versões
+        logging.info(f"STARTUP: primeira requisição à API {_marcos[evento]:.2f}s após o início do main.py")
+        if _relatorio_ativo:
+            imprimir_relatorio()
+
+
+# ============================================
+# RELATÓRIO (--startup-report)
+# ============================================
+
+class _LoaderMedido:
+    """Função auxiliar privada. Embrulha o loader de um módulo e mede o 'exec_module'."""
+
+    def __init__(self, loader, nome):
+        self._loader = loader
+        self._nome = nome
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, modulo):
+        pilha = getattr(_local, "pilha", None)
+        if pilha is None:
+            pilha = _local.pilha = []
+        pilha.append(self._nome)
+        inicio = time.perf_counter()
+        try:
+            self._loader.exec_module(modulo)
+        finally:
+            duracao = time.perf_counter() - inicio
+            pilha.pop()
+            # Só os imports "de primeiro nível" (os filhos já estão somados no pai)
+            if not pilha or self._nome.startswith("MP_Feeder"):
+                with _lock:
+                    _imports.append((self._nome, duracao, threading.current_thread().name))
+
+    def __getattr__(self, atributo):
+        return getattr(self._loader, atributo)
+
+
+class _MedidorImports:
+    """Função auxiliar privada. Finder (sys.meta_path) que troca o loader pelo _LoaderMedido."""
+
+    def find_spec(self, nome, caminho=None, alvo=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(nome, caminho, alvo)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                    spec.loader = _LoaderMedido(spec.loader, nome)
+                return spec
+        return None
+
+
+def ativar_relatorio():
+    """Liga a medição dos imports (precisa vir antes dos imports a medir)."""
+    global _relatorio_ativo
+    if _relatorio_ativo:
+        return
+    _relatorio_ativo = True
+    sys.meta_path.insert(0, _MedidorImports())
+
+
+def imprimir_relatorio(top=20):
+    """Imprime e loga os imports mais caros e os marcos da inicialização."""
+    with _lock:
+        imports = sorted(_imports, key=lambda item: item[1], reverse=True)[:top]
+        marcos = dict(_marcos)
+
+    linhas = ["##### STARTUP REPORT #####", f"{'módulo':40} {'ms':>8}  thread"]
+    for nome, duracao, thread in imports:
+        linhas.append(f"{nome:40} {duracao * 1000:>8.1f}  {thread}")
+    for evento, segundos in sorted(marcos.items(), key=lambda item: item[1]):
+        linhas.append(f"{evento:40} {segundos * 1000:>8.1f}  (desde o início do main.py)")
+
+    for linha in linhas:
+        print(linha)
+        logging.info(linha)
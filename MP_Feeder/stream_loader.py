@@ -0,0 +1,165 @@
+# stream_loader.py
+import logging
+import queue
+import threading
+import time
+
+from MP_Feeder.startup import sob_demanda
+
+from MP_Feeder.db_manager import inserir_notas, inserir_lojas_sc
+from MP_Feeder.api_services import _preparar_saida, _preparar_notas, _preparar_lojas
+from MP_Feeder.response_parser import novo_buffer_notas, novo_buffer_lojas
+
+pd = sob_demanda("pandas")
+
+_FIM = object()
+
+
+class GravadorStreaming:
+    """
+    Carga "streaming": recebe as linhas de cada consulta durante a coleta e
+    grava notas e lojas sem cadastro no banco em micro-lotes (a cada
+    'tamanho_lote' notas ou 'intervalo_segundos'), numa thread em segundo plano.
+
+    As lojas são gravadas sem coordenadas, como no modo worker: a geocodificação
+    das pendentes é feita uma vez só, no fim da rodada (flow.run_normal_flow),
+    dentro do limite diário do Nominatim. Geocodificar a cada micro-lote
+    multiplicaria esse limite e travaria o gravador por até ~2 min a cada lote.
+
+    O índice de retomada só é gravado em 'arquivo_indice' DEPOIS do commit das
+    notas E das lojas do lote que contém as consultas anteriores a ele. Se um
+    lote falhar, as linhas continuam no buffer e a gravação é tentada de novo
+    no próximo gatilho.
+    """
+
+    def __init__(self, DB_CONFIG, now_obj, arquivo_indice, tamanho_lote=5000, intervalo_segundos=60):
+        self.DB_CONFIG = DB_CONFIG
+        self.now_obj = now_obj
+        self.arquivo_indice = arquivo_indice
+        self.tamanho_lote = tamanho_lote
+        self.intervalo_segundos = intervalo_segundos
+
+        self._notas = novo_buffer_notas()
+        self._lojas = novo_buffer_lojas()
+        self._indice_pendente = None
+
+        self.indice_gravado = None
+        self.notas_gravadas = 0
+        self.lojas_gravadas = 0
+        self.lotes = 0
+        self.falhas = 0
+
+        # Fila limitada: se o banco ficar lento, a coleta espera (memória limitada)
+        self._fila = queue.Queue(maxsize=1000)
+        self._thread = threading.Thread(target=self._executar, name="gravador-streaming", daemon=True)
+        self._thread.start()
+
+    def adicionar(self, notas, lojas, indice_seguro):
+        """
+        Entrega as linhas de uma consulta. 'indice_seguro' é o índice a partir do
+        qual a coleta deveria recomeçar se tudo até aqui estiver gravado.
+        """
+        self._fila.put((notas, lojas, indice_seguro))
+
+    def _executar(self):
+        ultimo_lote = time.monotonic()
+        while True:
+            try:
+                item = self._fila.get(timeout=1)
+            except queue.Empty:
+                item = None
+
+            if item is _FIM:
+                self._descarregar()
+                return
+
+            if item is not None:
+                notas, lojas, indice_seguro = item
+                self._notas.estender(notas)
+                self._lojas.estender(lojas)
+                self._indice_pendente = indice_seguro
+
+            tempo_esgotado = time.monotonic() - ultimo_lote >= self.intervalo_segundos
+            if len(self._notas) >= self.tamanho_lote or (tempo_esgotado and self._ha_pendencias()):
+                self._descarregar()
+                ultimo_lote = time.monotonic()
+
+    def _ha_pendencias(self):
+        return bool(len(self._notas)) or bool(len(self._lojas)) or self._indice_pendente != self.indice_gravado
+
+    def _descarregar(self):
+        """Grava as notas e as lojas do buffer e só então avança o índice."""
+        if not self._ha_pendencias():
+            return
+
+        indice = self._indice_pendente
+        if len(self._notas) or len(self._lojas):
+            try:
+                self._gravar_buffer()
+            except Exception as e:
+                self.falhas += 1
+                print(
+                    f"❌ Falha ao gravar lote streaming ({len(self._notas)} notas, {len(self._lojas)} lojas). "
+                    f"Nova tentativa no próximo lote: {e}"
+                )
+                logging.error(
+                    f"Falha ao gravar lote streaming ({len(self._notas)} notas, {len(self._lojas)} lojas): {e}",
+                    exc_info=True
+                )
+                return
+
+            self.lotes += 1
+
+        if indice is not None:
+            with open(self.arquivo_indice, "w") as f:
+                f.write(str(indice))
+            self.indice_gravado = indice
+            logging.info(
+                f"STREAMING: {self.notas_gravadas} notas e {self.lojas_gravadas} lojas gravadas até agora. "
+                f"Índice de retomada: {indice}"
+            )
+
+    def _gravar_buffer(self):
+        """
+        Função auxiliar privada. Grava as notas e depois as lojas (sem coordenadas)
+        do buffer. Cada buffer só é esvaziado depois do seu commit, então uma falha
+        nas lojas não faz as notas já gravadas serem reenviadas.
+        """
+        if len(self._notas):
+            Notas = _preparar_notas(self._notas)
+            if not Notas.empty:
+                inserir_notas(Notas, self.now_obj, self.DB_CONFIG)
+                self.notas_gravadas += len(Notas)
+            self._notas = novo_buffer_notas()
+
+        if len(self._lojas):
+            Lojas_SC = _preparar_lojas(self._lojas)
+            if not Lojas_SC.empty:
+                inserir_lojas_sc(Lojas_SC.assign(Latitude=None, Longitude=None), self.now_obj, self.DB_CONFIG)
+                self.lojas_gravadas += len(Lojas_SC)
+            self._lojas = novo_buffer_lojas()
+
+    def finalizar(self):
+        """
+        Grava o que restou e encerra a thread. Retorna (Notas_df, Lojas_SC_df): só
+        as linhas que NÃO puderam ser gravadas, para a carga normal do main.py
+        (ou o arquivo parcial, em caso de falha).
+        """
+        self._fila.put(_FIM)
+        self._thread.join()
+
+        msg = (
+            f"STREAMING: {self.notas_gravadas} notas e {self.lojas_gravadas} lojas gravadas "
+            f"em {self.lotes} lotes ({self.falhas} falhas)"
+        )
+        print(f"##### {msg} #####")
+        logging.info(msg)
+
+        if len(self._notas) or len(self._lojas):
+            logging.warning(
+                f"STREAMING: {len(self._notas)} notas e {len(self._lojas)} lojas não gravadas "
+                f"serão devolvidas ao fluxo normal."
+            )
+        if len(self._notas) or len(self._lojas):
+            return _preparar_saida(self._notas, self._lojas)
+        return pd.DataFrame(), pd.DataFrame()
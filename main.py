@@ -1,20 +1,34 @@
 # main.py
+import sys
+
+# Antes de tudo: marca o início da partida e, com --startup-report, mede os imports
+from MP_Feeder import startup
+if "--startup-report" in sys.argv:
+    startup.ativar_relatorio()
+
 import os
+import socket
 import logging
+import argparse
 from datetime import datetime, timezone, timedelta
-import pandas as pd
 
 # Importa as configs
 from config import DB_CONFIG, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID
 
 # Importa os módulos de execução
-from MP_Feeder.flow import run_recovery_flow, run_normal_flow
+from MP_Feeder.flow import run_recovery_flow, run_normal_flow, run_worker_flow, ColetaInterrompida
 from MP_Feeder.error_handler import handle_execution_error, handle_api_fail, handle_success
 from MP_Feeder.etl_utils import setup_logging
-from MP_Feeder.db_manager import inserir_lojas_sc, inserir_notas
-from MP_Feeder.api_services import buscar_lat_lon_lojas_sc_nominatim
+from MP_Feeder.db_manager import inserir_lojas_sc, inserir_notas, configurar_carga, registrar_estado_rotacao
+from MP_Feeder.db_pool import configurar_pool, registrar_estatisticas_db
+from MP_Feeder.batch_writer import configurar_blocos
+from MP_Feeder.api_services import buscar_lat_lon_lojas_sc_nominatim, mandarMSG
+from MP_Feeder.journal import journal_pendente, limpar_journal
+from MP_Feeder.partial_store import parciais_pendentes
 
-def main():
+pd = startup.sob_demanda("pandas")
+
+def main(args):
     # --- CONFIGURAÇÕES DE EXECUÇÃO ---
     gmt_menos_3 = timezone(timedelta(hours=-3))
     
@@ -24,9 +38,73 @@ def main():
         "TELEGRAM_TOKEN": TELEGRAM_TOKEN,
         "TELEGRAM_CHAT_ID": TELEGRAM_CHAT_ID,
         "arquivo_indice": "ultimo_indice.txt",
-        "arquivo_notas_parciais": "notas_parciais.csv",
-        "arquivo_lojas_parciais": "lojas_parciais.csv"
+        # Dados parciais (Parquet tipado). CSVs antigos com o mesmo nome são migrados na recuperação.
+        "arquivo_notas_parciais": "notas_parciais.parquet",
+        "arquivo_lojas_parciais": "lojas_parciais.parquet",
+        # Motor da coleta: 'sequencial' ou 'async' (requisições concorrentes)
+        "motor_coleta": "sequencial",
+        "max_concorrencia": 8,
+        # Rate limit adaptativo (AIMD) da API do Menor Preço, em requisições/segundo
+        "taxa_inicial_api": 3.0,
+        "taxa_maxima_api": 10.0,
+        # Conexões keep-alive mantidas com o Menor Preço (mínimo = max_concorrencia)
+        "pool_http_menor_preco": 16,
+        # Cache em disco das respostas por (gtin, geohash, raio). None desativa.
+        "arquivo_cache": "cache_respostas.sqlite",
+        "ttl_cache_horas": 6,
+        "max_entradas_cache": 200000,
+        # Pares com 204 recorrente são pulados por 1, 2, 4... rotações. None desativa.
+        "arquivo_cache_negativo": "cache_respostas.sqlite",
+        "max_rotacoes_pulo_204": 8,
+        # Carga streaming: grava notas/lojas em micro-lotes durante a coleta
+        "carga_streaming": False,
+        "tamanho_lote_streaming": 5000,
+        "intervalo_lote_streaming": 60,
+        # Planejador de geohashs: consulta só os centros necessários para cobrir todas as cidades
+        "otimizar_geohashs": False,
+        "raio_busca_km": 20,
+        "margem_cobertura_km": 5,
+        # Agendador: ordena as consultas pelo rendimento histórico (ranking em cache local)
+        "agendar_por_rendimento": False,
+        "arquivo_ranking_rendimento": "ranking_rendimento.csv",
+        "ttl_ranking_horas": 24,
+        "dias_historico_rendimento": 90,
+        "taxa_amostragem_baixo_rendimento": 0.25,
+        # Modo worker (--worker): consultas reservadas em lotes na tabela mp_feeder_fila_consultas
+        "tamanho_lote_fila": 50,
+        "visibilidade_fila_segundos": 600,
+        "espera_fila_segundos": 30,
+        # Journal write-ahead da coleta (recuperação após QUALQUER queda). None desativa.
+        "diretorio_journal": "journal",
+        "tamanho_segmento_journal_mb": 64,
+        # Dedup na leitura: acima deste número de id_nota distintos, usa filtro de Bloom
+        "max_ids_dedup_exatos": 1000000,
+        # Sem carga streaming: máximo de linhas em memória na coleta (o resto vai para o disco). None desativa.
+        "max_linhas_memoria": 200000,
+        "diretorio_spill": None,  # None = diretório temporário do sistema
+        "tamanho_lote_carga": 50000,
+        # Pool de conexões com o MariaDB (compartilhado por todo o db_manager)
+        "tamanho_pool_db": 5,
+        "validar_conexao_db_segundos": 30,  # conexão ociosa há mais tempo leva ping/reconnect
+        "paralelo_prefetch": 4,  # leituras iniciais da rodada feitas em paralelo (limitado ao pool)
+        # Carga das notas via LOAD DATA LOCAL INFILE + upsert em lote (cai para o executemany se indisponível)
+        "carga_load_data": False,
+        # Carga em blocos: um commit por bloco, retentativa com back-off em erros transitórios
+        # e blocos já gravados (mp_feeder_carga_blocos) pulados numa carga retomada
+        "tamanho_bloco_commit": 5000,
+        "tentativas_bloco": 4
     }
+
+    configurar_pool(
+        tamanho=configs['tamanho_pool_db'],
+        validar_apos_segundos=configs['validar_conexao_db_segundos']
+    )
+    configurar_carga(load_data=configs['carga_load_data'])
+    configurar_blocos(tamanho_bloco=configs['tamanho_bloco_commit'], tentativas=configs['tentativas_bloco'])
+
+    if args.worker:
+        run_worker(configs, gmt_menos_3, args.worker_id or f"{socket.gethostname()}-{os.getpid()}")
+        return
     
     # --- LOOP PRINCIPAL DE EXECUÇÃO ---
     while True:
@@ -36,10 +114,11 @@ def main():
         Lojas_SC_geral = pd.DataFrame()
         run_completo = False
         indice_para_salvar = 0
+        grupo = None
 
         try:
-            # --- PASSO 1: VERIFICAR/EXECUTAR RECUPERAÇÃO DE CSV ---
-            if os.path.exists(configs['arquivo_notas_parciais']):
+            # --- PASSO 1: VERIFICAR/EXECUTAR RECUPERAÇÃO (DADOS PARCIAIS / JOURNAL) ---
+            if parciais_pendentes(configs['arquivo_notas_parciais']) or journal_pendente(configs['diretorio_journal']):
                 run_recovery_flow(configs, now_gmt3)
                 print("##### RECUPERAÇÃO CONCLUÍDA. CONTINUANDO PARA A COLETA DA API... #####")
                 print("\n" + "="*50 + "\n")
@@ -48,7 +127,7 @@ def main():
             # --- PASSO 2: EXECUTAR FLUXO NORMAL (SÓ EXTRAÇÃO/TRANSFORMAÇÃO) ---
             else:
                 # O flow agora SÓ coleta e transforma, e RETORNA os dados
-                Notas_geral, Lojas_SC_geral, run_completo, indice_para_salvar = run_normal_flow(
+                Notas_geral, Lojas_SC_geral, run_completo, indice_para_salvar, grupo = run_normal_flow(
                     configs, now_gmt3, today_gmt3
                 )
             
@@ -58,21 +137,39 @@ def main():
             if not Lojas_SC_geral.empty:
                 Lojas_SC_geral_sem_duplicatas = Lojas_SC_geral.drop_duplicates(subset=["id_loja"]).reset_index(drop=True)
                 print(f"##### 💾 SALVANDO {len(Lojas_SC_geral_sem_duplicatas)} LOJAS (TOTAIS OU PARCIAIS)... #####")
+                # Única geocodificação da rodada (na carga streaming, só das lojas que o gravador não gravou)
                 Lojas_SC_com_latlon = buscar_lat_lon_lojas_sc_nominatim(Lojas_SC_geral_sem_duplicatas)
                 inserir_lojas_sc(Lojas_SC_com_latlon, now_gmt3, DB_CONFIG)
+                # Só as da amostra geocodificada são inseridas; as outras voltam na próxima rodada
+                grupo["lojas"] += len(Lojas_SC_com_latlon)
             else:
                 print("##### NENHUMA LOJA NOVA ENCONTRADA PARA CARGA. #####")
 
             ### IX Carga das Notas Fiscais:
-            if not Notas_geral.empty:
+            if not Notas_geral.empty and not isinstance(Notas_geral, pd.DataFrame):
+                # Notas acumuladas em disco (spill): o merge já entrega lotes deduplicados
+                print(f"##### 💾 SALVANDO {len(Notas_geral)} NOTAS ACUMULADAS EM LOTES... #####")
+                for Notas_lote in Notas_geral.lotes(configs['tamanho_lote_carga']):
+                    inserir_notas(Notas_lote, now_gmt3, DB_CONFIG)
+                    grupo["notas"] += len(Notas_lote)
+                logging.info(f"SPILL: {Notas_geral.duplicadas} notas repetidas descartadas no merge")
+            elif not Notas_geral.empty:
                 Notas_geral_sem_duplicatas = Notas_geral.drop_duplicates(subset=["id_nota"]).reset_index(drop=True)
                 print(f"##### 💾 SALVANDO {len(Notas_geral_sem_duplicatas)} NOTAS (TOTAIS OU PARCIAIS)... #####")
                 inserir_notas(Notas_geral_sem_duplicatas, now_gmt3, DB_CONFIG)
+                grupo["notas"] += len(Notas_geral_sem_duplicatas)
             else:
                 print("##### NENHUMA NOTA NOVA ENCONTRADA PARA CARGA. #####")
 
+            # Tudo o que estava no journal já está no banco
+            if configs['diretorio_journal']:
+                limpar_journal(configs['diretorio_journal'])
+            registrar_estatisticas_db()
+
             # --- PASSO 4: LIDAR COM O RESULTADO ---
             if run_completo:
+                # Grupo concluído e carregado: a próxima execução parte do grupo seguinte
+                registrar_estado_rotacao(DB_CONFIG, grupo, now_gmt3, datetime.now(gmt_menos_3))
                 handle_success(
                     configs['arquivo_indice'], now_gmt3, 
                     TELEGRAM_TOKEN, TELEGRAM_CHAT_ID
@@ -83,12 +180,48 @@ def main():
 
         except Exception as e:
             # --- PASSO 5: LIDAR COM FALHA CATASTRÓFICA ---
+            if isinstance(e, ColetaInterrompida):
+                # Carga streaming: o que o gravador não gravou e o índice do último lote gravado
+                Notas_geral, Lojas_SC_geral, indice_para_salvar = e.Notas, e.Lojas_SC, e.indice
+
+            if journal_pendente(configs['diretorio_journal']):
+                # Os dados coletados já estão no journal; salvar os parciais seria redundante
+                Notas_geral, Lojas_SC_geral = pd.DataFrame(), pd.DataFrame()
 
             handle_execution_error(
                 e, Notas_geral, Lojas_SC_geral, indice_para_salvar,
                 now_gmt3, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID
             )
 
+def run_worker(configs, gmt_menos_3, worker_id):
+    """
+    Loop do modo worker: consome a fila compartilhada até a rodada do dia acabar.
+    A carga é feita pelo próprio run_worker_flow, lote a lote.
+    """
+    while True:
+        now_gmt3 = datetime.now(gmt_menos_3)
+        try:
+            rodada_concluida, api_ok = run_worker_flow(configs, now_gmt3, now_gmt3.date(), worker_id)
+            if rodada_concluida:
+                registrar_estatisticas_db()
+                msg = f"{now_gmt3.strftime('%Y-%m-%d %H:%M:%S')} - ✅ MENOR PREÇO: worker {worker_id} finalizou a rodada."
+                mandarMSG(msg, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID)
+                break
+            if not api_ok:
+                print(f"##### ⚠️ WORKER {worker_id}: RUN PARCIAL (API). LOTE DEVOLVIDO À FILA. REINICIANDO... #####")
+                logging.warning(f"##### ⚠️ WORKER {worker_id}: RUN PARCIAL (API). LOTE DEVOLVIDO À FILA. REINICIANDO... #####")
+        except Exception as e:
+            # Os leases deste worker vencem sozinhos e outro worker refaz os lotes
+            handle_execution_error(
+                e, pd.DataFrame(), pd.DataFrame(), 0,
+                now_gmt3, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID
+            )
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MP Feeder - coleta de preços do Menor Preço (Nota Paraná)")
+    parser.add_argument("--worker", action="store_true", help="Consome a fila compartilhada de consultas (vários processos/máquinas)")
+    parser.add_argument("--worker-id", help="Identificador do worker na fila (padrão: host-pid)")
+    parser.add_argument("--startup-report", action="store_true", help="Mostra o tempo de import de cada módulo e até a 1ª requisição à API")
+    args = parser.parse_args()
     setup_logging()
-    main()
\ No newline at end of file
+    main(args)
\ No newline at end of file
@@ -0,0 +1,95 @@
+# tests/bench_datahora.py
+"""
+Benchmark da normalização de 'datahora' das notas.
+
+Compara o caminho antigo do _preparar_saida (astype(str) + rstrip("Z") +
+to_datetime inferindo o formato + strftime de volta para texto) com o
+response_parser.normalizar_datahora (formato explícito, resultado em datetime64).
+
+Uso:
+    python tests/bench_datahora.py            # 1.000.000 de linhas
+    python tests/bench_datahora.py 200000
+"""
+import os
+import random
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from MP_Feeder.response_parser import normalizar_datahora  # noqa: E402
+
+REPETICOES = 3
+
+
+def gerar_datahoras(num_linhas, semente=42):
+    """Timestamps no formato da API, com alguns nulos e alguns inválidos."""
+    rnd = random.Random(semente)
+    valores = []
+    for i in range(num_linhas):
+        if i % 10007 == 0:
+            valores.append(None)
+        elif i % 20011 == 0:
+            valores.append("data-invalida")
+        else:
+            valores.append(
+                f"2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}T"
+                f"{rnd.randint(0, 23):02d}:{rnd.randint(0, 59):02d}:{rnd.randint(0, 59):02d}.{rnd.randrange(1000):03d}Z"
+            )
+    return pd.DataFrame({"datahora": valores})
+
+
+def caminho_antigo(Notas):
+    Notas = Notas.copy()
+    Notas["datahora"] = Notas["datahora"].astype(str).str.rstrip("Z")
+    Notas["datahora"] = pd.to_datetime(Notas["datahora"], errors="coerce")
+    Notas["datahora"] = Notas["datahora"].dt.strftime("%Y-%m-%d %H:%M:%S")
+    return Notas
+
+
+def caminho_novo(Notas):
+    Notas = Notas.copy()
+    Notas["datahora"] = normalizar_datahora(Notas["datahora"])
+    return Notas
+
+
+def medir(funcao, Notas):
+    melhor = float("inf")
+    for _ in range(REPETICOES):
+        inicio = time.perf_counter()
+        resultado = funcao(Notas)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return resultado, melhor
+
+
+def main():
+    num_linhas = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    Notas = gerar_datahoras(num_linhas)
+
+    try:
+        Antigo, tempo_antigo = medir(caminho_antigo, Notas)
+        erro_antigo = None
+    except Exception as e:
+        # Dependendo da versão do pandas, a inferência de formato nem aceita a mistura
+        Antigo, tempo_antigo, erro_antigo = None, float("nan"), e
+    Novo, tempo_novo = medir(caminho_novo, Notas)
+
+    if Antigo is not None:
+        iguais = Novo["datahora"].dt.strftime("%Y-%m-%d %H:%M:%S").fillna("NaT").equals(
+            Antigo["datahora"].fillna("NaT")
+        )
+        assert iguais, "Os dois caminhos divergiram"
+
+    print(f"{num_linhas} linhas (melhor de {REPETICOES})")
+    if erro_antigo:
+        print(f"  antigo (inferência + strftime): falhou: {erro_antigo}")
+    else:
+        print(f"  antigo (inferência + strftime): {tempo_antigo:6.2f}s  -> {Antigo['datahora'].dtype}")
+    print(f"  novo   (formato explícito):     {tempo_novo:6.2f}s  -> {Novo['datahora'].dtype}")
+    print(f"  inválidos/nulos: {int(Novo['datahora'].isna().sum())}")
+
+
+if __name__ == "__main__":
+    main()
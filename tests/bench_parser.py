@@ -0,0 +1,134 @@
+# tests/bench_parser.py
+"""
+Micro-benchmark do parser de respostas do Menor Preço.
+
+Compara, por produto retornado, o caminho antigo (json + um dict por linha +
+DataFrame a partir de lista de dicts) com o parser colunar do
+MP_Feeder.response_parser (orjson + buffers por coluna).
+
+Uso:
+    python tests/bench_parser.py                  # payloads sintéticos no formato da API
+    python tests/bench_parser.py respostas/*.json # respostas gravadas (corpo do 200)
+"""
+import glob
+import json
+import os
+import random
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from MP_Feeder.response_parser import (  # noqa: E402
+    decodificar_json, extrair_produtos, novo_buffer_notas, novo_buffer_lojas, orjson
+)
+
+REPETICOES = 20
+
+
+def gerar_payload(num_produtos, semente):
+    """Gera o corpo de uma resposta 200 com a mesma estrutura da API."""
+    rnd = random.Random(semente)
+    produtos = []
+    for i in range(num_produtos):
+        produtos.append({
+            "id": f"{semente}-{i}-{rnd.randrange(10**9)}",
+            "datahora": "2025-11-20T14:32:10.000Z",
+            "gtin": "7894900011517",
+            "desc": "REFRIGERANTE COCA COLA PET 2L",
+            "valor": round(rnd.uniform(5, 15), 2),
+            "valor_desconto": 0.0,
+            "valor_tabela": round(rnd.uniform(5, 15), 2),
+            "local": "6gge7u6cc",
+            "estabelecimento": {
+                "codigo": str(rnd.randrange(5000)),
+                "nm_fan": "FARMACIA EXEMPLO",
+                "nm_emp": "FARMACIA EXEMPLO LTDA",
+                "tp_logr": "RUA",
+                "nm_logr": "SERGIPE",
+                "nr_logr": str(rnd.randrange(2000)),
+                "mun": "LONDRINA",
+                "uf": "PR",
+            },
+        })
+    return json.dumps({"produtos": produtos, "total": num_produtos}).encode("utf-8")
+
+
+def parser_antigo(corpos, lojas_cadastradas):
+    """Réplica do caminho anterior: json.loads + dict por linha + DataFrame(lista de dicts)."""
+    notas, lojas = [], []
+    for corpo in corpos:
+        for produto in json.loads(corpo).get("produtos", []):
+            notas.append({
+                "id_nota": produto.get("id"),
+                "datahora": produto.get("datahora"),
+                "id_loja": produto.get("estabelecimento", {}).get("codigo"),
+                "geohash": "6gge7u6cc",
+                "gtin": produto.get("gtin"),
+                "descricao": produto.get("desc"),
+                "valor_desconto": produto.get("valor_desconto"),
+                "valor_tabela": produto.get("valor_tabela"),
+                "valor": produto.get("valor"),
+                "cidade": produto.get("estabelecimento", {}).get("mun", ""),
+            })
+            id_loja = produto.get("estabelecimento", {}).get("codigo")
+            if id_loja not in lojas_cadastradas:
+                logradouro = (
+                    f"{produto.get('estabelecimento', {}).get('tp_logr', '')} "
+                    f"{produto.get('estabelecimento', {}).get('nm_logr', '')}, "
+                    f"{produto.get('estabelecimento', {}).get('nr_logr', '')}"
+                )
+                lojas.append({
+                    "id_loja": id_loja,
+                    "nome_fantasia": produto.get("estabelecimento", {}).get("nm_fan", ""),
+                    "razao_social": produto.get("estabelecimento", {}).get("nm_emp", ""),
+                    "logradouro": logradouro.strip(),
+                    "cidade": produto.get("estabelecimento", {}).get("mun", ""),
+                    "geohash": "6gge7u6cc",
+                    "local": produto.get("local", ""),
+                })
+    return pd.DataFrame(notas), pd.DataFrame(lojas)
+
+
+def parser_colunar(corpos, lojas_cadastradas):
+    """Caminho atual: decodificar_json + extrair_produtos em buffers colunares."""
+    notas, lojas = novo_buffer_notas(), novo_buffer_lojas()
+    for corpo in corpos:
+        extrair_produtos(decodificar_json(corpo).get("produtos", []), "6gge7u6cc", lojas_cadastradas, notas, lojas)
+    return notas.para_dataframe(), lojas.para_dataframe()
+
+
+def medir(funcao, corpos, lojas_cadastradas):
+    melhor = float("inf")
+    for _ in range(REPETICOES):
+        inicio = time.perf_counter()
+        funcao(corpos, lojas_cadastradas)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        arquivos = [a for padrao in sys.argv[1:] for a in glob.glob(padrao)]
+        corpos = [open(a, "rb").read() for a in arquivos]
+        origem = f"{len(corpos)} respostas gravadas"
+    else:
+        corpos = [gerar_payload(100, semente) for semente in range(50)]
+        origem = "50 respostas sintéticas x 100 produtos"
+
+    total_produtos = sum(len(json.loads(c).get("produtos", [])) for c in corpos)
+    lojas_cadastradas = {str(i) for i in range(0, 5000, 2)}  # metade das lojas já cadastrada
+
+    Notas_a, Lojas_a = parser_antigo(corpos, lojas_cadastradas)
+    Notas_b, Lojas_b = parser_colunar(corpos, lojas_cadastradas)
+    assert Notas_a.equals(Notas_b[Notas_a.columns]) and Lojas_a.equals(Lojas_b[Lojas_a.columns]), "Saídas diferentes!"
+
+    antigo = medir(parser_antigo, corpos, lojas_cadastradas)
+    colunar = medir(parser_colunar, corpos, lojas_cadastradas)
+
+    print(f"Payloads: {origem} ({total_produtos} produtos) | orjson: {'sim' if orjson else 'não (json padrão)'}")
+    print(f"Antigo  (dicts):   {antigo * 1e6 / total_produtos:7.2f} µs/produto ({antigo * 1000:.1f} ms)")
+    print(f"Colunar (buffers): {colunar * 1e6 / total_produtos:7.2f} µs/produto ({colunar * 1000:.1f} ms)")
+    print(f"Ganho: {antigo / colunar:.2f}x")
@@ -0,0 +1,91 @@
+# tests/bench_partial_store.py
+"""
+Benchmark dos dados parciais: CSV antigo (to_csv/read_csv) contra o Parquet
+tipado do MP_Feeder.partial_store (salvar_parciais/carregar_parciais).
+
+Mede escrita, leitura e tamanho em disco, e confere se os tipos sobrevivem
+à ida e volta (GTIN com zero à esquerda, id_loja nulo, datahora).
+
+Uso:
+    python tests/bench_partial_store.py            # 1.000.000 de notas
+    python tests/bench_partial_store.py 200000
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from MP_Feeder.partial_store import salvar_parciais, carregar_parciais  # noqa: E402
+
+
+def gerar_notas(num_linhas, semente=42):
+    """Notas sintéticas no formato que sai do _preparar_saida."""
+    rnd = random.Random(semente)
+    geohashs = [f"6gkz{rnd.randrange(36**3):03x}" for _ in range(400)]
+    gtins = [f"0{rnd.randrange(10**12, 10**13)}" for _ in range(200)]
+    cidades = ["CURITIBA", "LONDRINA", "MARINGA", "PONTA GROSSA", "CASCAVEL"]
+    return pd.DataFrame({
+        "id_nota": [f"{rnd.randrange(10**15)}-{i}" for i in range(num_linhas)],
+        "datahora": [
+            f"2025-11-{rnd.randint(1, 28):02d} {rnd.randint(0, 23):02d}:{rnd.randint(0, 59):02d}:{rnd.randint(0, 59):02d}"
+            for _ in range(num_linhas)
+        ],
+        "id_loja": [None if i % 97 == 0 else rnd.randrange(10**6) for i in range(num_linhas)],
+        "geohash": [rnd.choice(geohashs) for _ in range(num_linhas)],
+        "gtin": [rnd.choice(gtins) for _ in range(num_linhas)],
+        "descricao": ["REFRIGERANTE COCA COLA PET 2L"] * num_linhas,
+        "valor_desconto": [round(rnd.random() * 2, 2) for _ in range(num_linhas)],
+        "valor_tabela": [round(rnd.random() * 20, 2) for _ in range(num_linhas)],
+        "valor": [round(rnd.random() * 20, 2) for _ in range(num_linhas)],
+        "cidade": [rnd.choice(cidades) for _ in range(num_linhas)],
+    })
+
+
+def cronometrar(funcao):
+    inicio = time.perf_counter()
+    resultado = funcao()
+    return resultado, time.perf_counter() - inicio
+
+
+def main():
+    num_linhas = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    Notas = gerar_notas(num_linhas)
+    Lojas = pd.DataFrame(columns=["id_loja"])
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        arquivo_csv = os.path.join(diretorio, "notas_parciais.csv")
+        arquivo_parquet = os.path.join(diretorio, "bench", "notas_parciais.parquet")
+        os.makedirs(os.path.dirname(arquivo_parquet))
+        arquivo_lojas = os.path.join(diretorio, "bench", "lojas_parciais.parquet")
+
+        _, escrita_csv = cronometrar(lambda: Notas.to_csv(arquivo_csv, index=False))
+        Csv, leitura_csv = cronometrar(lambda: pd.read_csv(arquivo_csv))
+        tamanho_csv = os.path.getsize(arquivo_csv)
+
+        _, escrita_parquet = cronometrar(lambda: salvar_parciais(Notas, Lojas, arquivo_parquet, arquivo_lojas))
+        tamanho_parquet = os.path.getsize(arquivo_parquet)
+        (Parquet, _), leitura_parquet = cronometrar(lambda: carregar_parciais(arquivo_parquet, arquivo_lojas))
+
+    assert len(Parquet) == num_linhas
+    assert Parquet["gtin"].equals(Notas["gtin"].astype("string")), "GTIN alterado no Parquet"
+    assert Parquet["id_loja"].isna().sum() == Notas["id_loja"].isna().sum()
+
+    print(f"{num_linhas} notas")
+    print(f"{'':10} {'escrita':>10} {'leitura':>10} {'disco':>10}")
+    print(f"{'CSV':10} {escrita_csv:>9.2f}s {leitura_csv:>9.2f}s {tamanho_csv / 1024 / 1024:>8.1f}MB")
+    print(f"{'Parquet':10} {escrita_parquet:>9.2f}s {leitura_parquet:>9.2f}s {tamanho_parquet / 1024 / 1024:>8.1f}MB")
+    print()
+    print("Tipos após a leitura (CSV -> Parquet):")
+    for coluna in ("gtin", "id_loja", "datahora"):
+        print(f"  {coluna:10} {str(Csv[coluna].dtype):>10} -> {str(Parquet[coluna].dtype)}")
+    perdidos = int((Csv["gtin"].astype(str).str.len() < Notas["gtin"].str.len()).sum())
+    print(f"  GTINs que perderam o zero à esquerda no CSV: {perdidos}")
+
+
+if __name__ == "__main__":
+    main()
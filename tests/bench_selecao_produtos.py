@@ -0,0 +1,120 @@
+# tests/bench_selecao_produtos.py
+"""
+Benchmark da atualização da lista de produtos: o caminho antigo (duas
+varreduras de 90 dias na bronze_plugpharma_vendas, top 3000 por valor e por
+quantidade, depois merge/filtro/zfill/head no pandas) contra o
+db_manager.fetch_produtos_candidatos (uma consulta com window functions e
+cursor do lado do servidor).
+
+Mede o tempo no banco, os bytes enviados pelo servidor (Bytes_sent da sessão)
+e confere se as duas listas saem iguais. Só faz SELECTs.
+
+Uso (com o config.py na raiz do projeto):
+    python tests/bench_selecao_produtos.py
+"""
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config import DB_CONFIG  # noqa: E402
+from MP_Feeder.db_pool import conectar  # noqa: E402
+from MP_Feeder.db_manager import fetch_produtos_candidatos, GTINS_SENTINELA  # noqa: E402
+
+SQL_ANTIGO = """
+    SELECT
+        v.codigo_interno_produto,
+        v.GTIN,
+        v.descricao_produto,
+        v.apresentacao_produto,
+        v.nome_fantasia_fabricante,
+        SUM(v.{coluna}) AS {total}
+    FROM
+        bronze_plugpharma_vendas v
+    WHERE
+        v.data_venda >= CURDATE() - INTERVAL 90 DAY
+    GROUP BY
+        v.codigo_interno_produto
+    ORDER BY {total} DESC
+    LIMIT 3000
+"""
+
+
+def bytes_enviados(cursor):
+    cursor.execute("SHOW SESSION STATUS LIKE 'Bytes_sent'")
+    return int(cursor.fetchone()[1])
+
+
+def caminho_antigo():
+    """As duas consultas e a transformação em pandas de antes."""
+    conn = conectar(DB_CONFIG, "dbDrogamais")
+    cursor = conn.cursor()
+    antes = bytes_enviados(cursor)
+    inicio = time.perf_counter()
+
+    resultados = []
+    for coluna, total in (("valor_liquido_total", "valor_total"), ("qtd_de_produtos", "qtd_total")):
+        cursor.execute(SQL_ANTIGO.format(coluna=coluna, total=total))
+        colunas = [desc[0] for desc in cursor.description]
+        resultados.append(pd.DataFrame(cursor.fetchall(), columns=colunas))
+    tempo_banco = time.perf_counter() - inicio
+    bytes_recebidos = bytes_enviados(cursor) - antes
+    cursor.close()
+    conn.close()
+
+    produtos_por_valor, produtos_por_qtd = resultados
+    Produtos = pd.merge(produtos_por_qtd, produtos_por_valor, how="inner")
+    Produtos.drop_duplicates(inplace=True)
+    Produtos.drop(columns=["valor_total", "qtd_total"], inplace=True, errors="ignore")
+    Produtos = Produtos[~Produtos["GTIN"].isin(GTINS_SENTINELA)]
+    Produtos["GTIN"] = Produtos["GTIN"].astype(str).str.zfill(14)
+    Produtos.drop_duplicates(subset=["GTIN"], keep="first", inplace=True)
+    Produtos = Produtos.head(1600)
+    return Produtos.reset_index(drop=True), tempo_banco, time.perf_counter() - inicio, bytes_recebidos
+
+
+def caminho_novo():
+    conn = conectar(DB_CONFIG, "dbDrogamais")
+    cursor = conn.cursor()
+    antes = bytes_enviados(cursor)
+    inicio = time.perf_counter()
+    cursor.close()
+    conn.close()
+
+    Produtos = fetch_produtos_candidatos(DB_CONFIG)
+    tempo = time.perf_counter() - inicio
+
+    # Mesma conexão do pool (tamanho 1 abaixo), então o Bytes_sent é da mesma sessão
+    conn = conectar(DB_CONFIG, "dbDrogamais")
+    cursor = conn.cursor()
+    bytes_recebidos = bytes_enviados(cursor) - antes
+    cursor.close()
+    conn.close()
+    return Produtos, tempo, tempo, bytes_recebidos
+
+
+def main():
+    from MP_Feeder.db_pool import configurar_pool
+    configurar_pool(tamanho=1)
+
+    antigo, banco_antigo, total_antigo, bytes_antigo = caminho_antigo()
+    novo, banco_novo, total_novo, bytes_novo = caminho_novo()
+
+    print(f"{'caminho':10} {'banco (s)':>10} {'total (s)':>10} {'KB do banco':>12} {'produtos':>9}")
+    print(f"{'antigo':10} {banco_antigo:>10.2f} {total_antigo:>10.2f} {bytes_antigo / 1024:>12.1f} {len(antigo):>9}")
+    print(f"{'novo':10} {banco_novo:>10.2f} {total_novo:>10.2f} {bytes_novo / 1024:>12.1f} {len(novo):>9}")
+
+    iguais = antigo["GTIN"].tolist() == novo["GTIN"].tolist()
+    print(f"Mesma lista de GTINs, na mesma ordem: {'sim' if iguais else 'NÃO'}")
+    if not iguais:
+        so_antigo = set(antigo["GTIN"]) - set(novo["GTIN"])
+        so_novo = set(novo["GTIN"]) - set(antigo["GTIN"])
+        print(f"  só no antigo: {len(so_antigo)} | só no novo: {len(so_novo)} "
+              "(empates no ranking podem trocar a ordem; GTIN nulo agora fica de fora)")
+
+
+if __name__ == "__main__":
+    main()
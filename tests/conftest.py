@@ -0,0 +1,6 @@
+# tests/conftest.py
+import os
+import sys
+
+# Os testes importam o MP_Feeder (e o utils/) a partir da raiz do repositório
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
@@ -0,0 +1,63 @@
+# tests/test_batch_writer.py
+
+import pandas as pd
+
+from MP_Feeder import batch_writer
+from MP_Feeder.batch_writer import _limites_blocos
+
+
+def gerar_chaves(numeros):
+    return pd.Series([f"{n:08d}" for n in sorted(numeros)], dtype="string")
+
+
+def blocos_de(chaves, tamanho):
+    return [tuple(chaves.iloc[inicio:fim]) for inicio, fim in _limites_blocos(chaves, tamanho)]
+
+
+def test_blocos_cobrem_tudo_sem_passar_do_dobro():
+    chaves = gerar_chaves(range(5000))
+    limites = _limites_blocos(chaves, 100)
+    assert limites[0][0] == 0 and limites[-1][1] == 5000
+    assert all(fim == proximo for (_, fim), (proximo, _) in zip(limites, limites[1:]))
+    assert all(0 < fim - inicio <= 200 for inicio, fim in limites)
+
+
+def test_linha_a_mais_ou_a_menos_so_muda_os_blocos_vizinhos():
+    numeros = set(range(0, 10000, 2))
+    antes = blocos_de(gerar_chaves(numeros), 100)
+    depois = blocos_de(gerar_chaves((numeros | {5001}) - {8000}), 100)
+
+    mudaram = set(antes) - set(depois)
+    assert 0 < len(mudaram) <= 4
+    assert len(set(antes) & set(depois)) >= len(antes) - 4
+
+
+def test_carga_retomada_pula_blocos_e_renova_a_atualizacao(monkeypatch):
+    monkeypatch.setitem(batch_writer.CONFIG_BLOCOS, "tamanho_bloco", 50)
+    commitados, gravados, renovados = set(), [], []
+
+    def gravar_bloco(_db, _tabela, _numero, _total, bloco, _linhas, hash_bloco, _gravar, _infile):
+        commitados.add(hash_bloco)
+        gravados.extend(bloco["id_nota"])
+        return len(bloco)
+
+    monkeypatch.setattr(batch_writer, "_blocos_gravados", lambda _db, _tabela, hashes: commitados & set(hashes))
+    monkeypatch.setattr(batch_writer, "_gravar_bloco", gravar_bloco)
+    monkeypatch.setattr(
+        batch_writer, "_renovar_atualizacao",
+        lambda _db, _tabela, _chave, coluna, valores: renovados.extend((coluna, v) for v in valores),
+    )
+
+    df = pd.DataFrame({"id_nota": [f"n{i:05d}" for i in range(1000)], "valor": [1.0] * 1000})
+    batch_writer.gravar_em_blocos({}, df, "notas", "id_nota", ["id_nota", "valor"], gravar=None)
+    assert sorted(gravados) == sorted(df["id_nota"]) and renovados == []
+
+    # Retomada com uma nota a mais: só o bloco dela é regravado
+    gravados.clear()
+    df = pd.concat([df, pd.DataFrame({"id_nota": ["n00500x"], "valor": [2.0]})], ignore_index=True)
+    batch_writer.gravar_em_blocos({}, df, "notas", "id_nota", ["id_nota", "valor"], gravar=None)
+
+    assert "n00500x" in gravados
+    assert len(gravados) <= 2 * 50
+    assert {coluna for coluna, _ in renovados} == {"data_atualizacao"}
+    assert sorted(gravados + [v for _, v in renovados]) == sorted(df["id_nota"])
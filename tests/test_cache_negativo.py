@@ -0,0 +1,82 @@
+# tests/test_cache_negativo.py
+
+import sqlite3
+
+from MP_Feeder.cache_respostas import CacheNegativo
+
+GTIN, GEOHASH = "7891234567895", "6gge7u6cc"
+
+
+def rotacoes_consultadas(arquivo, rotacoes, reinicios=1):
+    """Roda o par em cada rotação ('reinicios' vezes) sempre com 204; retorna as rotações que consultaram."""
+    consultadas = []
+    for rotacao in rotacoes:
+        for _ in range(reinicios):
+            cache = CacheNegativo(arquivo, rotacao=rotacao)
+            if not cache.deve_pular(GTIN, GEOHASH):
+                cache.registrar(GTIN, GEOHASH, 204)
+                if rotacao not in consultadas:
+                    consultadas.append(rotacao)
+            cache.fechar()
+    return consultadas
+
+
+def test_back_off_dobra_a_cada_204(tmp_path):
+    arquivo = str(tmp_path / "negativo.sqlite")
+    # Pula 1, depois 2, depois 4 rotações
+    assert rotacoes_consultadas(arquivo, range(1, 12)) == [1, 3, 6, 11]
+
+
+def test_reiniciar_a_mesma_rotacao_nao_soma_back_off(tmp_path):
+    arquivo = str(tmp_path / "negativo.sqlite")
+    assert rotacoes_consultadas(arquivo, range(1, 12), reinicios=3) == [1, 3, 6, 11]
+
+
+def test_back_off_limitado_por_max_rotacoes(tmp_path):
+    cache = CacheNegativo(str(tmp_path / "negativo.sqlite"), max_rotacoes=2, rotacao="r0")
+    for rotacao in range(10):
+        cache.rotacao = f"r{rotacao}"
+        cache.registrar(GTIN, GEOHASH, 204)
+    assert cache._pares[(GTIN, GEOHASH)][1] == 2
+    cache.fechar()
+
+
+def test_hit_do_cache_e_consulta_na_mesma_rotacao_contam_uma_vez(tmp_path):
+    cache = CacheNegativo(str(tmp_path / "negativo.sqlite"), rotacao="r1")
+    cache.registrar(GTIN, GEOHASH, 204)  # resposta vinda do cache de respostas
+    cache.registrar(GTIN, GEOHASH, 204)  # mesma rotação, após reinício
+    assert cache._pares[(GTIN, GEOHASH)][:2] == [1, 1]
+    cache.fechar()
+
+
+def test_200_apaga_o_historico(tmp_path):
+    arquivo = str(tmp_path / "negativo.sqlite")
+    cache = CacheNegativo(arquivo, rotacao="r1")
+    cache.registrar(GTIN, GEOHASH, 204)
+    cache.registrar(GTIN, GEOHASH, 200)
+    cache.fechar()
+
+    cache = CacheNegativo(arquivo, rotacao="r2")
+    assert cache.deve_pular(GTIN, GEOHASH) is False
+    assert cache.puladas == 0
+    cache.fechar()
+
+
+def test_arquivo_antigo_sem_coluna_rotacao(tmp_path):
+    arquivo = str(tmp_path / "negativo.sqlite")
+    conn = sqlite3.connect(arquivo)
+    conn.execute("""
+        CREATE TABLE pares_sem_dados (
+            gtin TEXT NOT NULL, geohash TEXT NOT NULL,
+            sequencia_204 INTEGER NOT NULL, pular_restantes INTEGER NOT NULL,
+            atualizado_em REAL NOT NULL, PRIMARY KEY (gtin, geohash)
+        )
+    """)
+    conn.execute("INSERT INTO pares_sem_dados VALUES (?, ?, 2, 2, 0)", (GTIN, GEOHASH))
+    conn.commit()
+    conn.close()
+
+    cache = CacheNegativo(arquivo, rotacao="r1")
+    assert cache.deve_pular(GTIN, GEOHASH) is True
+    assert cache.puladas == 1
+    cache.fechar()
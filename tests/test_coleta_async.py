@@ -0,0 +1,116 @@
+# tests/test_coleta_async.py
+
+import pandas as pd
+import pytest
+
+from MP_Feeder import api_services
+from MP_Feeder.query_plan import PlanoConsultas
+from MP_Feeder.rate_limiter import LimitadorAIMD
+
+GEOHASHS = ["6gge7u6cc"]
+
+
+def coletar(monkeypatch, total, falhas=(), ultimo_indice=0, max_concorrencia=4):
+    """Roda a coleta com 'total' GTINs; os GTINs em 'falhas' levantam erro de rede."""
+    consultados = []
+
+    def consultar(url, params, limitador, cache=None, aguardar=True):
+        consultados.append(params["gtin"])
+        if params["gtin"] in falhas:
+            raise ConnectionError("falha simulada")
+        return 204, None
+
+    monkeypatch.setattr(api_services, "_consultar_menor_preco", consultar)
+    monkeypatch.setattr(api_services, "mandarMSG", lambda *args: None)
+
+    plano = PlanoConsultas([str(i) for i in range(total)], GEOHASHS)
+    _, _, run_completo, indice = api_services.buscar_notas_async(
+        plano, pd.DataFrame({"id_loja": []}), ultimo_indice, None, None, None,
+        max_concorrencia=max_concorrencia, limitador=LimitadorAIMD(taxa_inicial=1000, taxa_maxima=1000)
+    )
+    return run_completo, indice, consultados
+
+
+def test_tudo_concluido_avanca_ate_o_fim(monkeypatch):
+    run_completo, indice, consultados = coletar(monkeypatch, 12)
+    assert run_completo
+    assert indice == 12
+    assert sorted(consultados, key=int) == [str(i) for i in range(12)]
+
+
+def test_retomada_comeca_no_ultimo_indice(monkeypatch):
+    run_completo, indice, consultados = coletar(monkeypatch, 10, ultimo_indice=6)
+    assert run_completo
+    assert indice == 10
+    assert sorted(consultados, key=int) == ["6", "7", "8", "9"]
+
+
+def test_erro_seguido_de_sucesso_nao_segura_o_indice(monkeypatch):
+    run_completo, indice, _ = coletar(monkeypatch, 10, falhas={"3"}, max_concorrencia=1)
+    assert run_completo
+    assert indice == 10
+
+
+def test_circuit_breaker_para_na_primeira_falha_pendente(monkeypatch):
+    # 5 erros seguidos (LIMITE_ERROS_CONSECUTIVOS) a partir do GTIN 10
+    falhas = {str(i) for i in range(10, 20)}
+    run_completo, indice, _ = coletar(monkeypatch, 20, falhas=falhas, max_concorrencia=1)
+    assert not run_completo
+    assert indice == 10
+
+
+def test_falhas_no_fim_sem_sucesso_depois_ficam_pendentes(monkeypatch):
+    # Menos erros que o limite, mas nenhum sucesso depois deles: a retomada refaz as falhas
+    run_completo, indice, _ = coletar(monkeypatch, 10, falhas={"8", "9"}, max_concorrencia=1)
+    assert indice == 8
+
+
+class GravadorFalso:
+    def __init__(self):
+        self.entregas = []
+
+    def adicionar(self, notas, lojas, indice_seguro):
+        self.entregas.append((notas, lojas, indice_seguro))
+
+
+@pytest.mark.parametrize("motor", ["buscar_notas", "buscar_notas_async"])
+def test_gravador_recebe_copias_e_os_buffers_da_coleta_ficam_vazios(monkeypatch, motor):
+    def consultar(url, params, limitador, cache=None, aguardar=True):
+        produto = {"id": f"n{params['gtin']}", "gtin": params["gtin"], "estabelecimento": {"codigo": f"l{params['gtin']}"}}
+        return 200, [produto]
+
+    monkeypatch.setattr(api_services, "_consultar_menor_preco", consultar)
+    gravador = GravadorFalso()
+    kwargs = {"max_concorrencia": 1} if motor == "buscar_notas_async" else {}
+    Notas, Lojas_SC, run_completo, indice = getattr(api_services, motor)(
+        PlanoConsultas(["0", "1", "2"], GEOHASHS), pd.DataFrame({"id_loja": []}), 0, None, None, None,
+        limitador=LimitadorAIMD(taxa_inicial=1000, taxa_maxima=1000), gravador=gravador, **kwargs
+    )
+
+    # Uma entrega por consulta, cada uma só com as suas linhas (nada alterado depois)
+    assert [(n.colunas["id_nota"], l.colunas["id_loja"], i) for n, l, i in gravador.entregas] == [
+        (["n0"], ["l0"], 1), (["n1"], ["l1"], 2), (["n2"], ["l2"], 3)
+    ]
+    assert Notas.empty and Lojas_SC.empty
+    assert (run_completo, indice) == (True, 3)
+
+
+@pytest.mark.parametrize("motor", ["buscar_notas", "buscar_notas_async"])
+def test_resolvidas_nao_inclui_falha_superada(monkeypatch, motor):
+    def consultar(url, params, limitador, cache=None, aguardar=True):
+        if params["gtin"] == "3":
+            raise ConnectionError("falha simulada")
+        return (400 if params["gtin"] == "5" else 204), None
+
+    monkeypatch.setattr(api_services, "_consultar_menor_preco", consultar)
+    monkeypatch.setattr(api_services, "mandarMSG", lambda *args: None)
+    resolvidas = set()
+    kwargs = {"max_concorrencia": 1} if motor == "buscar_notas_async" else {}
+    _, _, run_completo, indice = getattr(api_services, motor)(
+        PlanoConsultas([str(i) for i in range(8)], GEOHASHS), pd.DataFrame({"id_loja": []}), 0, None, None, None,
+        limitador=LimitadorAIMD(taxa_inicial=1000, taxa_maxima=1000), resolvidas=resolvidas, **kwargs
+    )
+
+    # O índice de retomada passa da falha (superada pelos sucessos seguintes); o set não
+    assert (run_completo, indice) == (True, 8)
+    assert resolvidas == {0, 1, 2, 4, 5, 6, 7}
@@ -0,0 +1,39 @@
+# tests/test_datahora.py
+
+import pandas as pd
+
+from MP_Feeder import response_parser
+from MP_Feeder.response_parser import normalizar_datahora
+
+
+def zerar_estatisticas(monkeypatch):
+    estatisticas = {"convertidas": 0, "formato_alternativo": 0, "invalidas": 0}
+    monkeypatch.setattr(response_parser, "_estatisticas_datahora", estatisticas)
+    return estatisticas
+
+
+def test_formato_da_api_descarta_fracao_e_z(monkeypatch):
+    estatisticas = zerar_estatisticas(monkeypatch)
+    datas = normalizar_datahora(["2025-11-20T14:32:10.000Z", "2025-11-20T14:32:10Z", "2025-11-20T14:32:10"])
+    assert datas.tolist() == [pd.Timestamp("2025-11-20 14:32:10")] * 3
+    assert estatisticas == {"convertidas": 3, "formato_alternativo": 0, "invalidas": 0}
+
+
+def test_formatos_alternativos_sao_convertidos_e_contados(monkeypatch):
+    estatisticas = zerar_estatisticas(monkeypatch)
+    datas = normalizar_datahora(["2025-11-20 14:32:10.987", "2025-11-20T14:32:10-03:00", "2025-11-20"])
+    assert datas.tolist() == [
+        pd.Timestamp("2025-11-20 14:32:10"),
+        pd.Timestamp("2025-11-20 14:32:10"),  # formato padrão nos 19 primeiros: fuso descartado
+        pd.Timestamp("2025-11-20 00:00:00"),
+    ]
+    assert estatisticas == {"convertidas": 3, "formato_alternativo": 2, "invalidas": 0}
+
+
+def test_invalidos_viram_nulos_e_nulos_nao_contam(monkeypatch):
+    estatisticas = zerar_estatisticas(monkeypatch)
+    datas = normalizar_datahora(["2025-11-20T14:32:10.000Z", "ontem", None])
+    assert datas.iloc[0] == pd.Timestamp("2025-11-20 14:32:10")
+    assert datas.iloc[1:].isna().all()
+    assert pd.api.types.is_datetime64_any_dtype(datas)
+    assert estatisticas == {"convertidas": 1, "formato_alternativo": 0, "invalidas": 1}
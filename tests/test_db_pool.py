@@ -0,0 +1,166 @@
+# tests/test_db_pool.py
+
+import threading
+import time
+import types
+
+import pytest
+
+from MP_Feeder import db_pool
+
+DB_CONFIG = {"host": "localhost", "port": 3306, "user": "teste", "password": ""}
+
+
+class Erro(Exception):
+    pass
+
+
+class PoolError(Erro):
+    pass
+
+
+class ConexaoFalsa:
+    def __init__(self):
+        self.pool = None
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.devolver(self)
+
+    def ping(self):
+        pass
+
+
+class ConnectionPoolFalso:
+    """Como o mariadb.ConnectionPool: get_connection dá PoolError se não há conexão livre."""
+
+    def __init__(self, pool_size, **_):
+        self.pool_size = pool_size
+        self.conexoes = []
+        self.livres = []
+        self._lock = threading.Lock()
+        self.apos_add = None  # gancho do teste: roda entre o add e o get de quem abriu a conexão
+
+    def add_connection(self, conn):
+        with self._lock:
+            if len(self.conexoes) >= self.pool_size:
+                raise PoolError("pool cheio")
+            conn.pool = self
+            self.conexoes.append(conn)
+            self.livres.append(conn)
+        if self.apos_add is not None:
+            self.apos_add()
+
+    def get_connection(self):
+        with self._lock:
+            if not self.livres:
+                raise PoolError("nenhuma conexão livre")
+            return self.livres.pop()
+
+    def devolver(self, conn):
+        with self._lock:
+            self.livres.append(conn)
+
+    def close(self):
+        pass
+
+
+def connect(**_):
+    time.sleep(0.001)
+    return ConexaoFalsa()
+
+
+@pytest.fixture
+def mdb(monkeypatch):
+    falso = types.SimpleNamespace(
+        Error=Erro, PoolError=PoolError, ProgrammingError=Erro,
+        ConnectionPool=ConnectionPoolFalso, connect=connect,
+    )
+    monkeypatch.setattr(db_pool, "mdb", falso)
+    monkeypatch.setattr(db_pool, "_pools", {})
+    monkeypatch.setattr(db_pool, "CONFIG_POOL", {"tamanho": 3, "validar_apos_segundos": 30, "espera_segundos": 5})
+    return falso
+
+
+def test_threads_concorrentes_nunca_passam_do_tamanho(mdb):
+    erros = []
+
+    def trabalhar():
+        try:
+            for _ in range(50):
+                conn = db_pool.conectar(DB_CONFIG)
+                conn.ping()
+                conn.close()
+        except Exception as e:  # noqa: BLE001 - o teste só coleta
+            erros.append(e)
+
+    threads = [threading.Thread(target=trabalhar) for _ in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert erros == []
+    (pool,) = db_pool._pools.values()
+    assert pool.stats["aquisicoes"] == 12 * 50
+    assert pool.stats["em_uso"] == 0
+    assert pool.stats["conexoes_novas"] <= 3
+    assert pool.stats["pico_em_uso"] <= 3
+    assert pool.stats["conexoes_avulsas"] == 0
+    assert len(pool.pool.conexoes) == len(pool.pool.livres) <= 3
+
+
+def test_conexao_recem_adicionada_fica_com_quem_a_abriu(mdb):
+    adicionada, outra_obteve = threading.Event(), threading.Event()
+    pool = db_pool._PoolBanco("teste", DB_CONFIG, "dbDrogamais")
+
+    def apos_add():
+        adicionada.set()
+        outra_obteve.wait(0.5)  # com o lock do pool a outra thread não entra: segue após o timeout
+    pool.pool.apos_add = apos_add
+
+    obtidas = {}
+    thread = threading.Thread(target=lambda: obtidas.setdefault("primeira", pool.obter()))
+    thread.start()
+    assert adicionada.wait(5)
+    pool.pool.apos_add = None
+    obtidas["segunda"] = pool.obter()
+    outra_obteve.set()
+    thread.join()
+
+    primeira, segunda = obtidas["primeira"], obtidas["segunda"]
+    primeira.ping()
+    segunda.ping()
+    assert primeira._conexao() is not segunda._conexao()
+    assert pool.stats["conexoes_novas"] == 2
+
+
+def test_pool_sem_conexao_livre_da_pool_error_e_libera_a_vaga(mdb, monkeypatch):
+    monkeypatch.setattr(ConnectionPoolFalso, "add_connection", lambda self, conn: None)
+    for _ in range(4):  # mais tentativas que vagas: nenhuma pode vazar
+        with pytest.raises(PoolError):
+            db_pool.conectar(DB_CONFIG)
+    (pool,) = db_pool._pools.values()
+    assert pool.stats["em_uso"] == 0
+    assert all(pool._vagas.acquire(timeout=0) for _ in range(3))
+
+
+def test_sem_vaga_abre_conexao_avulsa(mdb):
+    db_pool.configurar_pool(espera_segundos=0.01)
+    presas = [db_pool.conectar(DB_CONFIG) for _ in range(3)]
+    avulsa = db_pool.conectar(DB_CONFIG)
+
+    assert avulsa._pool is None
+    (pool,) = db_pool._pools.values()
+    assert pool.stats["conexoes_avulsas"] == 1
+    for conn in presas:
+        conn.close()
+    assert pool.stats["em_uso"] == 0
+
+
+def test_conexao_devolvida_nao_pode_ser_usada(mdb):
+    conn = db_pool.conectar(DB_CONFIG)
+    conn.close()
+    conn.close()  # idempotente
+    with pytest.raises(Erro):
+        conn.ping()
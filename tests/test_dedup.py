@@ -0,0 +1,40 @@
+# tests/test_dedup.py
+
+from MP_Feeder.dedup import FiltroBloom, VistosColeta
+
+
+def test_repeticoes_sao_descartadas_e_contadas_por_geohash():
+    vistos = VistosColeta()
+    assert vistos.nota_nova("n1", "g1") is True
+    assert vistos.nota_nova("n1", "g2") is False
+    assert vistos.nota_nova("n1", "g2") is False
+    assert vistos.loja_nova("l1", "g1") is True
+    assert vistos.loja_nova("l1", "g2") is False
+
+    assert vistos.notas_unicas == 1
+    assert vistos.notas_repetidas == {"g2": 2}
+    assert vistos.lojas_repetidas == {"g2": 1}
+
+
+def test_migra_para_bloom_sem_esquecer_os_ids_ja_vistos():
+    vistos = VistosColeta(max_ids_exatos=3, capacidade_bloom=1000)
+    for i in range(4):
+        assert vistos.nota_nova(f"n{i}", "g1") is True
+
+    assert vistos._bloom is not None
+    assert not vistos._notas
+    # Bloom nunca dá falso negativo: todos os já vistos continuam repetidos
+    assert not any(vistos.nota_nova(f"n{i}", "g1") for i in range(4))
+    assert vistos.nota_nova("n-nova", "g1") is True
+    assert vistos.notas_unicas == 5
+    assert vistos.notas_repetidas == {"g1": 4}
+
+
+def test_filtro_bloom_respeita_a_taxa_de_falso_positivo():
+    filtro = FiltroBloom(10000, taxa_falso_positivo=0.01)
+    for i in range(10000):
+        filtro.adicionar(f"a{i}")
+    assert not any(filtro.adicionar(f"a{i}") for i in range(10000))
+    # Cada sonda também é inserida: poucas, para o filtro não passar muito da capacidade
+    falsos_positivos = sum(not filtro.adicionar(f"b{i}") for i in range(1000))
+    assert falsos_positivos < 50
@@ -0,0 +1,88 @@
+# tests/test_fila_mariadb.py
+#
+# SQL da fila dos workers contra um MariaDB de verdade: o descartável do
+# utils/docker-compose.planos.yml (porta 3307). Sem o driver ou sem o
+# container no ar, os testes são pulados.
+#
+#   docker compose -f utils/docker-compose.planos.yml up -d
+#   python -m pytest -q tests/test_fila_mariadb.py
+
+import os
+import time
+import uuid
+
+import pytest
+
+from MP_Feeder import db_pool
+from MP_Feeder.db_manager import concluir_lote_fila, contar_fila, popular_fila_consultas, reservar_lote_fila
+from MP_Feeder.query_plan import PlanoConsultas
+
+DB_CONFIG = {
+    "host": os.environ.get("MP_FEEDER_TESTE_DB_HOST", "127.0.0.1"),
+    "port": int(os.environ.get("MP_FEEDER_TESTE_DB_PORT", "3307")),
+    "user": "root",
+    "password": os.environ.get("MP_FEEDER_TESTE_DB_SENHA", "mp_feeder"),
+}
+MIGRACAO_FILA = os.path.join(
+    os.path.dirname(__file__), "..", "utils", "migrations", "v1_10_mp_feeder_fila_consultas.sql"
+)
+
+
+@pytest.fixture
+def rodada():
+    """Cria a tabela da fila (migração v1_10) e devolve um id_rodada só deste teste."""
+    mariadb = pytest.importorskip("mariadb")
+    try:
+        conn = mariadb.connect(**DB_CONFIG, database="dbDrogamais", connect_timeout=2)
+    except mariadb.Error as e:
+        pytest.skip(f"MariaDB de teste indisponível em {DB_CONFIG['host']}:{DB_CONFIG['port']}: {e}")
+
+    cursor = conn.cursor()
+    with open(MIGRACAO_FILA, encoding="utf-8") as f:
+        cursor.execute(f.read())
+    conn.commit()
+
+    id_rodada = f"teste-{uuid.uuid4().hex[:12]}"
+    yield id_rodada
+
+    cursor.execute("DELETE FROM mp_feeder_fila_consultas WHERE id_rodada = %s", (id_rodada,))
+    conn.commit()
+    cursor.close()
+    conn.close()
+    db_pool.fechar_pools()
+
+
+def enfileirar(id_rodada, total):
+    plano = PlanoConsultas([str(7890000000000 + i) for i in range(total)], ["6gge7u6cc"])
+    assert popular_fila_consultas(DB_CONFIG, plano, id_rodada) == total
+
+
+def indices(Lote):
+    return sorted(int(i) for i in Lote["index"])
+
+
+def test_lote_parcial_conclui_so_o_resolvido(rodada):
+    enfileirar(rodada, 4)
+    assert indices(reservar_lote_fila(DB_CONFIG, rodada, "w1", tamanho_lote=3)) == [0, 1, 2]
+
+    concluir_lote_fila(DB_CONFIG, rodada, "w1", [0, 2], [1])
+
+    assert contar_fila(DB_CONFIG, rodada) == {"pendente": 2, "em_andamento": 0, "concluida": 2, "lease_vencido": 0}
+    assert indices(reservar_lote_fila(DB_CONFIG, rodada, "w2", tamanho_lote=10)) == [1, 3]
+
+
+def test_lease_vencido_volta_para_outro_worker(rodada):
+    enfileirar(rodada, 2)
+    assert indices(reservar_lote_fila(DB_CONFIG, rodada, "morto", visibilidade_segundos=1)) == [0, 1]
+    assert reservar_lote_fila(DB_CONFIG, rodada, "w2").empty  # lease ainda vale
+
+    time.sleep(2.1)  # 'lease_ate' tem precisão de segundos
+    assert contar_fila(DB_CONFIG, rodada)["lease_vencido"] == 2
+    assert indices(reservar_lote_fila(DB_CONFIG, rodada, "w2")) == [0, 1]
+
+    # O 'concluir' atrasado do worker morto não mexe no lote que agora é do w2
+    concluir_lote_fila(DB_CONFIG, rodada, "morto", [0, 1], [])
+    assert contar_fila(DB_CONFIG, rodada)["em_andamento"] == 2
+
+    concluir_lote_fila(DB_CONFIG, rodada, "w2", [0, 1], [])
+    assert contar_fila(DB_CONFIG, rodada)["concluida"] == 2
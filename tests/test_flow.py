@@ -0,0 +1,222 @@
+# tests/test_flow.py
+
+import datetime
+import types
+
+import pandas as pd
+import pytest
+
+from MP_Feeder import api_services, flow
+from MP_Feeder.query_plan import PlanoConsultas
+from MP_Feeder.rate_limiter import LimitadorAIMD
+
+HOJE = datetime.date(2026, 10, 18)
+
+
+class GravadorFalso:
+    """Gravador streaming que já gravou alguns lotes e devolve o que sobrou."""
+
+    indice_gravado = 7
+    sobra_notas = ["n9"]
+    sobra_lojas = []
+
+    def __init__(self, *args, **kwargs):
+        self.notas_gravadas, self.lojas_gravadas = 3, 2
+
+    def finalizar(self):
+        return pd.DataFrame({"id_nota": self.sobra_notas}), pd.DataFrame({"id_loja": self.sobra_lojas})
+
+
+@pytest.fixture
+def rodada(monkeypatch, tmp_path):
+    """Fluxo normal sem banco/API: contexto, consultas e recursos da coleta falsos."""
+    contexto = types.SimpleNamespace(ultima_att_gtins=HOJE, Lojas=pd.DataFrame({"id_loja": []}), estado_rotacao=None)
+    geocodificacoes = []
+    monkeypatch.setattr(flow, "prefetch_contexto", lambda *args, **kwargs: contexto)
+    monkeypatch.setattr(
+        flow, "_gerar_consultas_da_rodada",
+        lambda configs, contexto: (PlanoConsultas(["1", "2"], ["6gge7u6cc"]), {"notas": 0, "lojas": 0})
+    )
+    monkeypatch.setattr(flow, "_preparar_recursos_coleta", lambda *args: (None, None, None, None))
+    monkeypatch.setattr(flow, "_encerrar_recursos_coleta", lambda *args: None)
+    monkeypatch.setattr(flow, "_geocodificar_lojas_pendentes", lambda *args: geocodificacoes.append(args))
+    monkeypatch.setattr(flow, "GravadorStreaming", GravadorFalso)
+
+    configs = {
+        "DB_CONFIG": {}, "arquivo_indice": str(tmp_path / "ultimo_indice.txt"),
+        "carga_streaming": True, "diretorio_journal": None,
+    }
+    return configs, geocodificacoes
+
+
+def coletar_com(monkeypatch, resultado=None, erro=None):
+    def executar(*args):
+        if erro:
+            raise erro
+        return resultado
+    monkeypatch.setattr(flow, "_executar_coleta", executar)
+
+
+def test_erro_na_coleta_leva_as_pendencias_do_gravador(monkeypatch, rodada):
+    configs, geocodificacoes = rodada
+    erro = ConnectionError("Can't connect to MySQL server (10060)")
+    coletar_com(monkeypatch, erro=erro)
+
+    with pytest.raises(flow.ColetaInterrompida) as falha:
+        flow.run_normal_flow(configs, None, HOJE)
+
+    assert falha.value.Notas["id_nota"].tolist() == ["n9"]
+    assert falha.value.indice == 7
+    # Mesma mensagem (o error_handler decide pelo texto) e o erro original encadeado
+    assert str(falha.value) == str(erro)
+    assert falha.value.__cause__ is erro
+    assert geocodificacoes == []
+
+
+def test_erro_antes_do_primeiro_lote_volta_ao_indice_inicial(monkeypatch, rodada):
+    configs, _ = rodada
+    monkeypatch.setattr(GravadorFalso, "indice_gravado", None)
+    with open(configs["arquivo_indice"], "w") as f:
+        f.write("4")
+    coletar_com(monkeypatch, erro=RuntimeError("falha"))
+
+    with pytest.raises(flow.ColetaInterrompida) as falha:
+        flow.run_normal_flow(configs, None, HOJE)
+    assert falha.value.indice == 4
+
+
+def test_erro_sem_streaming_sobe_como_veio(monkeypatch, rodada):
+    configs, _ = rodada
+    coletar_com(monkeypatch, erro=RuntimeError("falha"))
+    with pytest.raises(RuntimeError):
+        flow.run_normal_flow({**configs, "carga_streaming": False}, None, HOJE)
+
+
+def test_streaming_geocodifica_as_pendentes_uma_vez_no_fim(monkeypatch, rodada):
+    configs, geocodificacoes = rodada
+    coletar_com(monkeypatch, resultado=(pd.DataFrame(), pd.DataFrame(), True, 2, {0, 1}))
+
+    Notas, Lojas_SC, run_completo, indice, grupo = flow.run_normal_flow(configs, "agora", HOJE)
+
+    assert Notas["id_nota"].tolist() == ["n9"] and Lojas_SC.empty
+    assert (run_completo, indice) == (True, 2)
+    assert grupo == {"notas": 3, "lojas": 2}
+    assert geocodificacoes == [({}, "agora")]
+
+
+def test_lojas_nao_gravadas_ficam_para_a_carga_do_main(monkeypatch, rodada):
+    configs, geocodificacoes = rodada
+    monkeypatch.setattr(GravadorFalso, "sobra_lojas", ["l9"])
+    coletar_com(monkeypatch, resultado=(pd.DataFrame(), pd.DataFrame(), True, 2, {0, 1}))
+
+    _, Lojas_SC, _, _, _ = flow.run_normal_flow(configs, "agora", HOJE)
+
+    # O main.py geocodifica essas: um limite do Nominatim por rodada
+    assert Lojas_SC["id_loja"].tolist() == ["l9"]
+    assert geocodificacoes == []
+
+
+class FilaFalsa:
+    """
+    mp_feeder_fila_consultas em memória, com as regras do SQL do db_manager:
+    reserva pendentes ou leases vencidos (em ordem de índice) e só conclui/devolve
+    linhas ainda reservadas pelo mesmo worker. 'agora' é um relógio falso.
+    """
+
+    def __init__(self, gtins):
+        self.agora = 0
+        self.linhas = {i: {"gtin": g, "status": "pendente", "worker": None, "lease_ate": None} for i, g in enumerate(gtins)}
+        self.conclusoes = []
+
+    def reservar(self, DB_CONFIG, id_rodada, worker, tamanho_lote=50, visibilidade_segundos=600):
+        livres = [
+            i for i, l in sorted(self.linhas.items())
+            if l["status"] == "pendente" or (l["status"] == "em_andamento" and l["lease_ate"] < self.agora)
+        ][:tamanho_lote]
+        for i in livres:
+            self.linhas[i].update(status="em_andamento", worker=worker, lease_ate=self.agora + visibilidade_segundos)
+        return pd.DataFrame(
+            [(self.linhas[i]["gtin"], "6gge7u6cc", i) for i in livres], columns=["gtin", "geohash", "index"]
+        )
+
+    def concluir(self, DB_CONFIG, id_rodada, worker, indices_concluidos, indices_devolvidos):
+        self.conclusoes.append((worker, list(indices_concluidos), list(indices_devolvidos)))
+        for status, indices in (("concluida", indices_concluidos), ("pendente", indices_devolvidos)):
+            for i in indices:
+                linha = self.linhas[i]
+                if linha["status"] == "em_andamento" and linha["worker"] == worker:
+                    linha.update(status=status, lease_ate=None)
+
+    def contar(self, DB_CONFIG, id_rodada):
+        situacao = {"pendente": 0, "em_andamento": 0, "concluida": 0, "lease_vencido": 0}
+        for linha in self.linhas.values():
+            if linha["status"] == "em_andamento" and linha["lease_ate"] < self.agora:
+                situacao["lease_vencido"] += 1
+            else:
+                situacao[linha["status"]] += 1
+        return situacao
+
+    def esperar(self, segundos):
+        self.agora += segundos
+
+
+@pytest.fixture
+def worker(monkeypatch):
+    """run_worker_flow com a fila em memória; a API responde 204 e 'falhas' levanta erro de rede (uma vez)."""
+    contexto = types.SimpleNamespace(Lojas=pd.DataFrame({"id_loja": []}), estado_rotacao=None)
+    monkeypatch.setattr(flow, "prefetch_contexto", lambda *args, **kwargs: contexto)
+    monkeypatch.setattr(flow, "_gerar_consultas_da_rodada", lambda configs, contexto: (None, {"notas": 0, "lojas": 0}))
+    monkeypatch.setattr(flow, "popular_fila_consultas", lambda *args: None)
+    monkeypatch.setattr(flow, "registrar_estado_rotacao", lambda *args, **kwargs: False)
+    monkeypatch.setattr(flow, "_encerrar_recursos_coleta", lambda *args: None)
+    monkeypatch.setattr(
+        flow, "_preparar_recursos_coleta",
+        lambda *args: (LimitadorAIMD(taxa_inicial=1000, taxa_maxima=1000), None, None, None)
+    )
+    monkeypatch.setattr(api_services, "mandarMSG", lambda *args: None)
+
+    def rodar(fila, falhas=(), tamanho_lote=4):
+        pendentes = set(falhas)
+
+        def consultar(url, params, limitador, cache=None, aguardar=True):
+            if params["gtin"] in pendentes:
+                pendentes.discard(params["gtin"])
+                raise ConnectionError("falha simulada")
+            return 204, None
+
+        monkeypatch.setattr(api_services, "_consultar_menor_preco", consultar)
+        monkeypatch.setattr(flow, "reservar_lote_fila", fila.reservar)
+        monkeypatch.setattr(flow, "concluir_lote_fila", fila.concluir)
+        monkeypatch.setattr(flow, "contar_fila", fila.contar)
+        monkeypatch.setattr(flow.time, "sleep", fila.esperar)
+        configs = {
+            "DB_CONFIG": {}, "arquivo_indice": None, "id_rodada": "r1",
+            "TELEGRAM_TOKEN": None, "TELEGRAM_CHAT_ID": None, "tamanho_lote_fila": tamanho_lote,
+        }
+        return flow.run_worker_flow(configs, datetime.datetime(2026, 10, 18), HOJE, "w1")
+
+    return rodar
+
+
+def test_falha_superada_no_meio_do_lote_volta_para_a_fila(worker):
+    fila = FilaFalsa(["g0", "g1", "g2", "g3", "g4", "g5"])
+    # g1 falha, mas g2 e g3 dão certo depois: o índice do motor passa de 1, a consulta 1 não
+    assert worker(fila, falhas={"g1"}) == (True, True)
+
+    assert fila.conclusoes == [("w1", [0, 2, 3], [1]), ("w1", [1, 4, 5], [])]
+    assert all(linha["status"] == "concluida" for linha in fila.linhas.values())
+
+
+def test_lote_nao_contiguo_e_lease_vencido_de_outro_worker(worker):
+    fila = FilaFalsa(["g0", "g1", "g2", "g3", "g4"])
+    # Worker morto segura a consulta 1 até t=20: o lote do w1 fica [0, 2, 3, 4]
+    fila.linhas[1].update(status="em_andamento", worker="morto", lease_ate=20)
+
+    assert worker(fila, falhas={"g3"}, tamanho_lote=10) == (True, True)
+
+    assert fila.conclusoes == [
+        ("w1", [0, 2, 4], [3]),  # 3 falhou (superada pela 4): devolvida
+        ("w1", [3], []),
+        ("w1", [1], []),         # lease do 'morto' venceu enquanto o w1 esperava
+    ]
+    assert fila.linhas[1]["worker"] == "w1"
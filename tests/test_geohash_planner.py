@@ -0,0 +1,71 @@
+# tests/test_geohash_planner.py
+
+import pandas as pd
+import pytest
+
+from MP_Feeder.geohash_planner import decodificar_geohash, distancia_km, planejar_centros
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def codificar_geohash(lat, lon, precisao=7):
+    """Inverso do decodificar_geohash (só para montar os cenários)."""
+    faixa_lat, faixa_lon = [-90.0, 90.0], [-180.0, 180.0]
+    bits, longitude = [], True
+    while len(bits) < precisao * 5:
+        faixa, valor = (faixa_lon, lon) if longitude else (faixa_lat, lat)
+        meio = (faixa[0] + faixa[1]) / 2
+        bits.append(valor >= meio)
+        faixa[0 if valor >= meio else 1] = meio
+        longitude = not longitude
+    return "".join(
+        BASE32[int("".join("1" if b else "0" for b in bits[i:i + 5]), 2)] for i in range(0, len(bits), 5)
+    )
+
+
+def cidades(*pontos):
+    return pd.DataFrame({"geohash": [codificar_geohash(lat, lon) for lat, lon in pontos]})
+
+
+def test_decodifica_o_centro_da_celula():
+    lat, lon = decodificar_geohash("6gge7u6cc")  # Londrina
+    assert lat == pytest.approx(-23.31, abs=0.01)
+    assert lon == pytest.approx(-51.16, abs=0.01)
+    assert decodificar_geohash(codificar_geohash(-25.43, -49.27)) == pytest.approx((-25.43, -49.27), abs=0.001)
+
+
+def test_distancia_de_um_grau_de_latitude():
+    assert distancia_km(-25.0, -49.0, -24.0, -49.0) == pytest.approx(111.2, abs=0.1)
+
+
+def test_vizinhas_cobertas_por_um_centro_so():
+    # Três cidades a ~9 km uma da outra (em linha) e uma a ~110 km
+    Geohashs = cidades((-23.30, -51.25), (-23.30, -51.16), (-23.30, -51.07), (-24.30, -51.16))
+    Centros = planejar_centros(Geohashs, raio_km=20, margem_km=5)
+    assert Centros["geohash"].tolist() == [Geohashs["geohash"][1], Geohashs["geohash"][3]]
+
+
+def test_toda_cidade_fica_dentro_do_alcance_de_um_centro():
+    pontos = [(-25.5 + 0.07 * i, -49.5 + 0.09 * j) for i in range(10) for j in range(10)]
+    Geohashs = cidades(*pontos)
+    Centros = planejar_centros(Geohashs, raio_km=20, margem_km=5)
+
+    centros = [decodificar_geohash(g) for g in Centros["geohash"]]
+    assert len(centros) < len(pontos)
+    for geohash in Geohashs["geohash"]:
+        lat, lon = decodificar_geohash(geohash)
+        assert min(distancia_km(lat, lon, *centro) for centro in centros) <= 15
+    # Determinístico e na ordem original
+    assert Centros["geohash"].tolist() == planejar_centros(Geohashs, 20, 5)["geohash"].tolist()
+    assert Centros["geohash"].tolist() == [g for g in Geohashs["geohash"] if g in set(Centros["geohash"])]
+
+
+def test_margem_maior_que_o_raio_mantem_todas():
+    Geohashs = cidades((-23.30, -51.25), (-23.30, -51.16))
+    assert planejar_centros(Geohashs, raio_km=20, margem_km=25)["geohash"].tolist() == Geohashs["geohash"].tolist()
+
+
+def test_lista_vazia_e_repetidas():
+    assert planejar_centros(pd.DataFrame({"geohash": []})).empty
+    Geohashs = pd.DataFrame({"geohash": ["6gge7u6cc", None, "6gge7u6cc"]})
+    assert planejar_centros(Geohashs)["geohash"].tolist() == ["6gge7u6cc"]
@@ -0,0 +1,68 @@
+# tests/test_grupo_eans.py
+
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from MP_Feeder import etl_utils
+from MP_Feeder.etl_utils import grupo_eans_selecionados
+
+HOJE = date(2026, 10, 18)
+
+
+@pytest.fixture(autouse=True)
+def grupos_de_dois(monkeypatch):
+    monkeypatch.setattr(etl_utils, "PRODUTOS_POR_GRUPO", 2)
+
+
+def eans(*gtins):
+    return pd.DataFrame({"gtin": list(gtins)})
+
+
+def novo_estado(grupo, ultimo_gtin, total_grupos=3, data_lista=HOJE):
+    return {"grupo": grupo, "ultimo_gtin": ultimo_gtin, "total_grupos": total_grupos, "data_lista_produtos": data_lista}
+
+
+def selecionar(EANs, ult_gtin=None, arquivo_indice=None, estado=None):
+    grupo, numero = grupo_eans_selecionados(EANs, ult_gtin, arquivo_indice, estado, data_lista=HOJE)
+    return grupo["gtin"].tolist(), numero
+
+
+EANS = eans("a", "b", "c", "d", "e")  # grupos: [a, b], [c, d], [e]
+
+
+def test_lista_vazia():
+    assert selecionar(eans()) == ([], 0)
+
+
+@pytest.mark.parametrize("concluido, esperado", [(1, (["c", "d"], 2)), (2, (["e"], 3)), (3, (["a", "b"], 1))])
+def test_estado_vai_para_o_grupo_seguinte(concluido, esperado):
+    assert selecionar(EANS, ult_gtin="zzz", estado=novo_estado(concluido, "x")) == esperado
+
+
+def test_lista_mudou_continua_depois_do_ultimo_gtin():
+    estado = novo_estado(1, "c", data_lista=date(2026, 10, 17))
+    assert selecionar(EANS, estado=estado) == (["e"], 3)
+
+    estado = novo_estado(2, "c", total_grupos=4)  # mesmo dia, mas outra quantidade de grupos
+    assert selecionar(EANS, estado=estado) == (["e"], 3)
+
+    estado = novo_estado(2, "sumiu", data_lista=date(2026, 10, 17))
+    assert selecionar(EANS, estado=estado) == (["a", "b"], 1)
+
+
+def test_fallback_sem_estado(tmp_path):
+    indice = tmp_path / "ultimo_indice.txt"
+    assert selecionar(EANS) == (["a", "b"], 1)
+    assert selecionar(EANS, ult_gtin="b", arquivo_indice=str(indice)) == (["c", "d"], 2)
+    assert selecionar(EANS, ult_gtin="e", arquivo_indice=str(indice)) == (["a", "b"], 1)
+    assert selecionar(EANS, ult_gtin="sumiu", arquivo_indice=str(indice)) == (["a", "b"], 1)
+
+
+def test_fallback_com_indice_repete_o_grupo_nao_finalizado(tmp_path):
+    indice = tmp_path / "ultimo_indice.txt"
+    indice.write_text("3")
+    assert selecionar(EANS, ult_gtin="b", arquivo_indice=str(indice)) == (["a", "b"], 1)
+    # Modo worker (sem arquivo de índice): segue para o próximo grupo
+    assert selecionar(EANS, ult_gtin="b", arquivo_indice=None) == (["c", "d"], 2)
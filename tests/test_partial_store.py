@@ -0,0 +1,84 @@
+# tests/test_partial_store.py
+
+import os
+
+import pandas as pd
+import pytest
+
+from MP_Feeder.partial_store import (
+    carregar_parciais, parciais_pendentes, remover_parciais, salvar_parciais
+)
+
+pytest.importorskip("pyarrow")
+
+
+def notas():
+    return pd.DataFrame({
+        "id_nota": ["n1", "n2"],
+        "datahora": ["2025-11-20 14:32:10", "2025-11-21 08:00:00"],
+        "id_loja": [123.0, None],  # ids com nulo chegam como float
+        "geohash": ["6gge7u6cc", "6gge7u6cd"],
+        "gtin": ["07891234567895", "0000000000017"],
+        "descricao": ["DIPIRONA", "SORO"],
+        "valor_desconto": [0.0, 1.5],
+        "valor_tabela": [10.0, 7.5],
+        "valor": ["10.0", "6.0"],
+        "cidade": ["CURITIBA", "LONDRINA"],
+    })
+
+
+def lojas():
+    return pd.DataFrame({
+        "id_loja": ["123"], "nome_fantasia": ["FARMA"], "razao_social": ["FARMA LTDA"],
+        "logradouro": ["RUA A"], "cidade": ["CURITIBA"], "geohash": ["6gge7u6cc"], "local": ["x"],
+    })
+
+
+def arquivos(tmp_path):
+    return str(tmp_path / "notas_parciais.parquet"), str(tmp_path / "lojas_parciais.parquet")
+
+
+def test_ida_e_volta_preserva_tipos_e_zeros_a_esquerda(tmp_path):
+    arquivo_notas, arquivo_lojas = arquivos(tmp_path)
+    assert salvar_parciais(notas(), lojas(), arquivo_notas, arquivo_lojas) == "parquet"
+    assert parciais_pendentes(arquivo_notas)
+
+    Notas, Lojas = carregar_parciais(arquivo_notas, arquivo_lojas)
+    assert Notas["gtin"].tolist() == ["07891234567895", "0000000000017"]
+    assert Notas["id_loja"].tolist()[0] == "123"
+    assert pd.isna(Notas["id_loja"].iloc[1])
+    assert Notas["datahora"].tolist() == [pd.Timestamp("2025-11-20 14:32:10"), pd.Timestamp("2025-11-21 08:00:00")]
+    assert Notas["valor"].dtype == "float64"
+    assert Lojas["id_loja"].tolist() == ["123"]
+
+    remover_parciais(arquivo_notas, arquivo_lojas)
+    assert not parciais_pendentes(arquivo_notas)
+
+
+def test_csv_antigo_migra_para_parquet(tmp_path):
+    arquivo_notas, arquivo_lojas = arquivos(tmp_path)
+    # Formato do CSV antigo: ids com nulo gravados como '123.0'
+    notas().assign(id_nota=["1.0", "2.0"]).to_csv(tmp_path / "notas_parciais.csv", index=False)
+    assert parciais_pendentes(arquivo_notas)
+
+    Notas, Lojas = carregar_parciais(arquivo_notas, arquivo_lojas)
+    assert Notas["id_nota"].tolist() == ["1", "2"]
+    assert Notas["id_loja"].tolist()[0] == "123"
+    assert Notas["gtin"].tolist() == ["07891234567895", "0000000000017"]
+    assert Lojas.empty
+    assert not os.path.exists(tmp_path / "notas_parciais.csv")
+    assert os.path.exists(arquivo_notas)
+
+
+def test_colunas_obrigatorias_faltando(tmp_path):
+    arquivo_notas, arquivo_lojas = arquivos(tmp_path)
+    with pytest.raises(ValueError, match="gtin"):
+        salvar_parciais(notas().drop(columns="gtin"), pd.DataFrame(), arquivo_notas, arquivo_lojas)
+    assert not parciais_pendentes(arquivo_notas)
+
+
+def test_versao_de_esquema_diferente(tmp_path):
+    arquivo_notas, arquivo_lojas = arquivos(tmp_path)
+    notas().to_parquet(arquivo_notas)  # sem a versão do esquema nos metadados
+    with pytest.raises(ValueError, match="esquema"):
+        carregar_parciais(arquivo_notas, arquivo_lojas)
@@ -0,0 +1,83 @@
+# tests/test_preparar_produtos.py
+
+import types
+
+import pandas as pd
+
+from MP_Feeder import db_manager
+from MP_Feeder.db_manager import _executemany_isolando_erros, _preparar_produtos
+
+
+def produto(gtin, codigo, descricao="DIPIRONA 500MG"):
+    return {
+        "GTIN": gtin, "codigo_interno_produto": codigo, "descricao_produto": descricao,
+        "nome_fantasia_fabricante": "EMS", "apresentacao_produto": "CX 10", "tipo": "GENERICO",
+    }
+
+
+def motivos(Rejeitados):
+    return dict(zip(Rejeitados["codigo_interno_produto"].fillna("<vazio>"), Rejeitados["motivo"]))
+
+
+def test_normaliza_gtin_e_codigo():
+    Produtos, Rejeitados = _preparar_produtos(pd.DataFrame([
+        produto(7891234567895.0, 123.0),
+        produto(" 17 ", " 456 "),
+    ]))
+    assert Rejeitados.empty
+    assert Produtos["gtin"].tolist() == ["07891234567895", "00000000000017"]
+    assert Produtos["id_produto"].tolist() == ["123", "456"]
+
+
+def test_separa_linhas_que_o_banco_recusaria_com_o_motivo():
+    Produtos, Rejeitados = _preparar_produtos(pd.DataFrame([
+        produto("7891234567895", "1"),
+        produto(None, "2"),
+        produto("78912345ABC", "3"),
+        produto("123456789012345", "4"),
+        produto("7891234567895", None),
+        produto("7891234567895", "6", descricao="X" * 61),
+        produto("7891234567895", "1"),
+    ]))
+
+    assert Produtos["id_produto"].tolist() == ["1"]
+    assert motivos(Rejeitados) == {
+        "2": "GTIN vazio",
+        "3": "GTIN não numérico ou com mais de 14 dígitos",
+        "4": "GTIN não numérico ou com mais de 14 dígitos",
+        "<vazio>": "codigo_interno_produto vazio",
+        "6": "descricao com mais de 60 caracteres",
+        "1": "repetido no lote (mesmo código e GTIN)",
+    }
+
+
+class ErroDeDado(Exception):
+    pass
+
+
+class CursorFalso:
+    """Recusa o executemany de qualquer lote que contenha uma linha 'ruim'."""
+
+    def __init__(self):
+        self.gravadas = []
+
+    def execute(self, sql):
+        pass
+
+    def executemany(self, sql, linhas):
+        ruins = [linha for linha in linhas if linha[1] == "ruim"]
+        if ruins:
+            raise ErroDeDado(f"Data too long: {ruins[0][0]}")
+        self.gravadas.extend(linhas)
+
+
+def test_executemany_isola_so_as_linhas_recusadas(monkeypatch):
+    monkeypatch.setattr(db_manager, "mdb", types.SimpleNamespace(IntegrityError=ErroDeDado, DataError=ErroDeDado))
+    linhas = [(i, "ruim" if i in (3, 6) else "ok") for i in range(8)]
+    cursor, idas = CursorFalso(), [0]
+
+    recusadas = _executemany_isolando_erros(cursor, "INSERT", linhas, [f"p{i}" for i in range(8)], idas)
+
+    assert recusadas == [("p3", "Data too long: 3"), ("p6", "Data too long: 6")]
+    assert sorted(cursor.gravadas) == [linha for linha in linhas if linha[1] == "ok"]
+    assert idas[0] > 2
@@ -0,0 +1,56 @@
+# tests/test_query_plan.py
+
+import pandas as pd
+import pytest
+
+from MP_Feeder.query_plan import LoteConsultas, PlanoConsultas
+
+GTINS = ["a", "b", "c"]
+GEOHASHS = ["g1", "g2"]
+
+
+def produto_cartesiano():
+    """Ordem do antigo merge por 'key': todos os geohashs do 1º GTIN, depois do 2º..."""
+    return [(gtin, geohash) for gtin in GTINS for geohash in GEOHASHS]
+
+
+def test_plano_segue_a_ordem_do_produto_cartesiano():
+    plano = PlanoConsultas(GTINS, GEOHASHS)
+    assert len(plano) == 6
+    assert [plano[i] for i in range(len(plano))] == produto_cartesiano()
+
+
+def test_consultas_retomam_do_indice_informado():
+    plano = PlanoConsultas(GTINS, GEOHASHS)
+    assert list(plano.consultas(4)) == [(4, "c", "g1"), (5, "c", "g2")]
+    assert list(plano.indices(-3)) == list(range(6))
+    assert list(plano.consultas(6)) == []
+
+
+@pytest.mark.parametrize("indice", [-1, 6])
+def test_indice_fora_do_plano(indice):
+    with pytest.raises(IndexError):
+        PlanoConsultas(GTINS, GEOHASHS)[indice]
+
+
+def test_reordenar_compoe_com_a_ordem_anterior():
+    esperado = produto_cartesiano()
+    plano = PlanoConsultas(GTINS, GEOHASHS).reordenar([5, 0, 3, 1])
+    assert [plano[i] for i in range(len(plano))] == [esperado[p] for p in (5, 0, 3, 1)]
+
+    amostra = plano.reordenar([2, 0])
+    assert [amostra[i] for i in range(len(amostra))] == [esperado[3], esperado[5]]
+
+
+def test_plano_vazio():
+    assert PlanoConsultas([], GEOHASHS).empty
+    assert PlanoConsultas(GTINS, GEOHASHS).reordenar([]).empty
+
+
+def test_lote_preserva_os_indices_globais():
+    Lote = pd.DataFrame({"index": [10, 12, 15], "gtin": ["a", "b", "c"], "geohash": ["g1", "g2", "g1"]})
+    lote = LoteConsultas(Lote)
+    assert len(lote) == 3
+    assert lote[12] == ("b", "g2")
+    assert list(lote.consultas(11)) == [(12, "b", "g2"), (15, "c", "g1")]
+    assert lote.indices(16) == []
@@ -0,0 +1,102 @@
+# tests/test_query_scheduler.py
+
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from MP_Feeder import query_scheduler
+from MP_Feeder.query_plan import PlanoConsultas
+from MP_Feeder.query_scheduler import carregar_ranking, ordenar_consultas
+
+GTINS = ["7891234567895", "17", "7890000000001"]
+GEOHASHS = ["6gge7u6cc", "6gge7u6cd"]
+
+
+def novo_ranking(pares, gerado_em="2026-10-18T03:00:00"):
+    """pares: {(gtin, geohash): notas}. Lojas e preços zerados: rendimento = notas."""
+    return pd.DataFrame({
+        "gtin": [gtin for gtin, _ in pares],
+        "geohash": [geohash for _, geohash in pares],
+        "notas": list(pares.values()),
+        "lojas": [0] * len(pares),
+        "precos": [0] * len(pares),
+        "gerado_em": [gerado_em] * len(pares),
+    })
+
+
+def novas_consultas(gtins, geohashs):
+    return PlanoConsultas(gtins, geohashs)
+
+
+def pares_do_plano(Plano):
+    """Pares na ordem de execução; os índices vão de 0 a N-1 na nova ordem."""
+    return [Plano[i] for i in range(len(Plano))]
+
+
+def test_pares_mais_produtivos_primeiro_e_empates_na_ordem_original():
+    Ranking = novo_ranking({
+        ("7890000000001", "6gge7u6cd"): 50,
+        ("17", "6gge7u6cc"): 10,
+        ("7891234567895", "6gge7u6cd"): 10,
+        ("7891234567895", "6gge7u6cc"): 30,
+    })
+    Plano = ordenar_consultas(novas_consultas(GTINS, GEOHASHS), Ranking, taxa_amostragem=0.0)
+    assert pares_do_plano(Plano) == [
+        ("7890000000001", "6gge7u6cd"),
+        ("7891234567895", "6gge7u6cc"),
+        ("7891234567895", "6gge7u6cd"),
+        ("17", "6gge7u6cc"),
+    ]
+
+
+def test_gtin_sem_zeros_a_esquerda_no_ranking_casa_com_o_plano():
+    Ranking = novo_ranking({("00000000000017", "6gge7u6cd"): 5, ("17", "6gge7u6cd"): 5})
+    Plano = ordenar_consultas(novas_consultas(GTINS, GEOHASHS), Ranking, taxa_amostragem=0.0)
+    assert pares_do_plano(Plano) == [("17", "6gge7u6cd")]
+
+
+def test_amostra_dos_pares_de_baixo_rendimento_e_deterministica():
+    gtins = [f"{i:014d}" for i in range(200)]
+    geohashs = [f"6gge{i:05d}" for i in range(10)]
+    Ranking = novo_ranking({(gtins[0], geohashs[0]): 100})
+
+    primeira = pares_do_plano(ordenar_consultas(novas_consultas(gtins, geohashs), Ranking, taxa_amostragem=0.25))
+    segunda = pares_do_plano(ordenar_consultas(novas_consultas(gtins, geohashs), Ranking, taxa_amostragem=0.25))
+    assert primeira == segunda
+    assert primeira[0] == (gtins[0], geohashs[0])
+    assert 0.2 * 2000 < len(primeira) < 0.3 * 2000
+
+    # Ranking novo (outra data): outra amostra
+    Ranking_novo = novo_ranking({(gtins[0], geohashs[0]): 100}, gerado_em="2026-10-19T03:00:00")
+    assert pares_do_plano(ordenar_consultas(novas_consultas(gtins, geohashs), Ranking_novo, taxa_amostragem=0.25)) != primeira
+
+
+def test_retomada_pelo_indice_segue_a_nova_ordem():
+    Ranking = novo_ranking({("17", "6gge7u6cd"): 9, ("7890000000001", "6gge7u6cc"): 3})
+    Plano = ordenar_consultas(novas_consultas(GTINS, GEOHASHS), Ranking, taxa_amostragem=1.0)
+    ordem = pares_do_plano(Plano)
+    assert len(ordem) == len(GTINS) * len(GEOHASHS)
+    assert ordem[:2] == [("17", "6gge7u6cd"), ("7890000000001", "6gge7u6cc")]
+    assert [(gtin, geohash) for _, gtin, geohash in Plano.consultas(2)] == ordem[2:]
+
+
+def test_ranking_vencido_so_e_reaproveitado_com_rotacao_em_andamento(tmp_path, monkeypatch):
+    arquivo_ranking, arquivo_indice = tmp_path / "ranking.csv", tmp_path / "ultimo_indice.txt"
+    vencido = (datetime.now() - timedelta(hours=48)).replace(microsecond=0).isoformat()
+    novo_ranking({("17", "6gge7u6cc"): 1}, gerado_em=vencido).to_csv(arquivo_ranking, index=False)
+    buscas = []
+    monkeypatch.setattr(
+        query_scheduler, "fetch_rendimento_pares",
+        lambda DB_CONFIG, dias: buscas.append(dias) or novo_ranking({("17", "6gge7u6cd"): 2}).drop(columns="gerado_em"),
+    )
+
+    arquivo_indice.write_text("3")
+    Ranking = carregar_ranking({}, str(arquivo_ranking), str(arquivo_indice), ttl_horas=24)
+    assert (buscas, Ranking["geohash"].tolist()) == ([], ["6gge7u6cc"])
+
+    arquivo_indice.unlink()
+    Ranking = carregar_ranking({}, str(arquivo_ranking), str(arquivo_indice), ttl_horas=24, dias=90)
+    assert (buscas, Ranking["geohash"].tolist()) == ([90], ["6gge7u6cd"])
+    # Recém-gravado: dentro do TTL, não consulta o banco de novo
+    carregar_ranking({}, str(arquivo_ranking), str(arquivo_indice), ttl_horas=24)
+    assert buscas == [90]
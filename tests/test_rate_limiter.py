@@ -0,0 +1,56 @@
+# tests/test_rate_limiter.py
+
+import pytest
+
+from MP_Feeder.rate_limiter import LimitadorAIMD
+
+
+def test_respostas_rapidas_sobem_a_taxa_ate_o_maximo():
+    limitador = LimitadorAIMD(taxa_inicial=1.0, taxa_maxima=1.3, incremento=0.1)
+    for _ in range(10):
+        limitador.registrar_resultado(200, latencia=0.1)
+    assert limitador.taxa == pytest.approx(1.3)
+    assert limitador.taxa_pico == pytest.approx(1.3)
+
+
+@pytest.mark.parametrize("resultado", [
+    {"status_code": 503, "latencia": 0.1},
+    {"status_code": None, "latencia": 0.1},
+    {"timeout": True},
+    {"status_code": 200, "latencia": 10.0},
+])
+def test_falhas_e_latencia_alta_reduzem_pela_metade(resultado):
+    limitador = LimitadorAIMD(taxa_inicial=4.0, fator_reducao=0.5, latencia_alvo=3.0)
+    limitador.registrar_resultado(**resultado)
+    assert limitador.taxa == pytest.approx(2.0)
+    assert limitador.total_reducoes == 1
+
+
+def test_latencia_subindo_reduz():
+    limitador = LimitadorAIMD(taxa_inicial=4.0, latencia_alvo=3.0, fator_latencia=2.0)
+    limitador.registrar_resultado(200, latencia=1.0)
+    limitador.registrar_resultado(200, latencia=2.5)
+    assert limitador.total_reducoes == 1
+
+
+def test_rajada_de_falhas_reduz_uma_vez_por_intervalo():
+    limitador = LimitadorAIMD(taxa_inicial=8.0, intervalo_reducao=60.0)
+    for _ in range(5):
+        limitador.registrar_resultado(500, latencia=0.1)
+    assert limitador.taxa == pytest.approx(4.0)
+    assert limitador.total_reducoes == 1
+
+
+def test_taxa_nao_cai_abaixo_do_minimo():
+    limitador = LimitadorAIMD(taxa_inicial=1.0, taxa_minima=0.5, intervalo_reducao=0.0)
+    for _ in range(5):
+        limitador.registrar_resultado(500, latencia=0.1)
+    assert limitador.taxa == pytest.approx(0.5)
+
+
+def test_token_bucket_enfileira_os_chamadores():
+    limitador = LimitadorAIMD(taxa_inicial=2.0)
+    assert limitador.reservar() == 0.0
+    # Sem tempo para reabastecer: o 2º espera ~1/taxa, o 3º ~2/taxa
+    assert limitador.reservar() == pytest.approx(0.5, abs=0.01)
+    assert limitador.reservar() == pytest.approx(1.0, abs=0.01)
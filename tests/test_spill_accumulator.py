@@ -0,0 +1,70 @@
+# tests/test_spill_accumulator.py
+
+import os
+
+from MP_Feeder.response_parser import BufferColunar
+from MP_Feeder.spill_accumulator import AcumuladorDisco
+
+NOMES = ("id_nota", "origem")
+
+
+def buffer(*linhas):
+    return BufferColunar(NOMES, {"id_nota": [linha[0] for linha in linhas], "origem": [linha[1] for linha in linhas]})
+
+
+def saida(acumulador, tamanho_lote=50000):
+    return [
+        linha
+        for lote in acumulador.lotes(tamanho_lote)
+        for linha in zip(lote["id_nota"], lote["origem"])
+    ]
+
+
+def test_sem_despejo_ordena_e_deduplica(tmp_path):
+    acumulador = AcumuladorDisco(NOMES, "id_nota", str(tmp_path))
+    acumulador.adicionar(buffer(("b", 1), ("a", 1), ("b", 2)))
+    assert saida(acumulador) == [("a", 1), ("b", 1)]
+    assert acumulador.despejos == 0
+    assert acumulador.duplicadas == 1
+
+
+def test_merge_dos_blocos_mantem_a_primeira_vista(tmp_path):
+    acumulador = AcumuladorDisco(NOMES, "id_nota", str(tmp_path), max_linhas_memoria=3, max_blocos=100)
+    acumulador.adicionar(buffer(("c", 1), ("a", 1), ("e", 1)))
+    acumulador.adicionar(buffer(("a", 2), ("d", 2), ("c", 2)))
+    acumulador.adicionar(buffer(("b", 3), ("e", 3)))  # fica em memória
+
+    assert acumulador.despejos == 2
+    assert len(acumulador) == 8
+    assert saida(acumulador) == [("a", 1), ("b", 3), ("c", 1), ("d", 2), ("e", 1)]
+    assert acumulador.duplicadas == 3
+
+
+def test_compactacao_preserva_resultado_e_contagem(tmp_path):
+    acumulador = AcumuladorDisco(NOMES, "id_nota", str(tmp_path), max_linhas_memoria=2, max_blocos=2)
+    for rodada in range(5):
+        acumulador.adicionar(buffer((str(rodada), rodada), ("0", rodada)))
+
+    assert acumulador.despejos == 5
+    assert len(acumulador._blocos) < acumulador.max_blocos
+    assert saida(acumulador) == [(str(i), i) for i in range(5)]
+    assert acumulador.duplicadas == 5
+
+
+def test_ids_int_e_str_sao_a_mesma_chave_e_lotes_respeitam_o_tamanho(tmp_path):
+    acumulador = AcumuladorDisco(NOMES, "id_nota", str(tmp_path), max_linhas_memoria=2)
+    acumulador.adicionar(buffer((1, "int"), (2, "int")))
+    acumulador.adicionar(buffer(("1", "str"), ("3", "str")))
+
+    lotes = list(acumulador.lotes(tamanho_lote=2))
+    assert [len(lote) for lote in lotes] == [2, 1]
+    assert [str(i) for lote in lotes for i in lote["id_nota"]] == ["1", "2", "3"]
+    assert acumulador.duplicadas == 1
+
+
+def test_fechar_apaga_os_blocos(tmp_path):
+    acumulador = AcumuladorDisco(NOMES, "id_nota", str(tmp_path), max_linhas_memoria=1)
+    acumulador.adicionar(buffer(("a", 1)))
+    assert os.listdir(tmp_path)
+    acumulador.fechar()
+    assert os.listdir(tmp_path) == []
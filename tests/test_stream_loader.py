@@ -0,0 +1,107 @@
+# tests/test_stream_loader.py
+
+import os
+
+import pytest
+
+from MP_Feeder import stream_loader
+from MP_Feeder.response_parser import COLUNAS_LOJAS, COLUNAS_NOTAS, novo_buffer_lojas, novo_buffer_notas
+
+
+def consulta(*ids):
+    """Buffers de UMA consulta: uma nota (e uma loja sem cadastro) por id."""
+    notas, lojas = novo_buffer_notas(), novo_buffer_lojas()
+    for i in ids:
+        for coluna in COLUNAS_NOTAS:
+            notas.colunas[coluna].append({"id_nota": f"n{i}", "datahora": "2025-11-20T14:32:10.000Z"}.get(coluna, "x"))
+        for coluna in COLUNAS_LOJAS:
+            lojas.colunas[coluna].append(f"l{i}" if coluna == "id_loja" else "x")
+    return notas, lojas
+
+
+class BancoFalso:
+    """Registra as cargas (e o índice em disco no momento de cada uma); 'falhas' derruba as N primeiras."""
+
+    def __init__(self, monkeypatch, arquivo_indice, falhas_notas=0, falhas_lojas=0):
+        self.arquivo_indice = arquivo_indice
+        self.falhas = {"notas": falhas_notas, "lojas": falhas_lojas}
+        self.cargas = []
+        monkeypatch.setattr(stream_loader, "inserir_notas", lambda df, now, db: self._inserir("notas", df))
+        monkeypatch.setattr(stream_loader, "inserir_lojas_sc", lambda df, now, db: self._inserir("lojas", df))
+
+    def _inserir(self, tabela, df):
+        if self.falhas[tabela]:
+            self.falhas[tabela] -= 1
+            raise ConnectionError(f"falha simulada em {tabela}")
+        indice = open(self.arquivo_indice).read() if os.path.exists(self.arquivo_indice) else None
+        self.cargas.append((tabela, df, indice))
+
+    def ids(self, tabela):
+        coluna = "id_nota" if tabela == "notas" else "id_loja"
+        return [df[coluna].tolist() for t, df, _ in self.cargas if t == tabela]
+
+
+@pytest.fixture
+def arquivo_indice(tmp_path):
+    return str(tmp_path / "ultimo_indice.txt")
+
+
+def novo_gravador(arquivo_indice, tamanho_lote=2):
+    return stream_loader.GravadorStreaming({}, None, arquivo_indice, tamanho_lote=tamanho_lote, intervalo_segundos=3600)
+
+
+def test_indice_so_avanca_depois_do_commit_de_notas_e_lojas(monkeypatch, arquivo_indice):
+    banco = BancoFalso(monkeypatch, arquivo_indice)
+    gravador = novo_gravador(arquivo_indice)
+    gravador.adicionar(*consulta(0), 1)
+    gravador.adicionar(*consulta(1), 2)
+    Notas, Lojas_SC = gravador.finalizar()
+
+    # Notas e lojas do lote foram gravadas antes de o índice 2 ir para o disco
+    assert [(t, indice) for t, _, indice in banco.cargas] == [("notas", None), ("lojas", None)]
+    assert open(arquivo_indice).read() == "2"
+    assert gravador.indice_gravado == 2
+    # Lojas sem coordenadas (geocodificadas no fim da rodada)
+    Lojas_gravadas = banco.cargas[1][1]
+    assert Lojas_gravadas["Latitude"].isna().all() and Lojas_gravadas["Longitude"].isna().all()
+    assert Notas.empty and Lojas_SC.empty
+
+
+def test_lojas_sao_gravadas_a_cada_lote(monkeypatch, arquivo_indice):
+    banco = BancoFalso(monkeypatch, arquivo_indice)
+    gravador = novo_gravador(arquivo_indice)
+    for i in range(5):
+        gravador.adicionar(*consulta(i), i + 1)
+    gravador.finalizar()
+
+    # Memória limitada ao lote: as lojas não se acumulam até o fim da rodada
+    assert banco.ids("notas") == [["n0", "n1"], ["n2", "n3"], ["n4"]]
+    assert banco.ids("lojas") == [["l0", "l1"], ["l2", "l3"], ["l4"]]
+    assert (gravador.notas_gravadas, gravador.lojas_gravadas, gravador.lotes) == (5, 5, 3)
+
+
+def test_falha_nas_lojas_segura_o_indice_sem_reenviar_as_notas(monkeypatch, arquivo_indice):
+    banco = BancoFalso(monkeypatch, arquivo_indice, falhas_lojas=1)
+    gravador = novo_gravador(arquivo_indice)
+    gravador.adicionar(*consulta(0, 1), 1)  # 1º lote: notas gravadas, lojas falham
+    gravador.adicionar(*consulta(2, 3), 2)  # 2º lote: lojas pendentes + as novas
+    gravador.finalizar()
+
+    assert banco.ids("notas") == [["n0", "n1"], ["n2", "n3"]]
+    assert banco.ids("lojas") == [["l0", "l1", "l2", "l3"]]
+    # Nenhum índice foi gravado antes de as lojas do 1º lote entrarem
+    assert [indice for _, _, indice in banco.cargas] == [None, None, None]
+    assert gravador.falhas == 1
+    assert open(arquivo_indice).read() == "2"
+
+
+def test_banco_fora_devolve_as_linhas_e_nao_grava_indice(monkeypatch, arquivo_indice):
+    BancoFalso(monkeypatch, arquivo_indice, falhas_notas=99)
+    gravador = novo_gravador(arquivo_indice)
+    gravador.adicionar(*consulta(0, 1), 1)
+    Notas, Lojas_SC = gravador.finalizar()
+
+    assert Notas["id_nota"].tolist() == ["n0", "n1"]
+    assert Lojas_SC["id_loja"].tolist() == ["l0", "l1"]
+    assert gravador.indice_gravado is None
+    assert not os.path.exists(arquivo_indice)
@@ -0,0 +1,127 @@
+# tests/test_verificar_planos.py
+#
+# Os planos em tests/planos/ foram escritos à mão no formato do EXPLAIN/ANALYZE
+# FORMAT=JSON do MariaDB 11.4 (query_block, nested_loop, table, filesort,
+# temporary_table); não são saídas capturadas de um banco.
+
+import json
+import os
+
+import pytest
+
+from utils import verificar_planos
+
+PLANOS = os.path.join(os.path.dirname(__file__), "planos")
+
+SQL_RANKING = """
+    SELECT p.codigo_interno, SUM(v.quantidade) AS total
+    FROM dbDrogamais.bronze_plugpharma_vendas v
+    JOIN bronze_plugpharma_produtos AS p ON p.codigo_interno = v.codigo_interno_produto
+    LEFT JOIN dbSults.tb_report_auditoria_embedded a ON a.codigo = p.codigo_interno
+    WHERE v.data_venda >= %s
+    GROUP BY p.codigo_interno
+    ORDER BY total DESC
+"""
+
+
+def plano(nome):
+    with open(os.path.join(PLANOS, nome), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def resumo(problemas):
+    return [(p["tipo"], p["tabela"], p["linhas"]) for p in problemas]
+
+
+def test_aliases_com_e_sem_banco():
+    assert verificar_planos.tabelas_da_consulta(SQL_RANKING) == {
+        "bronze_plugpharma_vendas": "bronze_plugpharma_vendas",
+        "v": "bronze_plugpharma_vendas",
+        "bronze_plugpharma_produtos": "bronze_plugpharma_produtos",
+        "p": "bronze_plugpharma_produtos",
+        "tb_report_auditoria_embedded": "dbSults.tb_report_auditoria_embedded",
+        "a": "dbSults.tb_report_auditoria_embedded",
+    }
+
+
+def test_full_scan_filesort_e_temporaria():
+    problemas = verificar_planos.problemas_do_plano(
+        plano("ranking_vendas_full_scan.json"), verificar_planos.tabelas_da_consulta(SQL_RANKING)
+    )
+    # O alias 'v' do plano volta para o nome da tabela; o eq_ref em 'p' não conta
+    assert resumo(problemas) == [
+        ("filesort", None, None),
+        ("full_scan", "bronze_plugpharma_vendas", 250000),
+        ("temporaria", None, None),
+    ]
+
+
+def test_derivada_e_tabela_pequena_nao_contam():
+    # <derived2> é analisada por dentro (range); 'c' tem menos linhas que o mínimo
+    assert verificar_planos.problemas_do_plano(plano("notas_por_indice.json"), {}) == []
+    assert resumo(verificar_planos.problemas_do_plano(plano("notas_por_indice.json"), {"c": "bronze_cidades"}, 100)) == [
+        ("full_scan", "bronze_cidades", 399)
+    ]
+
+
+def test_analyze_usa_linhas_reais():
+    plano_analyze = plano("analyze_lojas_index_scan.json")
+    # 'rows' estimado (100) ficaria abaixo do mínimo; o r_rows (48210) não
+    assert resumo(verificar_planos.problemas_do_plano(plano_analyze, {})) == [
+        ("full_index_scan", "bronze_menorPreco_lojas", 48210)
+    ]
+    assert verificar_planos._tempo_analyze(plano_analyze) == 184.6
+
+
+def test_avisos_de_funcao_na_coluna():
+    avisos = verificar_planos.avisos_do_sql("SELECT 1 FROM t WHERE DATE(t.data_atualizacao) = %s AND t.x = 1")
+    assert avisos == ["DATE(t.data_atualizacao) no filtro/junção/agrupamento: o índice da coluna não é usado"]
+    assert verificar_planos.avisos_do_sql("SELECT 1 FROM t WHERE t.data >= %s") == []
+
+
+@pytest.fixture
+def migracoes(tmp_path, monkeypatch):
+    for nome in ("v1_01_bronze_menorPreco_lojas.sql", "v2_01_proc.sql", "v3_01_idx_a.sql", "v3_07_idx_b.sql"):
+        (tmp_path / nome).write_text("-- existente\n")
+    monkeypatch.setattr(verificar_planos, "MIGRATIONS_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_migracao_segue_a_numeracao_v3(migracoes):
+    problemas = [{"tipo": "full_scan", "tabela": "bronze_plugpharma_vendas", "linhas": 250000}]
+    arquivo = verificar_planos.gravar_migracao_indice(
+        "bronze_plugpharma_vendas", ["data_venda", "codigo_interno_produto"], {"nome": "ranking"}, problemas
+    )
+
+    assert os.path.basename(arquivo) == "v3_08_idx_bronze_plugpharma_vendas_data_venda_codigo_interno_produto.sql"
+    conteudo = open(arquivo, encoding="utf-8").read()
+    assert "full_scan bronze_plugpharma_vendas (~250000 linhas)" in conteudo
+    assert conteudo.endswith(
+        "CREATE INDEX IF NOT EXISTS `idx_bronze_plugpharma_vendas_data_venda_codigo_interno_produto` "
+        "ON `bronze_plugpharma_vendas` (`data_venda`, `codigo_interno_produto`);\n"
+    )
+
+
+def test_migracao_de_outro_banco_e_nome_no_limite(migracoes):
+    arquivo = verificar_planos.gravar_migracao_indice(
+        "dbSults.tb_report_auditoria_embedded", ["codigo_interno_produto", "data_referencia"], {"nome": "x"}, []
+    )
+    nome_indice = "idx_tb_report_auditoria_embedded_codigo_interno_produto_data_referencia"[:64]
+
+    assert os.path.basename(arquivo) == f"v3_08_{nome_indice}.sql"
+    assert len(nome_indice) == 64  # limite de identificador do MariaDB
+    assert "ON `dbSults`.`tb_report_auditoria_embedded` (" in open(arquivo, encoding="utf-8").read()
+
+
+def test_primeira_migracao_v3(tmp_path, monkeypatch):
+    monkeypatch.setattr(verificar_planos, "MIGRATIONS_DIR", str(tmp_path))
+    arquivo = verificar_planos.gravar_migracao_indice("bronze_menorPreco_notas", ["data_atualizacao"], {"nome": "x"}, [])
+    assert os.path.basename(arquivo) == "v3_01_idx_bronze_menorPreco_notas_data_atualizacao.sql"
+
+
+def test_comparar_com_baseline_so_acusa_problema_novo():
+    baseline = {"ranking": ["filesort:", "full_scan:bronze_plugpharma_vendas"], "lojas": ["full_scan:bronze_menorPreco_lojas"]}
+    resultado = {"ranking": ["filesort:", "temporaria:"], "lojas": [], "nova": ["full_scan:bronze_cidades"]}
+    assert verificar_planos.comparar_com_baseline(resultado, baseline) == {
+        "ranking": ["temporaria:"], "nova": ["full_scan:bronze_cidades"]
+    }
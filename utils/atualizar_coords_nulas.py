@@ -1,6 +1,5 @@
 # utils/atualizar_coords_nulas.py
 import mariadb
-import requests
 import time
 import sys
 import os
@@ -16,8 +15,11 @@ except ImportError:
     print("❌ ERRO: 'config.py' não encontrado na pasta raiz.")
     sys.exit(1)
 
+from MP_Feeder import http_client
+from MP_Feeder.db_pool import conectar, registrar_estatisticas_db
+
 def conectar_db():
-    return mariadb.connect(**DB_CONFIG, database="dbDrogamais")
+    return conectar(DB_CONFIG, "dbDrogamais")
 
 def buscar_lat_lon_nominatim(endereco):
     """
@@ -34,7 +36,7 @@ def buscar_lat_lon_nominatim(endereco):
     headers = {"User-Agent": "AtualizadorCoords/1.0 (admin@drogamais.com.br)"}
 
     try:
-        response = requests.get(url, params=params, headers=headers, timeout=10)
+        response = http_client.get(url, params=params, headers=headers, timeout=10)
         if response.status_code == 200:
             dados = response.json()
             if dados:
@@ -120,6 +122,8 @@ def main():
         print(f"✅ Atualizados: {sucessos}")
         print(f"❌ Falhas: {falhas}")
         print("="*30)
+        http_client.registrar_estatisticas_http()
+        registrar_estatisticas_db()
 
     except mariadb.Error as e:
         print(f"\n❌ Erro de banco de dados: {e}")
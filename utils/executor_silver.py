@@ -13,6 +13,8 @@ except ImportError:
     print("❌ ERRO: 'config.py' não encontrado na pasta raiz do projeto.")
     sys.exit(1)
 
+from MP_Feeder.db_pool import conectar, registrar_estatisticas_db
+
 def rodar_procedure_silver():
     """
     Conecta ao banco e executa a procedure
@@ -25,7 +27,7 @@ def rodar_procedure_silver():
     try:
         # 1. Conectar ao banco
         print("Conectando ao banco de dados 'dbDrogamais'...")
-        conn = mariadb.connect(**DB_CONFIG, database="dbDrogamais")
+        conn = conectar(DB_CONFIG, "dbDrogamais")
         # Aumenta o timeout padrão de escrita, pois a procedure pode demorar
         conn.write_timeout = 300 # 5 minutos
         
@@ -67,6 +69,7 @@ def rodar_procedure_silver():
         if conn:
             conn.close()
         print("Conexão com o banco fechada.")
+        registrar_estatisticas_db()
 
 # --- Ponto de entrada do script ---
 if __name__ == "__main__":
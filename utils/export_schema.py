@@ -13,6 +13,8 @@ except ImportError:
     print("❌ ERRO: 'config.py' não encontrado na pasta raiz do projeto.")
     sys.exit(1)
 
+from MP_Feeder.db_pool import conectar
+
 # --- CONFIGURAÇÃO ---
 # 1. Defina os NOMES dos objetos que você quer exportar
 LISTA_TABELAS = [
@@ -25,7 +27,10 @@ LISTA_TABELAS = [
     'bronze_plugpharma_produtos',
     'bronze_cidades',
     'bronze_lojas',
-    'dbSults.tb_report_auditoria_embedded' # (Talvez seja necessário ajustar o nome se tiver ponto)
+    'dbSults.tb_report_auditoria_embedded', # (Talvez seja necessário ajustar o nome se tiver ponto)
+    'mp_feeder_fila_consultas',
+    'mp_feeder_carga_blocos',
+    'mp_feeder_run_state'
 ]
 
 LISTA_PROCEDURES = [
@@ -99,7 +104,7 @@ def exportar_schema():
     print(f"Salvando arquivos de schema em: '{OUTPUT_DIR}/'")
     
     try:
-        conn = mdb.connect(**DB_CONFIG, database=DB_CONFIG.get('database', 'dbDrogamais'))
+        conn = conectar(DB_CONFIG, DB_CONFIG.get('database', 'dbDrogamais'))
         cursor = conn.cursor()
         
         # --- 1. EXPORTAR TABELAS ---
@@ -14,6 +14,8 @@ except ImportError:
     print("❌ ERRO: 'config.py' não encontrado na pasta raiz do projeto.")
     sys.exit(1)
 
+from MP_Feeder.db_pool import conectar
+
 MIGRATIONS_DIR = 'migrations'
 
 def read_sql_file(filename):
@@ -89,7 +91,7 @@ def inicializar_banco():
         
         # --- 2. Conectar ao banco ---
         print("\nConectando ao banco de dados 'dbDrogamais'...")
-        conn = mdb.connect(**DB_CONFIG, database="dbDrogamais")
+        conn = conectar(DB_CONFIG, "dbDrogamais")
         cursor = conn.cursor()
         
         print("\n--- Iniciando execução das migrações ---")
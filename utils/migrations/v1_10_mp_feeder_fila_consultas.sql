@@ -0,0 +1,14 @@
+-- Definição da tabela: mp_feeder_fila_consultas
+CREATE TABLE IF NOT EXISTS `mp_feeder_fila_consultas` (
+  `id_rodada` varchar(40) NOT NULL,
+  `indice` int(11) NOT NULL,
+  `gtin` varchar(14) NOT NULL,
+  `geohash` varchar(12) NOT NULL,
+  `status` enum('pendente','em_andamento','concluida') NOT NULL DEFAULT 'pendente',
+  `worker` varchar(100) DEFAULT NULL,
+  `lease_ate` datetime DEFAULT NULL,
+  `tentativas` int(11) NOT NULL DEFAULT 0,
+  `data_atualizacao` datetime DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+  PRIMARY KEY (`id_rodada`,`indice`),
+  KEY `idx_fila_status_lease` (`id_rodada`,`status`,`lease_ate`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_uca1400_ai_ci;
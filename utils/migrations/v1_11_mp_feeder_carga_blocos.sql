@@ -0,0 +1,9 @@
+-- Definição da tabela: mp_feeder_carga_blocos
+CREATE TABLE IF NOT EXISTS `mp_feeder_carga_blocos` (
+  `tabela` varchar(64) NOT NULL,
+  `hash_bloco` char(40) NOT NULL,
+  `linhas` int(11) NOT NULL,
+  `data_carga` datetime DEFAULT current_timestamp(),
+  PRIMARY KEY (`tabela`,`hash_bloco`),
+  KEY `idx_carga_blocos_data` (`data_carga`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_uca1400_ai_ci;
@@ -0,0 +1,16 @@
+-- Definição da tabela: mp_feeder_run_state
+CREATE TABLE IF NOT EXISTS `mp_feeder_run_state` (
+  `id_estado` bigint(20) NOT NULL AUTO_INCREMENT,
+  `grupo` int(11) NOT NULL,
+  `total_grupos` int(11) NOT NULL,
+  `ultimo_gtin` varchar(14) DEFAULT NULL,
+  `data_lista_produtos` date DEFAULT NULL,
+  `id_rodada` varchar(40) DEFAULT NULL,
+  `inicio` datetime NOT NULL,
+  `fim` datetime NOT NULL,
+  `consultas` int(11) NOT NULL DEFAULT 0,
+  `notas` int(11) NOT NULL DEFAULT 0,
+  `lojas` int(11) NOT NULL DEFAULT 0,
+  PRIMARY KEY (`id_estado`),
+  UNIQUE KEY `uk_run_state_rodada` (`id_rodada`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_uca1400_ai_ci;
@@ -0,0 +1,508 @@
+# verificar_planos.py
+"""
+Regressão de planos de execução das consultas quentes do MP Feeder.
+
+Para cada consulta registrada em CONSULTAS (o mesmo SQL do db_manager), roda
+EXPLAIN FORMAT=JSON (ou ANALYZE FORMAT=JSON com --analyze, só para SELECT),
+aponta varreduras completas, filesort e tabelas temporárias, e propõe os
+índices que faltam como novos arquivos de migração (v3_NN_idx_*.sql).
+
+Com um baseline salvo (--salvar-baseline), qualquer problema novo em relação
+a ele faz o script sair com código 1.
+
+Banco local descartável (MariaDB em container, dados sintéticos):
+    docker compose -f utils/docker-compose.planos.yml up -d
+    python utils/verificar_planos.py --local --semear
+    python utils/verificar_planos.py --local --analyze --gerar-migracoes
+    docker compose -f utils/docker-compose.planos.yml down
+
+Sem --local usa o DB_CONFIG do config.py (só EXPLAIN/ANALYZE, nunca semeia).
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+from datetime import datetime, timedelta
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_ROOT)
+
+from MP_Feeder.startup import sob_demanda  # noqa: E402
+from MP_Feeder.db_pool import conectar  # noqa: E402
+from MP_Feeder import db_manager  # noqa: E402
+
+# Importado no primeiro uso: a análise do plano (e os testes dela) não precisa do driver
+mdb = sob_demanda("mariadb")
+
+UTILS_DIR = os.path.dirname(os.path.abspath(__file__))
+MIGRATIONS_DIR = os.path.join(UTILS_DIR, 'migrations')
+ARQUIVO_BASELINE = os.path.join(UTILS_DIR, 'planos_baseline.json')
+
+# Mesmas credenciais do utils/docker-compose.planos.yml
+DB_CONFIG_LOCAL = {"host": "127.0.0.1", "port": 3307, "user": "root", "password": "mp_feeder"}
+
+# Varreduras completas em tabelas menores que isso não contam como problema
+MIN_LINHAS_PADRAO = 1000
+
+# ============================================
+# CONSULTAS REGISTRADAS
+# ============================================
+
+def _parametros_lista_produtos(cursor):
+    """Data da lista de produtos mais recente (como no prefetch da rodada)."""
+    cursor.execute("SELECT MAX(data_insercao) FROM bronze_menorPreco_produtos")
+    maior = cursor.fetchone()[0] or datetime.now()
+    return (maior.date(),)
+
+def _montar_fabricantes_iqvia(cursor):
+    """UPDATE da IQVIA com os GTINs da lista mais recente (até 1600, como na atualização mensal)."""
+    cursor.execute("""
+        SELECT gtin FROM bronze_menorPreco_produtos
+        WHERE data_insercao = (SELECT MAX(data_insercao) FROM bronze_menorPreco_produtos)
+        LIMIT 1600
+    """)
+    gtins = [linha[0] for linha in cursor.fetchall()] or ["00000000000000"]
+    sql = db_manager._SQL_FABRICANTES_IQVIA.format(gtins=', '.join(['%s'] * len(gtins)))
+    return sql, tuple(gtins)
+
+def _montar_produtos_candidatos(cursor):
+    sentinelas = ', '.join(['%s'] * len(db_manager.GTINS_SENTINELA))
+    sql = db_manager._SQL_PRODUTOS_CANDIDATOS.format(sentinelas=sentinelas)
+    return sql, (90, 3000, 3000, *db_manager.GTINS_SENTINELA, 1600)
+
+# nome: função do db_manager | montar(cursor) -> (sql, parâmetros) |
+# indices: (tabela, colunas) que atendem a consulta, propostos se o plano tiver problema nessa tabela
+CONSULTAS = [
+    {
+        "nome": "pegar_geohashs_BD",
+        "montar": lambda cursor: (db_manager._SQL_GEOHASHS, ()),
+        "indices": [
+            ("dbSults.tb_report_auditoria_embedded", ["reportName", "userEmail"]),
+            ("bronze_lojas", ["email"]),
+            ("bronze_cidades", ["cidade_normalizada"]),
+        ],
+    },
+    {
+        "nome": "coletar_produtos_no_banco",
+        "montar": lambda cursor: (db_manager._SQL_GTINS_DA_LISTA, _parametros_lista_produtos(cursor)),
+        "indices": [("bronze_menorPreco_produtos", ["data_insercao"])],
+    },
+    {
+        "nome": "atualizar_fabricantes_via_iqvia",
+        "montar": _montar_fabricantes_iqvia,
+        "indices": [
+            ("bronze_menorPreco_produtos", ["gtin"]),
+            ("bronze_iqvia_cpp", ["EAN", "fabricante"]),
+        ],
+    },
+    {
+        "nome": "pegar_ultimo_gtin",
+        "montar": lambda cursor: (db_manager._SQL_ULTIMO_GTIN, ()),
+        "indices": [("bronze_menorPreco_notas", ["data_atualizacao"])],
+    },
+    {
+        "nome": "pegar_estado_rotacao",
+        "montar": lambda cursor: (db_manager._SQL_ESTADO_ROTACAO, ()),
+        "indices": [],
+    },
+    {
+        "nome": "fetch_produtos_candidatos",
+        "montar": _montar_produtos_candidatos,
+        "indices": [("bronze_plugpharma_vendas", ["data_venda", "codigo_interno_produto"])],
+    },
+]
+
+# ============================================
+# ANÁLISE DO PLANO
+# ============================================
+
+def obter_plano(cursor, sql, parametros, analyze=False):
+    """
+    Retorna (plano JSON, segundos). ANALYZE executa a consulta de verdade,
+    então só é usado em SELECT; UPDATE/DELETE ficam sempre no EXPLAIN.
+    """
+    sql = sql.strip().rstrip(';')
+    somente_leitura = re.match(r'(SELECT|WITH)\b', sql, re.IGNORECASE) is not None
+    comando = "ANALYZE FORMAT=JSON" if analyze and somente_leitura else "EXPLAIN FORMAT=JSON"
+
+    inicio = time.perf_counter()
+    cursor.execute(f"{comando} {sql}", parametros)
+    resultado = cursor.fetchone()
+    duracao = time.perf_counter() - inicio
+    return json.loads(resultado[0]), duracao
+
+def tabelas_da_consulta(sql):
+    """Mapa alias -> tabela (com o banco, se for outro) dos FROM/JOIN/UPDATE do SQL."""
+    palavras_reservadas = {"WHERE", "ON", "JOIN", "INNER", "LEFT", "RIGHT", "GROUP", "ORDER", "LIMIT", "SET", "USING"}
+    tabelas = {}
+    for tabela, alias in re.findall(r'\b(?:FROM|JOIN|UPDATE)\s+([\w.`]+)(?:\s+(?:AS\s+)?(\w+))?', sql, re.IGNORECASE):
+        tabela = tabela.replace('`', '')
+        if tabela.startswith('dbDrogamais.'):
+            tabela = tabela.split('.', 1)[1]   # banco padrão da conexão
+        nome = tabela.split('.')[-1]
+        tabelas[nome] = tabela
+        if alias and alias.upper() not in palavras_reservadas:
+            tabelas[alias] = tabela
+    return tabelas
+
+def problemas_do_plano(plano, aliases, min_linhas=MIN_LINHAS_PADRAO):
+    """
+    Percorre o JSON do EXPLAIN/ANALYZE e retorna os problemas, sem repetição:
+    [{'tipo': 'full_scan'|'full_index_scan'|'filesort'|'temporaria', 'tabela', 'linhas'}].
+    """
+    problemas = {}
+
+    def anotar(tipo, tabela=None, linhas=None):
+        chave = (tipo, tabela)
+        atual = problemas.get(chave)
+        if atual is None or (linhas or 0) > (atual["linhas"] or 0):
+            problemas[chave] = {"tipo": tipo, "tabela": tabela, "linhas": linhas}
+
+    def visitar(no):
+        if isinstance(no, list):
+            for item in no:
+                visitar(item)
+            return
+        if not isinstance(no, dict):
+            return
+
+        nome = no.get("table_name")
+        if nome and not nome.startswith("<"):   # <derived2>, <subquery3>: já vistos por dentro
+            acesso = no.get("access_type")
+            linhas = no.get("r_rows", no.get("rows")) or 0
+            if acesso in ("ALL", "index") and linhas >= min_linhas:
+                tipo = "full_scan" if acesso == "ALL" else "full_index_scan"
+                anotar(tipo, aliases.get(nome, nome), int(linhas))
+        if "filesort" in no or no.get("using_filesort"):
+            anotar("filesort")
+        if "temporary_table" in no or no.get("using_temporary_table"):
+            anotar("temporaria")
+
+        for valor in no.values():
+            visitar(valor)
+
+    visitar(plano)
+    return sorted(problemas.values(), key=lambda p: (p["tipo"], p["tabela"] or ""))
+
+def avisos_do_sql(sql):
+    """Padrões que impedem o uso de índice, vistos direto no texto do SQL."""
+    avisos = []
+    for funcao, coluna in re.findall(
+        r'\b(?:WHERE|AND|OR|ON|BY)\s+(DATE|LPAD|LOWER|UPPER|TRIM|YEAR|MONTH|CAST|CONVERT)\s*\(\s*([\w.]+)',
+        sql, re.IGNORECASE
+    ):
+        avisos.append(f"{funcao.upper()}({coluna}) no filtro/junção/agrupamento: o índice da coluna não é usado")
+    if re.search(r'COLLATE\s+\w+\s*=', sql, re.IGNORECASE):
+        avisos.append("junção com COLLATE forçado: se a collation da coluna for outra, o índice dela não é usado")
+    return avisos
+
+def _tempo_analyze(plano):
+    """Função auxiliar privada. r_total_time_ms do bloco principal (só no ANALYZE)."""
+    return plano.get("query_block", {}).get("r_total_time_ms")
+
+# ============================================
+# ÍNDICES PROPOSTOS
+# ============================================
+
+def indice_existente(cursor, tabela, colunas):
+    """True se algum índice da tabela já começa pelas 'colunas' (na ordem)."""
+    banco, _, nome = tabela.rpartition('.')
+    cursor.execute("""
+        SELECT INDEX_NAME, COLUMN_NAME
+        FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = COALESCE(NULLIF(%s, ''), DATABASE()) AND TABLE_NAME = %s
+        ORDER BY INDEX_NAME, SEQ_IN_INDEX
+    """, (banco, nome))
+    indices = {}
+    for indice, coluna in cursor.fetchall():
+        indices.setdefault(indice, []).append(coluna.lower())
+    alvo = [coluna.lower() for coluna in colunas]
+    return any(existentes[:len(alvo)] == alvo for existentes in indices.values())
+
+def propor_indices(cursor, consulta, problemas):
+    """Índices registrados da consulta que faltam numa tabela com problema no plano."""
+    tabelas_com_problema = {p["tabela"] for p in problemas if p["tabela"]}
+    ordenacao = any(p["tipo"] in ("filesort", "temporaria") for p in problemas)
+    propostas = []
+    for tabela, colunas in consulta["indices"]:
+        if tabela not in tabelas_com_problema and not ordenacao:
+            continue
+        if not indice_existente(cursor, tabela, colunas):
+            propostas.append((tabela, colunas))
+    return propostas
+
+def gravar_migracao_indice(tabela, colunas, consulta, problemas):
+    """Cria utils/migrations/v3_NN_idx_<tabela>_<colunas>.sql (um CREATE INDEX por arquivo, depois das procedures)."""
+    nome_tabela = tabela.split('.')[-1]
+    nome_indice = f"idx_{nome_tabela}_{'_'.join(colunas)}"[:64]
+    numeros = [
+        int(m.group(1)) for m in (re.match(r'v3_(\d+)_', f) for f in os.listdir(MIGRATIONS_DIR)) if m
+    ]
+    numero = max(numeros, default=0) + 1
+    arquivo = os.path.join(MIGRATIONS_DIR, f"v3_{numero:02d}_{nome_indice}.sql")
+
+    referencia = '.'.join(f"`{parte}`" for parte in tabela.split('.'))
+    resumo = ", ".join(
+        f"{p['tipo']} {p['tabela']} (~{p['linhas']} linhas)" if p["tabela"] else p["tipo"]
+        for p in problemas if p["tabela"] in (nome_tabela, tabela, None)
+    )
+    with open(arquivo, 'w', encoding='utf-8') as f:
+        f.write(
+            f"-- Índice proposto por utils/verificar_planos.py (consulta: {consulta['nome']})\n"
+            f"-- Plano sem o índice: {resumo}\n"
+            f"CREATE INDEX IF NOT EXISTS `{nome_indice}` ON {referencia} "
+            f"({', '.join(f'`{coluna}`' for coluna in colunas)});\n"
+        )
+    return arquivo
+
+# ============================================
+# BANCO LOCAL (CONTAINER) COM DADOS SINTÉTICOS
+# ============================================
+
+def aplicar_migracoes(cursor):
+    """
+    Cria as tabelas (v1_*) e os índices propostos já aceitos (v3_*) no banco
+    local. As procedures (v2_*) não entram nos planos e ficam de fora.
+    """
+    cursor.execute("CREATE DATABASE IF NOT EXISTS dbSults")
+    for arquivo in sorted(os.listdir(MIGRATIONS_DIR)):
+        if not arquivo.endswith('.sql') or arquivo.startswith('v2_'):
+            continue
+        with open(os.path.join(MIGRATIONS_DIR, arquivo), 'r', encoding='utf-8') as f:
+            sql = f.read()
+        # Tabela de outro banco (ex.: dbSults.tb_report_auditoria_embedded)
+        outro_banco = re.search(r'-- Definição da tabela: (\w+)\.', sql)
+        if outro_banco:
+            cursor.execute(f"USE {outro_banco.group(1)}")
+        print(f"Executando: {arquivo}...")
+        cursor.execute(sql)
+        if outro_banco:
+            cursor.execute("USE dbDrogamais")
+
+    # Tabela externa (carregada por outro processo), sem migração neste repositório
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS bronze_iqvia_cpp (
+            EAN varchar(14) DEFAULT NULL,
+            fabricante varchar(255) DEFAULT NULL
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_uca1400_ai_ci
+    """)
+
+def _inserir(cursor, tabela, colunas, linhas):
+    """Função auxiliar privada. TRUNCATE + executemany em blocos."""
+    cursor.execute(f"TRUNCATE TABLE {tabela}")
+    sql = f"INSERT INTO {tabela} ({', '.join(colunas)}) VALUES ({', '.join(['%s'] * len(colunas))})"
+    for inicio in range(0, len(linhas), 5000):
+        cursor.executemany(sql, linhas[inicio:inicio + 5000])
+    print(f" -> {tabela}: {len(linhas)} linhas")
+
+def semear_banco(conn, escala=1.0, semente=42):
+    """
+    Preenche as tabelas das consultas registradas com dados sintéticos, em
+    volumes e distribuições parecidos com os de produção ('escala' multiplica
+    as tabelas grandes), e atualiza as estatísticas (ANALYZE TABLE).
+    """
+    rnd = random.Random(semente)
+    cursor = conn.cursor()
+    aplicar_migracoes(cursor)
+    agora = datetime.now().replace(microsecond=0)
+    base32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+    n = lambda quantidade: max(int(quantidade * escala), 1)   # noqa: E731
+
+    cidades = [f"CIDADE {i:03d}" for i in range(400)]
+    geohashs = ["6g" + "".join(rnd.choice(base32) for _ in range(3)) for _ in cidades]
+    gtins = [f"{rnd.randrange(10**12, 10**13):014d}" for _ in range(5000)]
+    emails = [f"loja{i}@drogamais.com.br" for i in range(1500)]
+    print("\n--- Semeando o banco local ---")
+
+    _inserir(cursor, "bronze_cidades", ["id", "cidade", "cidade_normalizada", "geohash", "uf"], [
+        (i, cidade.title(), cidade, geohashs[i], "PR") for i, cidade in enumerate(cidades)
+    ])
+    _inserir(cursor, "bronze_lojas", [
+        "id_loja", "fantasia", "razao_social", "cnpj", "logradouro", "end_numero", "end_bairro",
+        "cep", "email", "responsavel", "id_cidade", "cidade",
+    ], [
+        (i, f"DROGAMAIS {i}", f"FARMACIA {i} LTDA", f"{rnd.randrange(10**13, 10**14)}", "RUA A", str(i),
+         "CENTRO", "80000-000", email, "RESPONSAVEL", i % 400, rnd.choice(cidades))
+        for i, email in enumerate(emails)
+    ])
+    relatorios = ["COMPARADOR DE PREÇOS", "VENDAS", "ESTOQUE", "METAS", "FINANCEIRO"]
+    _inserir(cursor, "dbSults.tb_report_auditoria_embedded", ["id", "createdAt", "userEmail", "reportName"], [
+        (f"{rnd.getrandbits(128):032x}", agora - timedelta(minutes=rnd.randrange(525600)),
+         rnd.choice(emails), rnd.choice(relatorios))
+        for _ in range(n(100000))
+    ])
+    _inserir(cursor, "bronze_menorPreco_produtos", ["id_produto", "gtin", "descricao", "data_insercao"], [
+        (f"{codigo}", gtin, f"PRODUTO {codigo}", datetime(agora.year, 1, 1, 3) + timedelta(days=30 * mes))
+        for mes in range(8)
+        for codigo, gtin in enumerate(rnd.sample(gtins, 1600))
+    ])
+    _inserir(cursor, "bronze_menorPreco_notas", [
+        "id_nota", "date", "id_loja", "geohash", "gtin", "descricao", "valor", "cidade", "data_atualizacao",
+    ], [
+        (f"{rnd.getrandbits(60):015x}-{i}", agora - timedelta(minutes=rnd.randrange(129600)),
+         str(rnd.randrange(n(20000))), rnd.choice(geohashs), rnd.choice(gtins), "PRODUTO",
+         round(rnd.random() * 100, 2), rnd.choice(cidades), agora - timedelta(seconds=rnd.randrange(7776000)))
+        for i in range(n(300000))
+    ])
+    _inserir(cursor, "bronze_menorPreco_lojas", ["id_loja", "latitude", "longitude", "cidade", "geohash"], [
+        (str(i), None if i % 10 == 0 else -25.4, None if i % 10 == 0 else -49.2, rnd.choice(cidades), rnd.choice(geohashs))
+        for i in range(n(20000))
+    ])
+    produtos_vendas = [(f"{codigo}", rnd.choice(gtins)) for codigo in range(8000)]
+    _inserir(cursor, "bronze_plugpharma_vendas", [
+        "cnpj_loja", "codigo_interno_produto", "GTIN", "descricao_produto", "apresentacao_produto",
+        "nome_fantasia_fabricante", "qtd_de_produtos", "valor_liquido_total", "data_venda",
+    ], [
+        (f"{rnd.randrange(1500):014d}", codigo, gtin.lstrip("0"), f"PRODUTO {codigo}", "CX", "FABRICANTE",
+         rnd.randint(1, 5), round(rnd.random() * 80, 2), agora - timedelta(minutes=rnd.randrange(525600)))
+        for codigo, gtin in (rnd.choice(produtos_vendas) for _ in range(n(300000)))
+    ])
+    _inserir(cursor, "bronze_iqvia_cpp", ["EAN", "fabricante"], [
+        (rnd.choice(gtins).lstrip("0"), f"FABRICANTE {rnd.randrange(300)}") for _ in range(n(60000))
+    ])
+    _inserir(cursor, "mp_feeder_run_state", [
+        "grupo", "total_grupos", "ultimo_gtin", "data_lista_produtos", "inicio", "fim", "consultas", "notas", "lojas",
+    ], [
+        (i % 8 + 1, 8, rnd.choice(gtins), agora.date(), agora - timedelta(hours=2 * (200 - i) + 1),
+         agora - timedelta(hours=2 * (200 - i)), 4000, rnd.randrange(50000), rnd.randrange(100))
+        for i in range(200)
+    ])
+    conn.commit()
+
+    for tabela in (
+        "bronze_cidades", "bronze_lojas", "dbSults.tb_report_auditoria_embedded", "bronze_menorPreco_produtos",
+        "bronze_menorPreco_notas", "bronze_menorPreco_lojas", "bronze_plugpharma_vendas", "bronze_iqvia_cpp",
+        "mp_feeder_run_state",
+    ):
+        cursor.execute(f"ANALYZE TABLE {tabela}")
+        cursor.fetchall()
+    cursor.close()
+    print("✅ Banco local semeado.")
+
+# ============================================
+# EXECUÇÃO
+# ============================================
+
+def verificar_planos(conn, analyze=False, gerar_migracoes=False, min_linhas=MIN_LINHAS_PADRAO):
+    """
+    Analisa o plano de cada consulta registrada. Retorna
+    {nome: ["tipo:tabela", ...]} (o formato do baseline).
+    """
+    cursor = conn.cursor()
+    resultado = {}
+    try:
+        for consulta in CONSULTAS:
+            print(f"\n=== {consulta['nome']} ===")
+            try:
+                sql, parametros = consulta["montar"](cursor)
+                plano, duracao = obter_plano(cursor, sql, parametros, analyze)
+            except mdb.Error as e:
+                print(f"⚠️ AVISO: não foi possível analisar a consulta. Erro: {e}")
+                continue
+
+            problemas = problemas_do_plano(plano, tabelas_da_consulta(sql), min_linhas)
+            resultado[consulta["nome"]] = [f"{p['tipo']}:{p['tabela'] or ''}" for p in problemas]
+
+            if not problemas:
+                print("✅ Sem varreduras completas, filesort ou tabela temporária.")
+            for p in problemas:
+                if p["tabela"]:
+                    print(f"⚠️ {p['tipo']} em {p['tabela']} (~{p['linhas']} linhas)")
+                else:
+                    print(f"⚠️ {p['tipo']}")
+            for aviso in avisos_do_sql(sql):
+                print(f"ℹ️ {aviso}")
+
+            tempo_ms = _tempo_analyze(plano)
+            if tempo_ms is not None:
+                print(f"⏱️ ANALYZE: {tempo_ms:.1f} ms no servidor")
+            else:
+                print(f"⏱️ EXPLAIN: {duracao * 1000:.1f} ms")
+
+            for tabela, colunas in propor_indices(cursor, consulta, problemas):
+                if gerar_migracoes:
+                    arquivo = gravar_migracao_indice(tabela, colunas, consulta, problemas)
+                    print(f"💡 Índice proposto: {tabela} ({', '.join(colunas)}) -> {os.path.relpath(arquivo, PROJECT_ROOT)}")
+                else:
+                    print(f"💡 Índice proposto: {tabela} ({', '.join(colunas)}) (use --gerar-migracoes para criar o arquivo)")
+    finally:
+        cursor.close()
+    return resultado
+
+def comparar_com_baseline(resultado, baseline):
+    """Retorna {nome: [problemas novos]} em relação ao baseline."""
+    regressoes = {}
+    for nome, problemas in resultado.items():
+        novos = sorted(set(problemas) - set(baseline.get(nome, [])))
+        resolvidos = sorted(set(baseline.get(nome, [])) - set(problemas))
+        if resolvidos:
+            print(f"✅ {nome}: resolvido desde o baseline: {', '.join(resolvidos)}")
+        if novos:
+            regressoes[nome] = novos
+    return regressoes
+
+def main():
+    parser = argparse.ArgumentParser(description="Regressão dos planos de execução das consultas do MP Feeder")
+    parser.add_argument("--local", action="store_true", help="Usa o MariaDB do utils/docker-compose.planos.yml")
+    parser.add_argument("--semear", action="store_true", help="(só com --local) Cria o schema e gera dados sintéticos")
+    parser.add_argument("--escala", type=float, default=1.0, help="Multiplica o volume das tabelas grandes ao semear")
+    parser.add_argument("--analyze", action="store_true", help="ANALYZE FORMAT=JSON (executa os SELECTs) em vez de EXPLAIN")
+    parser.add_argument("--gerar-migracoes", action="store_true", help="Grava os índices propostos em utils/migrations/v3_*.sql")
+    parser.add_argument("--salvar-baseline", action="store_true", help="Grava os problemas atuais como aceitos")
+    parser.add_argument("--min-linhas", type=int, default=MIN_LINHAS_PADRAO, help="Ignora varreduras em tabelas menores que isso")
+    args = parser.parse_args()
+
+    if args.local:
+        config = DB_CONFIG_LOCAL
+    else:
+        if args.semear:
+            print("❌ ERRO: --semear só roda com --local (nunca no banco de produção).")
+            sys.exit(2)
+        try:
+            from config import DB_CONFIG
+        except ImportError:
+            print("❌ ERRO: 'config.py' não encontrado na pasta raiz do projeto.")
+            sys.exit(2)
+        config = DB_CONFIG
+
+    try:
+        conn = conectar(config, "dbDrogamais")
+    except mdb.Error as e:
+        print(f"❌ ERRO ao conectar em {config.get('host')}:{config.get('port', 3306)}: {e}")
+        if args.local:
+            print("   O container está de pé? docker compose -f utils/docker-compose.planos.yml up -d")
+        sys.exit(2)
+
+    try:
+        if args.semear:
+            semear_banco(conn, args.escala)
+        resultado = verificar_planos(conn, args.analyze, args.gerar_migracoes, args.min_linhas)
+    finally:
+        conn.close()
+
+    if args.salvar_baseline:
+        with open(ARQUIVO_BASELINE, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False, sort_keys=True)
+        print(f"\n✅ Baseline salvo em {os.path.relpath(ARQUIVO_BASELINE, PROJECT_ROOT)}")
+        return
+
+    if not os.path.exists(ARQUIVO_BASELINE):
+        print("\nSem baseline (rode com --salvar-baseline para registrar o estado atual).")
+        return
+    with open(ARQUIVO_BASELINE, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressoes = comparar_com_baseline(resultado, baseline)
+    print("\n" + "="*50)
+    if regressoes:
+        for nome, novos in regressoes.items():
+            print(f"❌ REGRESSÃO em {nome}: {', '.join(novos)}")
+        print("="*50)
+        sys.exit(1)
+    print("✅ Nenhum plano piorou em relação ao baseline.")
+    print("="*50)
+
+if __name__ == "__main__":
+    main()